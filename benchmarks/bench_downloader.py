@@ -0,0 +1,48 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import datetime
+import os.path
+
+import pytest
+
+from conftest import SERIES_ROWS_PER_DAY
+
+
+@pytest.mark.parametrize("format", ["csv", "csv.gz", "parquet", "feather"])
+@pytest.mark.parametrize("perDay", SERIES_ROWS_PER_DAY)
+def test_download_timeseries(measure, seriesFixtures, tmp_path, perDay, format):
+    from iexexamples.dash.timeseries_downloader.download import (
+        downloadTimeseries,
+        filename,
+    )
+    from iexexamples.utils import ReplayClient
+
+    if format != "csv":
+        pytest.importorskip("pyarrow")
+
+    # the fetch-and-write path behind the download button, one year
+    # in 30 day windows, served from replayed responses
+    client = ReplayClient(seriesFixtures[perDay])
+    path = os.path.join(
+        str(tmp_path), filename("HISTORICAL_PRICES", "SPY", "", "1y", format)
+    )
+
+    rows = measure(
+        downloadTimeseries,
+        client,
+        path,
+        "HISTORICAL_PRICES",
+        "SPY",
+        "",
+        "1y",
+        format=format,
+        page_size=100000,
+        today=datetime.date(2020, 12, 31),
+        rounds=3,
+    )
+    assert rows == 366 * perDay
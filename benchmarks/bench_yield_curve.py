@@ -0,0 +1,176 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import pytest
+
+from conftest import ROWS
+
+
+def _app(path=None, cache_dir=None, **kwargs):
+    from iexexamples.dash.yield_curve import YieldCurveApp
+    from iexexamples.utils import ReplayClient
+
+    # no warm-up thread loading data alongside the measurements
+    return YieldCurveApp(
+        client=ReplayClient(path),
+        cache_dir=cache_dir,
+        background_warmup=False,
+        **kwargs
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_build_yield_curve(measure, curveFixtures, tmp_path, rows):
+    # fetch all curves from replayed responses, assemble, write the cache
+    app = _app(curveFixtures[rows], str(tmp_path))
+    measure(app.buildYieldCurve)
+    assert len(app.df) == rows
+
+
+@pytest.mark.parametrize("format", ["csv", "parquet", "feather"])
+@pytest.mark.parametrize("rows", ROWS)
+def test_save_data(measure, curves, tmp_path, rows, format):
+    app = _app(cache_dir=str(tmp_path), cache_format=format)
+    app.df = curves[rows]
+    measure(app.saveData)
+
+
+@pytest.mark.parametrize("format", ["csv", "parquet", "feather"])
+@pytest.mark.parametrize("rows", ROWS)
+def test_load_data(measure, curves, tmp_path, rows, format):
+    app = _app(cache_dir=str(tmp_path), cache_format=format)
+    app.df = curves[rows]
+    app.saveData()
+    measure(app.loadData)
+    assert len(app.df) == rows
+
+
+@pytest.mark.parametrize("max_rows", [500, None])
+@pytest.mark.parametrize("rows", ROWS)
+def test_yield_curve_surface(measure, curves, rows, max_rows):
+    from iexexamples.dash.yield_curve import yieldCurveSurface
+
+    measure(yieldCurveSurface, curves[rows], max_rows=max_rows)
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_line_overlay(measure, curves, rows):
+    from iexexamples.dash.yield_curve import lineOverlay, yieldCurveSurface
+
+    df = curves[rows]
+    overlay = df[["10 Year"]].rename(columns={"10 Year": "value"})
+    fig = yieldCurveSurface(df, max_rows=500)
+
+    # a fresh copy of the figure each round, so traces dont pile up
+    figures = []
+    measure(
+        lambda: lineOverlay(figures[-1], overlay, "overlay"),
+        setup=lambda: figures.append(type(fig)(fig)),
+        rounds=20,
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_add_overlays(measure, curveFixtures, curves, tmp_path, rows):
+    app = _app(curveFixtures[rows], str(tmp_path))
+    app.df = curves[rows]
+    figure = app.buildFigure()
+
+    # cold overlay cache, so each round replays the fetch too
+    measure(
+        app.addOverlays,
+        figure,
+        ["SPY", "UNRATE"],
+        setup=app.overlay_cache.clear,
+        rounds=20,
+    )
+
+
+@pytest.mark.parametrize("encoding", [None, "float32"])
+@pytest.mark.parametrize("rows", ROWS)
+def test_figure_json(measure, curves, rows, encoding):
+    from iexexamples.dash.yield_curve import yieldCurveSurface
+    from iexexamples.dash.yield_curve.encoding import encodeFigure, toJSON
+
+    fig = yieldCurveSurface(curves[rows], max_rows=None)
+
+    # what a chart callback does with its figure before it is sent, see
+    # YieldCurveApp.figurePayload, and the typed-array alternative the app
+    # doesn't use, see encoding.py
+    if encoding:
+        measure(lambda: toJSON(encodeFigure(fig, encoding)))
+    else:
+        measure(lambda: toJSON(fig.to_plotly_json()))
+
+
+@pytest.mark.parametrize("cached", [False, True])
+@pytest.mark.parametrize("rows", ROWS)
+def test_build_figure(measure, curves, tmp_path, rows, cached):
+    from iexexamples.dash.yield_curve.encoding import toJSON
+
+    app = _app(cache_dir=str(tmp_path))
+    app.df = curves[rows]
+    app.saveData()
+
+    # drawn and serialized, as for a session's first chart
+    if cached:
+        measure(lambda: toJSON(app.buildFigure()))
+    else:
+        measure(
+            lambda: toJSON(app.buildFigure()),
+            setup=app.figure_cache.invalidate,
+            rounds=20,
+        )
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+@pytest.mark.parametrize("rows", ROWS)
+def test_curve_analytics(measure, curves, rows, incremental):
+    from iexexamples.dash.yield_curve.analytics import CurveAnalytics
+
+    df = curves[rows]
+    analytics = []
+
+    def setup():
+        # a fresh engine, having seen all but the last date if incremental
+        analytics.append(CurveAnalytics())
+        if incremental:
+            analytics[-1].update(df.iloc[:-1])
+
+    measure(lambda: analytics[-1].update(df), setup=setup, rounds=20)
+
+
+@pytest.mark.parametrize("model", ["spline", "ns", "nss"])
+@pytest.mark.parametrize("rows", ROWS)
+def test_fit_curves(measure, curves, rows, model):
+    import numpy as np
+
+    from iexexamples.dash.yield_curve.fitting import CurveFitter, splineCurves
+
+    df = curves[rows]
+    grid = np.linspace(0.1, 30, 60)
+
+    # every date fitted from scratch, then evaluated on a maturity grid
+    if model == "spline":
+        measure(splineCurves, df, grid)
+    else:
+        measure(lambda: CurveFitter(model).fit(df) and None, rounds=5)
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_fit_curves_incremental(measure, curves, rows):
+    from iexexamples.dash.yield_curve.fitting import CurveFitter
+
+    df = curves[rows]
+    fitters = []
+
+    def setup():
+        # all but the last date already fitted
+        fitters.append(CurveFitter("nss"))
+        fitters[-1].fit(df.iloc[:-1])
+
+    measure(lambda: fitters[-1].fit(df), setup=setup, rounds=20)
@@ -0,0 +1,185 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Shared fixtures for the benchmarks, see benchmarks/README.md.
+
+Data is synthetic, recorded once per session through `RecordingClient`
+and served back through `ReplayClient`, so the apps go through the same
+client path as they would offline.
+"""
+
+import glob
+import json
+import os
+import os.path
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# History lengths in business days, roughly 1, 4 and 13 years. The app
+# fetches 2008 to 2021 by default, so the largest is a full history
+ROWS = (250, 1000, 3250)
+
+# Rows per day of the downloaded series, over a year
+SERIES_ROWS_PER_DAY = (10, 100, 1000)
+
+_baselineDir = os.path.join(os.path.dirname(__file__), "baseline")
+
+
+def peakMemory(func, *args, **kwargs):
+    """Peak bytes allocated by python while running `func` once"""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+@pytest.fixture
+def measure(benchmark):
+    """Like `benchmark(func, *args)`, but also records the peak memory of a
+    single call in the saved results. Pass `setup` to run before each call
+    without being timed, and `rounds` to fix the number of calls for
+    slow benchmarks."""
+
+    def run(func, *args, setup=None, rounds=None, **kwargs):
+        # once untraced first, so lazy imports and caches dont count
+        for traced in (False, True):
+            if setup is not None:
+                setup()
+            if traced:
+                peak = peakMemory(func, *args, **kwargs)
+            else:
+                func(*args, **kwargs)
+        benchmark.extra_info["peak_memory_bytes"] = peak
+
+        if setup is None and rounds is None:
+            return benchmark(func, *args, **kwargs)
+        return benchmark.pedantic(
+            lambda: func(*args, **kwargs), setup=setup, rounds=rounds or 5
+        )
+
+    return run
+
+
+def _curveClient(rows):
+    from iexexamples.dash.yield_curve.app import _curves
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end="2020-12-31", periods=rows)
+
+    class Client(object):
+        def timeSeriesDF(self, id, key, **kwargs):
+            if id == "TREASURY":
+                base = 0.1 * (1 + list(_curves).index(key))
+                value = base + np.abs(np.cumsum(rng.normal(0, 0.01, len(dates))))
+            else:
+                value = 300 + np.cumsum(rng.normal(0, 3, len(dates)))
+            return pd.DataFrame(
+                {"date": dates, "value": value.round(2), "close": value.round(2)}
+            )
+
+    return Client()
+
+
+@pytest.fixture(scope="session")
+def curveFixtures(tmp_path_factory):
+    """Replay fixtures folder, of every treasury curve and overlay, by number of rows"""
+    from iexexamples.dash.yield_curve.app import _curves, _overlays
+    from iexexamples.utils import RecordingClient
+
+    paths = {}
+    for rows in ROWS:
+        paths[rows] = str(tmp_path_factory.mktemp("curves{}".format(rows)))
+        client = RecordingClient(_curveClient(rows), paths[rows])
+        for curve in _curves:
+            client.timeSeriesDF("TREASURY", curve)
+        for overlay, config in _overlays.items():
+            client.timeSeriesDF(config["timeseriesId"], overlay)
+    return paths
+
+
+@pytest.fixture(scope="session")
+def seriesFixtures(tmp_path_factory):
+    """Replay fixtures folder of one intraday series over 2020, by rows per day"""
+    from iexexamples.utils import RecordingClient
+
+    rng = np.random.default_rng(0)
+    paths = {}
+    for perDay in SERIES_ROWS_PER_DAY:
+        dates = pd.date_range("2020-01-01", "2020-12-31 23:59", periods=366 * perDay)
+
+        class Client(object):
+            def timeSeriesDF(self, **kwargs):
+                return pd.DataFrame(
+                    {
+                        "date": dates,
+                        "key": "SPY",
+                        "open": rng.normal(300, 10, len(dates)).round(2),
+                        "close": rng.normal(300, 10, len(dates)).round(2),
+                        "volume": rng.integers(0, 1000000, len(dates)),
+                    }
+                )
+
+        paths[perDay] = str(tmp_path_factory.mktemp("series{}".format(perDay)))
+        RecordingClient(Client(), paths[perDay]).timeSeriesDF(
+            id="HISTORICAL_PRICES", key="SPY"
+        )
+    return paths
+
+
+@pytest.fixture(scope="session")
+def curves():
+    """Synthetic yield curve history by number of rows"""
+    from iexexamples.dash.yield_curve.app import _curves
+
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range(end="2020-12-31", periods=max(ROWS), name="date")
+    df = pd.DataFrame(
+        np.abs(rng.normal(2.0, 1.0, size=(len(index), len(_curves)))).round(2),
+        index=index,
+        columns=list(_curves.values()),
+    )
+    return {rows: df.iloc[-rows:] for rows in ROWS}
+
+
+def _baseline():
+    """peak memory by benchmark name from the newest stored baseline"""
+    files = sorted(glob.glob(os.path.join(_baselineDir, "*", "*.json")))
+    if not files:
+        return {}
+    with open(files[-1], "r") as fp:
+        data = json.load(fp)
+    return {
+        bench["fullname"]: bench["extra_info"].get("peak_memory_bytes")
+        for bench in data["benchmarks"]
+    }
+
+
+def pytest_terminal_summary(terminalreporter):
+    # pytest-benchmark only compares timings, show memory alongside
+    session = getattr(terminalreporter.config, "_benchmarksession", None)
+    if session is None or not session.benchmarks:
+        return
+
+    baseline = _baseline()
+    terminalreporter.section("peak memory (KiB)")
+    for bench in session.benchmarks:
+        peak = bench.extra_info.get("peak_memory_bytes")
+        if peak is None:
+            continue
+        line = "{:<90} {:>12,.0f}".format(bench.fullname, peak / 1024)
+        base = baseline.get(bench.fullname)
+        if base:
+            line += "  baseline {:>12,.0f} ({:+.0%})".format(
+                base / 1024, peak / base - 1
+            )
+        terminalreporter.write_line(line)
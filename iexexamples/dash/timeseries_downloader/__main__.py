@@ -5,9 +5,16 @@
 # This file is part of the iexexamples library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import sys
 
 from .app import TimeseriesDownloader
 
 if __name__ == "__main__":
-    app = TimeseriesDownloader()
-    app.debug()
+    if "--startup-time" in sys.argv:
+        # python -m iexexamples.dash.timeseries_downloader --startup-time
+        from ...utils.startup import printStartup
+
+        printStartup("iexexamples.dash.timeseries_downloader", "TimeseriesDownloader")
+    else:
+        app = TimeseriesDownloader()
+        app.debug()
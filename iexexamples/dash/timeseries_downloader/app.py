@@ -7,13 +7,24 @@
 #
 
 import dash
-from dash.dependencies import Output, Input
+from dash.dependencies import ALL, Output, Input, State
+from dash.exceptions import PreventUpdate
 import dash_core_components as dcc
 import dash_html_components as html
-import pyEX as p
+import dash_table
+import json
 import os
 import os.path
+import threading
 
+from ...utils import LazyClient, Metrics, SharedClient, TokenBucket, TTLCache
+from ...utils.lru import sizeOf
+from ...utils.shared import _defaultRetries
+from .download import WILDCARD, downloadBatch, downloadTimeseries, expandJobs, filename
+from .formats import _defaultFormat, formats
+from .jobs import JobQueue
+from .metadata import MetadataIndex
+from .preview import _defaultPageSize, Preview
 
 _RANGES = [
     "1d",
@@ -28,9 +39,77 @@ _RANGES = [
     "3y",
 ]
 
+# Seconds before cached metadata listings are refreshed
+_defaultMetadataTTL = 24 * 60 * 60
+
+# Series downloaded concurrently in a batch
+_defaultMaxWorkers = 4
+
+# Max requests per second across all downloads
+_defaultRateLimit = 5
+
+# Downloads running at once, others wait queued
+_defaultMaxJobs = 2
+
+# Seconds a previewed file stays loaded after it was last looked at
+_defaultPreviewTTL = 10 * 60
+
+# Memory for loaded previews, least recently looked at are dropped beyond it
+_defaultPreviewBytes = 512 * 1024 * 1024
+
 
 class TimeseriesDownloader(object):
-    def __init__(self):
+    def __init__(
+        self,
+        metadata_path=None,
+        metadata_ttl=_defaultMetadataTTL,
+        max_workers=_defaultMaxWorkers,
+        rate_limit=_defaultRateLimit,
+        retries=_defaultRetries,
+        max_jobs=_defaultMaxJobs,
+        jobs_dir=None,
+        preview_ttl=_defaultPreviewTTL,
+        preview_max_bytes=_defaultPreviewBytes,
+        client=None,
+        metrics=False,
+        background_warmup=True,
+    ):
+        # pyEX client, or a stand-in from utils/client.py. Defaults to
+        # getClient(), called on first use
+        self.client = client
+
+        # Serve Prometheus-style metrics on /metrics, pass True or a
+        # utils.Metrics instance. See utils/metrics.py
+        self.metrics = Metrics() if metrics is True else (metrics or None)
+
+        # Where and for how long to keep the id/key/subkey index, see metadata.py
+        self.metadata_path = metadata_path
+        self.metadata_ttl = metadata_ttl
+
+        # Batch downloads run on `max_workers` threads sharing one rate limit,
+        # and failed requests are retried with backoff. See utils/shared.py
+        self.max_workers = max_workers
+        self.limiter = (
+            TokenBucket(rate_limit, burst=max_workers) if rate_limit else None
+        )
+        self.retries = retries
+
+        # Downloads run as background jobs, see jobs.py. Set `jobs_dir` to
+        # share job status between server processes
+        self.jobs = JobQueue(max_workers=max_jobs, state_dir=jobs_dir)
+
+        # Downloaded files opened for preview, loaded on the server and sent
+        # to the browser a page at a time. See preview.py
+        self.previews = TTLCache(
+            ttl=preview_ttl,
+            max_bytes=preview_max_bytes,
+            sizeof=lambda preview: sizeOf(preview.df),
+        )
+
+        # Import pandas in the background straight after startup, rather
+        # than on the first download
+        self.background_warmup = background_warmup
+
         # Instantiate dash instance
         self.app = dash.Dash(
             title="Timeseries Downloader",
@@ -54,15 +133,26 @@ class TimeseriesDownloader(object):
         - pyEX Client
         - Setup Dash layouts
         - Setup Dash callbacks
+        - Warm metadata index in the background
         """
-        # create a client
-        try:
-            self.client = p.Client()  # set IEX_TOKEN env var or provide here
-        except Exception as e:
-            print(
-                "To run this app, set IEX_TOKEN environmnent variable or hard code in app.py"
-            )
-            raise e
+        # create a client on first use, unless one was provided. Set
+        # IEX_TOKEN env var, or IEX_CLIENT_MODE=replay to run offline
+        self.client = self.client or LazyClient()
+
+        # one client for metadata and downloads, coalescing identical
+        # requests in flight, rate limiting and retrying
+        self.client = SharedClient(
+            self.client, limiter=self.limiter, retries=self.retries
+        )
+
+        if self.metrics is not None:
+            # count and time upstream requests
+            self.client = self.metrics.instrumentClient(self.client)
+
+        # id/key/subkey listings for the dropdowns
+        self.metadata = MetadataIndex(
+            self.client, path=self.metadata_path, ttl=self.metadata_ttl
+        )
 
         # initialize the layout
         self.initializeLayout()
@@ -70,9 +160,30 @@ class TimeseriesDownloader(object):
         # initialize callbacks
         self.initializeCallbacks()
 
+        # initialize the metrics endpoint
+        self.initializeMetrics()
+
         # initialize data
         self.initializeData()
 
+    def initializeMetrics(self):
+        if self.metrics is None:
+            return
+        self.metrics.instrumentCallbacks(self.app)
+        self.metrics.gauge(
+            "downloader_jobs",
+            "Download jobs known to this process, by status",
+            self.jobCounts,
+            ["status"],
+        )
+        self.metrics.install(self.app.server)
+
+    def jobCounts(self):
+        counts = {}
+        for job in self.jobs.jobs():
+            counts[(job.status,)] = counts.get((job.status,), 0) + 1
+        return counts
+
     def initializeLayout(self):
         # Dropdown containing all timeseries IDs
         self.id_dropdown = dcc.Dropdown(
@@ -83,20 +194,23 @@ class TimeseriesDownloader(object):
         )
 
         # Dropdown containing all timeseries keys
-        # for the provided timeseries ID
+        # for the provided timeseries ID, pick
+        # several to download them in one batch
         self.key_dropdown = dcc.Dropdown(
             id="key-dropdown",
             className="mb2",
             options=[],
+            multi=True,
             value=None,
         )
 
         # Dropdown containing all timeseries subkeys
-        # for the provided timeseries ID and key
+        # for the provided timeseries ID and keys
         self.subkey_dropdown = dcc.Dropdown(
             id="subkey-dropdown",
             className="mb2",
             options=[],
+            multi=True,
             value=None,
         )
 
@@ -110,8 +224,18 @@ class TimeseriesDownloader(object):
             value="1m",
         )
 
+        # Dropdown with the output file formats
+        # available in this environment
+        self.format_dropdown = dcc.Dropdown(
+            id="format-dropdown",
+            className="mb2",
+            options=[{"label": label, "value": x} for x, label in formats()],
+            clearable=False,
+            value=_defaultFormat,
+        )
+
         # Text input for the folder to which the
-        # downloaded CSVs should be emitted
+        # downloaded files should be emitted
         self.location_input = dcc.Input(
             id="location-input",
             placeholder="Path to output folder...",
@@ -162,6 +286,9 @@ class TimeseriesDownloader(object):
                                 html.Label(
                                     className="header-subtitle mb2", children="Range"
                                 ),
+                                html.Label(
+                                    className="header-subtitle mb2", children="Format"
+                                ),
                                 html.Label(
                                     className="header-subtitle mb2", children="Location"
                                 ),
@@ -174,6 +301,7 @@ class TimeseriesDownloader(object):
                                 dcc.Loading(self.key_dropdown),
                                 dcc.Loading(self.subkey_dropdown),
                                 dcc.Loading(self.range_dropdown),
+                                dcc.Loading(self.format_dropdown),
                                 dcc.Loading(self.location_input),
                             ],
                         ),
@@ -191,126 +319,366 @@ class TimeseriesDownloader(object):
                         children="",
                     ),
                 ),
-                # These two are just placeholder targets for
-                # callbacks that dont really do anything
+                # Status of queued, running and finished downloads
+                html.Div(id="jobs-container", className="mt2", children=[]),
+                dcc.Interval(id="jobs-poll", interval=1000),
+                # Paged preview of a downloaded file, sorted and
+                # filtered on the server
+                html.Div(
+                    id="preview-container",
+                    className="mt2",
+                    style={"display": "none"},
+                    children=[
+                        html.Label(
+                            id="preview-summary", className="header-subtitle mb2"
+                        ),
+                        dash_table.DataTable(
+                            id="preview-table",
+                            columns=[],
+                            data=[],
+                            page_action="custom",
+                            page_current=0,
+                            page_size=_defaultPageSize,
+                            sort_action="custom",
+                            sort_mode="multi",
+                            sort_by=[],
+                            filter_action="custom",
+                            filter_query="",
+                        ),
+                    ],
+                ),
+                # Job id and file index of the file being previewed, resolved
+                # against the session's jobs on every page
+                dcc.Store(id="preview-picked"),
+                # IDs of the jobs started from this browser session
+                dcc.Store(id="session-jobs", storage_type="session", data=[]),
+                # Poll for id dropdown options until
+                # the metadata index has warmed up
+                dcc.Interval(id="metadata-poll", interval=500),
+                # This is just a placeholder target for
+                # a callback that doesnt really do anything
                 html.Div(id="fake-output1", style={"display": "none"}),
-                html.Div(id="fake-output2", style={"display": "none"}),
             ],
         )
 
     def initializeCallbacks(self):
+        # Callback to populate id input once metadata is available
+        @self.app.callback(
+            [
+                Output("id-dropdown", "options"),
+                Output("metadata-poll", "disabled"),
+            ],
+            Input("metadata-poll", "n_intervals"),
+        )
+        def handleMetadataReady(_):
+            if not self.metadata.ready.is_set():
+                # keep polling
+                return [], False
+
+            return [{"label": x, "value": x} for x in self.metadata.ids()], True
+
         # Callback to populate key input based on ID
         @self.app.callback(
             Output("key-dropdown", "options"),
             Input("id-dropdown", "value"),
         )
         def handleIdChange(idDropdownValue):
-            # TODO why didnt this happen automatically?
-            self.id_dropdown.value = idDropdownValue
             if idDropdownValue is None:
                 # user has not picked an ID, so return []
                 return []
 
-            ret = []
-            for x in self.client.queryMetadata(id=idDropdownValue):
-                ret.append({"label": x["value"], "value": x["value"]})
-            return ret
-            # return [{"label": x["value"], "value": x["value"]} for x in self.client.queryMetadata(id=idDropdownValue)]
+            return [
+                {"label": x, "value": x} for x in self.metadata.keys(idDropdownValue)
+            ]
 
         # Callback to populate subkey input based on key
         @self.app.callback(
             Output("subkey-dropdown", "options"),
             Input("key-dropdown", "value"),
+            State("id-dropdown", "value"),
         )
-        def handleKeyChange(keyDropdownValue):
-            # TODO why didnt this happen automatically?
-            self.key_dropdown.value = keyDropdownValue
-
-            if keyDropdownValue is None:
-                # user has not picked an ID, so return []
+        def handleKeyChange(keyDropdownValue, idDropdownValue):
+            if not keyDropdownValue:
+                # user has not picked a key, so return []
                 return []
 
-            ret = []
-            for x in self.client.queryMetadata(
-                id=self.id_dropdown.value, key=keyDropdownValue
-            ):
-                ret.append({"label": x["value"], "value": x["value"]})
+            # offer every subkey of every selected key, plus a wildcard
+            ret = [{"label": "All subkeys", "value": WILDCARD}]
+            seen = set()
+            for key in keyDropdownValue:
+                for x in self.metadata.subkeys(idDropdownValue, key):
+                    if x not in seen:
+                        seen.add(x)
+                        ret.append({"label": x, "value": x})
             return ret
 
-        # Callback to ensure subkey and range are written properly
+        # Callback to download and emit file
         @self.app.callback(
-            Output("fake-output1", "children"),
             [
-                Input("subkey-dropdown", "value"),
-                Input("range-dropdown", "value"),
+                Output("data-download-done", "style"),
+                Output("data-download-done", "children"),
+                Output("session-jobs", "data"),
+            ],
+            Input("download-data", "n_clicks"),
+            [
+                State("id-dropdown", "value"),
+                State("key-dropdown", "value"),
+                State("subkey-dropdown", "value"),
+                State("range-dropdown", "value"),
+                State("format-dropdown", "value"),
+                State("location-input", "value"),
+                State("session-jobs", "data"),
             ],
         )
-        def handleSubKeyChange(subKeyDropdownValue, rangeDropdownValue):
-            # TODO why didnt this happen automatically?
-            self.subkey_dropdown.value = subKeyDropdownValue
-            self.range_dropdown.value = rangeDropdownValue
-            return []
+        def downloadData(
+            dataClick,
+            idDropdownValue,
+            keyDropdownValue,
+            subKeyDropdownValue,
+            rangeDropdownValue,
+            formatDropdownValue,
+            locationValue,
+            sessionJobs,
+        ):
+            sessionJobs = sessionJobs or []
+            if dataClick and dataClick > 0 and idDropdownValue:
+                # Check if the output folder exists
+                folderPath = os.path.abspath(os.path.expanduser(locationValue or ""))
+                if locationValue and os.path.exists(folderPath):
+                    # one job per selected series
+                    series = expandJobs(
+                        self.metadata,
+                        idDropdownValue,
+                        keyDropdownValue,
+                        subKeyDropdownValue,
+                        rangeDropdownValue,
+                    )
+
+                    # run in the background so this request returns immediately
+                    job = self.jobs.submit(
+                        "{} series from {} to {}".format(
+                            len(series), idDropdownValue, folderPath
+                        ),
+                        self.runDownload,
+                        folderPath,
+                        series,
+                        formatDropdownValue or _defaultFormat,
+                    )
+                    sessionJobs = sessionJobs + [job.id]
+                    outputText = "Queued download {}".format(job.id)
+                else:
+                    outputText = "Folder does not exist: {}".format(locationValue)
+
+                return {"display": "block"}, outputText, sessionJobs
+            return {"display": "none"}, "", sessionJobs
 
-        # Callback to ensure location is written properly
+        # Callback to show status of this session's background downloads
         @self.app.callback(
-            Output("fake-output2", "children"),
-            Input("location-input", "value"),
+            Output("jobs-container", "children"),
+            Input("jobs-poll", "n_intervals"),
+            State("session-jobs", "data"),
         )
-        def handleLocationChange(locationValue):
-            # TODO why didnt this happen automatically?
-            self.location_input.value = locationValue
+        def handleJobsPoll(_, sessionJobs):
+            return [self.renderJob(job) for job in self.jobs.status(sessionJobs or [])]
+
+        # Callback to cancel a background download
+        @self.app.callback(
+            Output("fake-output1", "children"),
+            Input({"type": "cancel-job", "index": ALL}, "n_clicks"),
+            State("session-jobs", "data"),
+        )
+        def handleCancel(cancelClicks, sessionJobs):
+            for t in dash.callback_context.triggered:
+                if t["value"]:
+                    # prop_id is the json encoded id, then .n_clicks
+                    id = json.loads(t["prop_id"].rsplit(".", 1)[0])["index"]
+                    # only jobs started in this session can be cancelled
+                    if id in (sessionJobs or []):
+                        self.jobs.cancel(id)
             return []
 
-        # Callback to download and emit file
+        # Callback to pick a downloaded file to preview, starting on its
+        # first page, unsorted and unfiltered
         @self.app.callback(
             [
-                Output("data-download-done", "style"),
-                Output("data-download-done", "children"),
+                Output("preview-picked", "data"),
+                Output("preview-table", "page_current"),
+                Output("preview-table", "sort_by"),
+                Output("preview-table", "filter_query"),
             ],
-            Input("download-data", "n_clicks"),
+            Input({"type": "preview-file", "job": ALL, "index": ALL}, "n_clicks"),
+            State("session-jobs", "data"),
+        )
+        def handlePreviewFile(previewClicks, sessionJobs):
+            for t in dash.callback_context.triggered:
+                if t["value"]:
+                    button = json.loads(t["prop_id"].rsplit(".", 1)[0])
+                    picked = {"job": button["job"], "file": button["index"]}
+                    if self.previewPath(picked, sessionJobs):
+                        return picked, 0, [], ""
+            raise PreventUpdate
+
+        # Callback to send the page of the preview being looked at
+        @self.app.callback(
+            [
+                Output("preview-container", "style"),
+                Output("preview-summary", "children"),
+                Output("preview-table", "columns"),
+                Output("preview-table", "data"),
+                Output("preview-table", "page_count"),
+            ],
+            [
+                Input("preview-picked", "data"),
+                Input("preview-table", "page_current"),
+                Input("preview-table", "page_size"),
+                Input("preview-table", "sort_by"),
+                Input("preview-table", "filter_query"),
+            ],
+            [State("session-jobs", "data")],
         )
-        def downloadData(dataClick):
-            if dataClick and dataClick > 0 and self.id_dropdown.value:
-                # Fetch timeseries data via pyEX
-                # as a dataframe
-                df = self.client.timeSeriesDF(
-                    id=self.id_dropdown.value,
-                    key=self.key_dropdown.value,
-                    subkey=self.subkey_dropdown.value,
-                    range=self.range_dropdown.value,
-                    limit=5000,
+        def handlePreview(picked, page, pageSize, sortBy, filterQuery, sessionJobs):
+            path = self.previewPath(picked, sessionJobs)
+            if not path:
+                raise PreventUpdate
+            return self.previewPage(path, page, pageSize, sortBy, filterQuery)
+
+    def previewPath(self, picked, sessionJobs):
+        """Path of file `picked["file"]` of job `picked["job"]`, or None if
+        that job isn't one of `sessionJobs`. Only files downloaded in the
+        session can be previewed, so paths never come from the browser"""
+        if not isinstance(picked, dict) or picked.get("job") not in (sessionJobs or []):
+            return None
+        for job in self.jobs.status([picked["job"]]):
+            files = job.get("files", []) if job["status"] == "done" else []
+            index = picked.get("file")
+            if isinstance(index, int) and 0 <= index < len(files):
+                return files[index]
+        return None
+
+    def preview(self, path):
+        """`Preview` of the file at `path`, loaded again if it changed"""
+        key = (path, os.path.getmtime(path))
+        return self.previews.getOrSet(key, lambda: Preview(path))
+
+    def previewPage(
+        self, path, page=0, pageSize=_defaultPageSize, sortBy=None, filterQuery=""
+    ):
+        """(container style, summary, columns, records, page count) for a page
+        of the preview table"""
+        if not os.path.exists(path):
+            return {"display": "block"}, "File not found: {}".format(path), [], [], 1
+
+        preview = self.preview(path)
+        summary = preview.summary
+        try:
+            records, pages, matching = preview.page(
+                page or 0, pageSize or _defaultPageSize, sortBy, filterQuery
+            )
+        except ValueError as e:
+            # a filter that doesnt parse, or doesnt fit the column
+            return {"display": "block"}, str(e), preview.columns(), [], 1
+
+        nulls = ", ".join(
+            "{} {:,}".format(name, count)
+            for name, count in summary["nulls"].items()
+            if count
+        )
+        text = "{}: {:,} rows, {} to {}, nulls: {}".format(
+            os.path.basename(path),
+            summary["rows"],
+            summary["start"],
+            summary["end"],
+            nulls or "none",
+        )
+        if filterQuery:
+            text += " ({:,} matching)".format(matching)
+        return {"display": "block"}, text, preview.columns(), records, pages
+
+    def renderJob(self, job):
+        """One row of the jobs list, from a job status dict"""
+        active = job["status"] in ("queued", "running")
+        children = [
+            html.Span(
+                "{} {}: {} ".format(job["id"], job["description"], job["status"])
+            ),
+            html.Span(job["progress"] if active else job["result"]),
+        ]
+        files = job.get("files", []) if job["status"] == "done" else []
+        for index, path in enumerate(files):
+            children.append(
+                html.Button(
+                    "Preview {}".format(os.path.basename(path)),
+                    id={"type": "preview-file", "job": job["id"], "index": index},
+                    className="cloud-btn ml2",
                 )
-
-                # Check if the output folder exists
-                folderPath = os.path.abspath(
-                    os.path.expanduser(self.location_input.value)
+            )
+        if active:
+            children.append(
+                html.Button(
+                    "Cancel",
+                    id={"type": "cancel-job", "index": job["id"]},
+                    className="cloud-btn ml2",
                 )
-                if os.path.exists(folderPath):
-                    filename = "{}_{}_{}_{}.csv".format(
-                        self.id_dropdown.value,
-                        self.key_dropdown.value,
-                        self.subkey_dropdown.value,
-                        self.range_dropdown.value,
-                    )
+            )
+        return html.Div(className="flex mb2", children=children)
 
-                    pathName = os.path.join(folderPath, filename)
+    def runDownload(self, job, folderPath, series, format=_defaultFormat):
+        """Background job body, download `series` into `folderPath` as `format`"""
+        if len(series) == 1:
+            pathName = os.path.join(folderPath, filename(*series[0], format=format))
 
-                    # emit as CSV file
-                    df.to_csv(pathName)
+            def progress(rows, windowsDone, windowsTotal):
+                job.progress = "Downloaded {:,} rows ({}/{} windows)".format(
+                    rows, windowsDone, windowsTotal
+                )
 
-                    outputText = "Downloaded to {}".format(pathName)
-                else:
-                    outputText = "Folder does not exist: {}".format(
-                        self.location_input.value
-                    )
+            # Stream timeseries data via pyEX into
+            # the output file one date window at a time
+            rows = downloadTimeseries(
+                self.client,
+                pathName,
+                *series[0],
+                progress=progress,
+                format=format,
+                cancel=job.cancelled,
+            )
+            job.files = [pathName]
+            return "Downloaded {:,} rows to {}".format(rows, pathName)
 
-                return {"display": "block"}, outputText
-            return {"display": "none"}, ""
+        def batchProgress(jobsDone, jobsTotal, rows):
+            job.progress = "Downloaded {:,} rows ({}/{} series)".format(
+                rows, jobsDone, jobsTotal
+            )
+
+        # Download each series to its own
+        # file on a pool of workers
+        results = downloadBatch(
+            self.client,
+            folderPath,
+            series,
+            max_workers=self.max_workers,
+            progress=batchProgress,
+            cancel=job.cancelled,
+            format=format,
+        )
+        failed = [path for _, path, rows in results if isinstance(rows, Exception)]
+        job.files = [path for _, path, _ in results if path not in failed]
+        outputText = "Downloaded {} series to {}".format(
+            len(results) - len(failed), folderPath
+        )
+        if failed:
+            outputText += ", failed: {}".format(", ".join(failed))
+        return outputText
 
     def initializeData(self):
-        # set initial id dropdown
-        # to be all timeseries IDs
-        self.id_dropdown.options = [
-            {"label": x["value"], "value": x["value"]}
-            for x in self.client.queryMetadata()
-        ]
+        # load id/key/subkey listings in the background,
+        # id dropdown options are filled in once ready. This is
+        # also where the client is created
+        self.metadata.start()
+
+        if self.background_warmup:
+            threading.Thread(target=self.warmup, daemon=True).start()
+
+    def warmup(self):
+        """Import what the first download would otherwise wait on"""
+        import pandas  # noqa: F401
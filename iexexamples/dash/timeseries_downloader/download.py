@@ -0,0 +1,290 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import datetime
+import os
+import os.path
+import re
+import threading
+
+from .formats import _defaultFormat, extension, getWriter
+from .jobs import JobCancelled
+
+# Days per request window
+_defaultWindowDays = 30
+
+# Rows requested per window, windows returning this many are split
+_defaultPageSize = 5000
+
+# Most rows requested for a single day, days with more fail the download
+_maxPageSize = 200000
+
+# Series downloaded concurrently in a batch
+_defaultMaxWorkers = 4
+
+# Subkey value meaning "every subkey of the selected keys"
+WILDCARD = "*"
+
+_rangePattern = re.compile(r"^(\d+)([dwmy])$")
+_rangeUnits = {"d": "days", "w": "weeks", "m": "months", "y": "years"}
+
+
+def rangeStart(range, today=None):
+    """First date covered by a time-series range like `5d`, `3m`, `1y`"""
+    import pandas as pd
+
+    match = _rangePattern.match(range)
+    if not match:
+        raise ValueError("Unsupported range: {}".format(range))
+    today = pd.Timestamp(today or datetime.date.today())
+    n, unit = match.groups()
+    return (today - pd.DateOffset(**{_rangeUnits[unit]: int(n)})).date()
+
+
+def dateWindows(start, end, window_days=_defaultWindowDays):
+    """Split `start` to `end` (inclusive) into non-overlapping date windows"""
+    windows = []
+    step = datetime.timedelta(days=window_days)
+    while start <= end:
+        windowEnd = min(start + step - datetime.timedelta(days=1), end)
+        windows.append((start, windowEnd))
+        start = windowEnd + datetime.timedelta(days=1)
+    return windows
+
+
+def fetchWindow(client, start, end, page_size=_defaultPageSize, limiter=None, **kwargs):
+    """Yield dataframes covering `start` to `end`.
+
+    A window that comes back with `page_size` rows may have been
+    truncated, so it is split in half and each half fetched again. A
+    single day that does is fetched again with twice the limit, and
+    ValueError raised past `_maxPageSize` rather than keeping a truncated
+    day. If a `limiter` is provided, each request first takes a token
+    from it.
+    """
+    if limiter is not None:
+        limiter.acquire()
+
+    df = client.timeSeriesDF(
+        from_=start.strftime("%Y-%m-%d"),
+        to_=end.strftime("%Y-%m-%d"),
+        limit=page_size,
+        **kwargs,
+    )
+
+    if len(df) >= page_size:
+        if start < end:
+            mid = start + (end - start) // 2
+            yield from fetchWindow(client, start, mid, page_size, limiter, **kwargs)
+            yield from fetchWindow(
+                client,
+                mid + datetime.timedelta(days=1),
+                end,
+                page_size,
+                limiter,
+                **kwargs,
+            )
+            return
+
+        if page_size >= _maxPageSize:
+            raise ValueError(
+                "{} has more than {} rows on {}".format(
+                    kwargs.get("id"), page_size, start
+                )
+            )
+        yield from fetchWindow(
+            client, start, end, min(page_size * 2, _maxPageSize), limiter, **kwargs
+        )
+        return
+    yield df
+
+
+def streamTimeseries(
+    client,
+    id,
+    key,
+    subkey,
+    range,
+    window_days=_defaultWindowDays,
+    page_size=_defaultPageSize,
+    progress=None,
+    today=None,
+    limiter=None,
+    cancel=None,
+):
+    """Yield a time-series as a sequence of dataframes, oldest window first.
+
+    Args:
+        client (pyEX.Client): client to fetch with
+        id, key, subkey (str): the time-series to fetch
+        range (str): date range, e.g. `1m`
+        window_days (int): days per request
+        page_size (int): rows per request, windows this full are split
+        progress (callable): called as `progress(windowsDone, windowsTotal)`
+        today (date): end of the range, defaults to today
+        limiter (TokenBucket): rate limiter shared between requests
+        cancel (threading.Event): stop with JobCancelled once set
+    """
+    today = today or datetime.date.today()
+    windows = dateWindows(rangeStart(range, today), today, window_days)
+
+    for i, (start, end) in enumerate(windows):
+        if cancel is not None and cancel.is_set():
+            raise JobCancelled()
+
+        for df in fetchWindow(
+            client, start, end, page_size, limiter, id=id, key=key, subkey=subkey
+        ):
+            if not df.empty:
+                yield df
+        if progress:
+            progress(i + 1, len(windows))
+
+
+def downloadTimeseries(
+    client,
+    path,
+    id,
+    key,
+    subkey,
+    range,
+    progress=None,
+    format=_defaultFormat,
+    **kwargs,
+):
+    """Stream a time-series to the file at `path` one window at a time.
+
+    Only one window is held in memory at once. `format` is one of the
+    formats in formats.py, e.g. `csv`, `csv.gz` or `parquet`. Returns the
+    number of rows written. `progress` is called as
+    `progress(rows, windowsDone, windowsTotal)`. Columns are kept in the
+    order they are first seen, see formats.py.
+
+    The series is written to a temporary file next to `path`, which
+    replaces it once complete, so readers never see a partial file and a
+    failed or cancelled download leaves an earlier one in place.
+    """
+    tmp = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    writer = getWriter(format, tmp)
+
+    def onWindow(done, total):
+        if progress:
+            progress(writer.rows, done, total)
+
+    try:
+        with writer:
+            for df in streamTimeseries(
+                client, id, key, subkey, range, progress=onWindow, **kwargs
+            ):
+                writer.write(df)
+        os.replace(tmp, path)
+    finally:
+        # dont leave a partial file behind on failure or cancellation
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return writer.rows
+
+
+def filename(id, key, subkey, range, format=_defaultFormat):
+    """Output filename for a single series, the extension follows `format`"""
+    return "{}_{}_{}_{}.{}".format(id, key, subkey, range, extension(format))
+
+
+def expandJobs(metadata, id, keys, subkeys, range):
+    """Expand a selection of keys and subkeys into one job per series.
+
+    `keys` and `subkeys` may be single values or lists. A `WILDCARD`
+    subkey selects every subkey of each key. With no subkeys selected,
+    each key is downloaded without a subkey.
+
+    Returns a list of `(id, key, subkey, range)` tuples.
+    """
+    if not isinstance(keys, (list, tuple)):
+        keys = [keys]
+    if not isinstance(subkeys, (list, tuple)):
+        subkeys = [subkeys] if subkeys else []
+
+    jobs = []
+    for key in keys:
+        if WILDCARD in subkeys:
+            keySubkeys = metadata.subkeys(id, key) or [None]
+        else:
+            keySubkeys = subkeys or [None]
+
+        for subkey in keySubkeys:
+            job = (id, key, subkey, range)
+            if job not in jobs:
+                jobs.append(job)
+    return jobs
+
+
+def downloadBatch(
+    client,
+    folder,
+    jobs,
+    max_workers=_defaultMaxWorkers,
+    limiter=None,
+    progress=None,
+    cancel=None,
+    format=_defaultFormat,
+    **kwargs,
+):
+    """Download each `(id, key, subkey, range)` job to its own file in `folder`.
+
+    Jobs run on a pool of `max_workers` threads, and all requests share
+    `limiter`. `progress` is called as `progress(jobsDone, jobsTotal, rows)`
+    as each job finishes. Once `cancel` is set, queued jobs are dropped,
+    running ones stop at their next window, and JobCancelled is raised.
+
+    Returns a list of `(job, path, rows or exception)` in job order.
+    """
+    results = {}
+    rows = 0
+
+    def run(job):
+        id, key, subkey, range = job
+        path = os.path.join(folder, filename(id, key, subkey, range, format))
+        return path, downloadTimeseries(
+            client,
+            path,
+            id,
+            key,
+            subkey,
+            range,
+            limiter=limiter,
+            cancel=cancel,
+            format=format,
+            **kwargs,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                path, count = future.result()
+                results[job] = (job, path, count)
+            except Exception as e:
+                # keep going, report failures at the end
+                path = os.path.join(folder, filename(*job, format=format))
+                results[job] = (job, path, e)
+                count = 0
+
+            rows += count
+            if progress:
+                progress(len(results), len(jobs), rows)
+
+            if cancel is not None and cancel.is_set():
+                # drop anything that hasnt started yet
+                for other in futures:
+                    other.cancel()
+
+    if cancel is not None and cancel.is_set():
+        raise JobCancelled()
+    return [results[job] for job in jobs]
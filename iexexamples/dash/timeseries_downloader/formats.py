@@ -0,0 +1,432 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Output formats for downloaded time-series.
+
+Each writer takes a series one dataframe (date window) at a time, so only
+one window is held in memory whatever the format, and `read` loads a
+written file back as a single dataframe. The binary formats and
+zstd need pyarrow (`pip install -e .[arrow]`).
+
+Columns can come and go between windows, as IEX leaves out fields that
+are empty. A column first seen in a later window is added to the file
+written so far, and in the binary formats a column that was empty, so
+typed null, takes the type of the values that turn up later. Either way
+the file so far is rewritten once, a batch at a time.
+"""
+
+import csv
+import gzip
+import importlib.util
+import io
+import os
+import tempfile
+import threading
+import time
+
+_defaultFormat = "csv"
+
+
+def _hasArrow():
+    # without importing it, pyarrow is slow to import
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class Writer(object):
+    """Base class for a streaming writer to the file at `path`.
+
+    Use as a context manager, calling `write(df)` once per window.
+    Subclasses implement `writeWindow`, which gets every window with the
+    same columns, in the order they were first seen.
+    """
+
+    extension = ""
+    requires_arrow = False
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.columns = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        pass
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        new = [column for column in df.columns if column not in self.columns]
+        if new:
+            self.columns += new
+            self.widen(new)
+        self.writeWindow(df.reindex(columns=self.columns))
+
+    def writeWindow(self, df):
+        raise NotImplementedError()
+
+    def widen(self, columns):
+        """Make room for `columns`, first seen after some rows were written"""
+        pass
+
+    def close(self):
+        pass
+
+    def _aside(self):
+        """Where the file so far is moved while it is rewritten"""
+        return "{}.{}.{}.tmp".format(self.path, os.getpid(), threading.get_ident())
+
+    @classmethod
+    def read(cls, path):
+        """The frame written to `path`, with the row index dropped"""
+        raise NotImplementedError()
+
+
+class CSVWriter(Writer):
+    """CSV, with a row index continuing across windows as one big to_csv would"""
+
+    extension = "csv"
+
+    def open(self):
+        self._fp = open(self.path, "w", newline="")
+
+    def openRead(self, path):
+        return open(path, "r", newline="")
+
+    def writeWindow(self, df):
+        import pandas as pd
+
+        df = df.set_axis(pd.RangeIndex(self.rows, self.rows + len(df)), axis=0)
+        df.to_csv(self._fp, header=self.rows == 0)
+        self.rows += len(df)
+
+    def widen(self, columns):
+        """Rewrite the rows so far with `columns` added, empty, at the end"""
+        if not self.rows:
+            # the header isnt written yet
+            return
+
+        self.close()
+        aside = self._aside()
+        os.replace(self.path, aside)
+        try:
+            self.open()
+            # the same quoting and line ends to_csv writes
+            writer = csv.writer(self._fp, lineterminator=os.linesep)
+            with self.openRead(aside) as fp:
+                for i, row in enumerate(csv.reader(fp)):
+                    added = [str(c) for c in columns] if i == 0 else [""] * len(columns)
+                    writer.writerow(row + added)
+        finally:
+            os.remove(aside)
+
+    def close(self):
+        self._fp.close()
+
+    @classmethod
+    def read(cls, path):
+        import pandas as pd
+
+        # compression follows the extension
+        return _parseDates(pd.read_csv(path, index_col=0).reset_index(drop=True))
+
+
+class GzipCSVWriter(CSVWriter):
+    extension = "csv.gz"
+
+    def open(self):
+        # fast compression level, downloads are usually network bound anyway
+        self._fp = gzip.open(self.path, "wt", newline="", compresslevel=1)
+
+    def openRead(self, path):
+        return gzip.open(path, "rt", newline="")
+
+
+class ZstdCSVWriter(CSVWriter):
+    extension = "csv.zst"
+    requires_arrow = True
+
+    def open(self):
+        import pyarrow as pa
+
+        self._stream = pa.CompressedOutputStream(self.path, "zstd")
+        self._fp = io.TextIOWrapper(self._stream, newline="")
+
+    def openRead(self, path):
+        import pyarrow as pa
+
+        return io.TextIOWrapper(pa.CompressedInputStream(path, "zstd"), newline="")
+
+    def close(self):
+        # closing the text wrapper flushes and closes the stream too
+        self._fp.close()
+
+    @classmethod
+    def read(cls, path):
+        import pandas as pd
+        import pyarrow as pa
+
+        # pandas needs zstandard for this, pyarrow can do it too
+        with pa.CompressedInputStream(path, "zstd") as fp:
+            df = pd.read_csv(fp, index_col=0)
+        return _parseDates(df.reset_index(drop=True))
+
+
+class ArrowWriter(Writer):
+    """Base class for pyarrow writers. The schema is taken from the first
+    window, and widened, rewriting the file so far, when a later window
+    doesnt fit it"""
+
+    requires_arrow = True
+
+    def open(self):
+        self._writer = None
+        self._schema = None
+
+    def writeWindow(self, df):
+        import pyarrow as pa
+
+        # the row index is just a counter, dont store it
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self.newWriter(table.schema)
+        elif not table.schema.equals(self._schema):
+            try:
+                table = _conform(table, self._schema)
+            except (ValueError, pa.ArrowNotImplementedError):
+                # a new column, or values in one that was empty so far
+                table = self.restart(table)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def restart(self, table):
+        """Rewrite the file so far with a schema `table` fits too, and
+        return `table` in it"""
+        import pyarrow as pa
+
+        schema = pa.unify_schemas(
+            [table.schema, self._schema], promote_options="permissive"
+        )
+        self._writer.close()
+        aside = self._aside()
+        os.replace(self.path, aside)
+        try:
+            self._schema = schema
+            self._writer = self.newWriter(schema)
+            for batch in self.batches(aside):
+                written = pa.Table.from_batches([batch])
+                self._writer.write_table(_conform(written, schema))
+        finally:
+            os.remove(aside)
+        return _conform(table, schema)
+
+    def batches(self, path):
+        """Record batches of the file at `path`, one at a time"""
+        raise NotImplementedError()
+
+    def close(self):
+        if self._writer is None:
+            # nothing written, still leave a valid empty file
+            import pyarrow as pa
+
+            self._writer = self.newWriter(pa.schema([]))
+        self._writer.close()
+
+    def newWriter(self, schema):
+        raise NotImplementedError()
+
+
+class ParquetWriter(ArrowWriter):
+    extension = "parquet"
+    compression = "snappy"
+
+    def newWriter(self, schema):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(self.path, schema, compression=self.compression)
+
+    def batches(self, path):
+        import pyarrow.parquet as pq
+
+        with pq.ParquetFile(path) as fp:
+            yield from fp.iter_batches()
+
+    @classmethod
+    def read(cls, path):
+        import pandas as pd
+
+        return pd.read_parquet(path)
+
+
+class ZstdParquetWriter(ParquetWriter):
+    compression = "zstd"
+
+
+class FeatherWriter(ArrowWriter):
+    """Feather v2, i.e. the Arrow IPC file format, uncompressed so
+    readers can memory-map it"""
+
+    extension = "feather"
+
+    def newWriter(self, schema):
+        import pyarrow as pa
+
+        return pa.ipc.new_file(self.path, schema)
+
+    def batches(self, path):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+    @classmethod
+    def read(cls, path):
+        import pyarrow.feather as feather
+
+        # memory-mapped, only copied where pandas needs its own layout
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def _conform(table, schema):
+    """`table` cast to `schema`, columns it lacks added as nulls. Raises
+    ValueError or ArrowNotImplementedError if its values dont fit"""
+    import pyarrow as pa
+
+    extra = set(table.column_names) - set(schema.names)
+    if extra:
+        raise ValueError("Columns not in the file: {}".format(sorted(extra)))
+
+    columns = []
+    for field in schema:
+        if field.name not in table.column_names:
+            columns.append(pa.nulls(len(table), field.type))
+            continue
+        column = table.column(field.name)
+        if column.null_count == len(column):
+            # an empty column fits any type
+            columns.append(pa.nulls(len(column), field.type))
+        else:
+            columns.append(column.cast(field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _parseDates(df):
+    """CSV has no types, parse the `date` column back into dates"""
+    import pandas as pd
+
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
+
+
+# format -> (label, writer)
+_formats = {
+    "csv": ("CSV", CSVWriter),
+    "csv.gz": ("CSV (gzip)", GzipCSVWriter),
+    "csv.zst": ("CSV (zstd)", ZstdCSVWriter),
+    "parquet": ("Parquet (snappy)", ParquetWriter),
+    "parquet-zstd": ("Parquet (zstd)", ZstdParquetWriter),
+    "feather": ("Feather / Arrow IPC", FeatherWriter),
+}
+
+
+def formats():
+    """Formats usable in this environment, as (format, label) pairs"""
+    arrow = _hasArrow()
+    return [
+        (format, label)
+        for format, (label, writer) in _formats.items()
+        if arrow or not writer.requires_arrow
+    ]
+
+
+def getWriter(format, path):
+    """Construct a writer for `format` writing to `path`"""
+    if format not in _formats:
+        raise ValueError(
+            "Unknown format: {} (expected one of {})".format(
+                format, ", ".join(_formats)
+            )
+        )
+    return _formats[format][1](path)
+
+
+def formatOf(path):
+    """Format of a file written by one of the writers, from its extension.
+    Formats sharing an extension read the same, either will do"""
+    # longest extension first, so `csv.gz` isnt taken for `gz`
+    for format, (_, writer) in sorted(
+        _formats.items(), key=lambda item: -len(item[1][1].extension)
+    ):
+        if path.endswith("." + writer.extension):
+            return format
+    raise ValueError(
+        "Unknown format: {} (expected one of {})".format(
+            path, ", ".join(sorted({w.extension for _, w in _formats.values()}))
+        )
+    )
+
+
+def read(path):
+    """Load a file written by one of the writers back as one frame"""
+    return _formats[formatOf(path)][1].read(path)
+
+
+def extension(format):
+    """File extension for `format`, e.g. `csv.gz`"""
+    return getWriter(format, None).extension
+
+
+def measure(rows=1000000, windows=20, folder=None):
+    """Write `rows` rows of a representative series in `windows` chunks
+    with each available format, returning a list of
+    `(format, seconds, rows per second, file bytes)`"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "date": pd.date_range("2000-01-01", periods=rows, freq="min"),
+            "id": "HISTORICAL_PRICES",
+            "key": rng.choice(["AAPL", "MSFT", "SPY", "IBM"], rows),
+            "open": rng.normal(100, 10, rows).round(2),
+            "close": rng.normal(100, 10, rows).round(2),
+            "volume": rng.integers(0, 1000000, rows),
+        }
+    )
+    chunks = np.array_split(np.arange(rows), windows)
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=folder) as tmp:
+        for format, _ in formats():
+            path = os.path.join(tmp, "out." + extension(format))
+            start = time.perf_counter()
+            with getWriter(format, path) as writer:
+                for chunk in chunks:
+                    writer.write(df.iloc[chunk])
+            elapsed = time.perf_counter() - start
+            results.append((format, elapsed, rows / elapsed, os.path.getsize(path)))
+    return results
+
+
+if __name__ == "__main__":
+    # python -m iexexamples.dash.timeseries_downloader.formats
+    for format, elapsed, rate, size in measure():
+        print(
+            "{:>12}: {:6.2f}s {:>12,.0f} rows/s {:>8.1f} MB".format(
+                format, elapsed, rate, size / 1e6
+            )
+        )
@@ -0,0 +1,246 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import os.path
+import re
+import threading
+import time
+import uuid
+
+# Jobs run concurrently
+_defaultMaxJobs = 2
+
+# Finished jobs kept around for display
+_defaultKeep = 20
+
+# Seconds between checks for cancellations requested by other processes
+_watchInterval = 0.5
+
+# Job ids as generated by JobQueue.submit, anything else never names a file
+_idPattern = re.compile(r"[0-9a-f]{12}")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been asked to stop"""
+
+
+class Job(object):
+    """A unit of background work, see JobQueue.
+
+    The job function is called with the job itself, and can report
+    progress by setting `job.progress` and should check `job.cancelled`
+    (or call `job.checkCancelled()`) regularly.
+    """
+
+    def __init__(self, id, description, onChange=None):
+        self.id = id
+        self.description = description
+        self.onChange = onChange
+
+        # queued, running, done, failed, cancelled
+        self.status = "queued"
+        self.result = ""
+        self._progress = ""
+
+        # paths of files the job wrote
+        self.files = []
+
+        self.cancelled = threading.Event()
+        self.future = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def progress(self):
+        return self._progress
+
+    @progress.setter
+    def progress(self, value):
+        self._progress = value
+        self._changed()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def checkCancelled(self):
+        if self.cancelled.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """Ask the job to stop. Queued jobs never start, running jobs
+        stop the next time they check `cancelled`"""
+        self.cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self._finish("cancelled")
+
+    def asDict(self):
+        return {
+            "id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "files": self.files,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    def _start(self):
+        self.status = "running"
+        self._changed()
+
+    def _finish(self, status, result=""):
+        self.status = status
+        self.result = result
+        self.finished = time.time()
+        self._changed()
+
+    def _changed(self):
+        if self.onChange is not None:
+            self.onChange(self)
+
+
+class JobQueue(object):
+    """Thread pool running jobs in the background of a Dash app.
+
+    Jobs run in the process that submitted them. If `state_dir` is set,
+    job status is mirrored to JSON files there, so that other processes
+    sharing the folder (e.g. other gunicorn workers) can show and cancel
+    them too.
+
+    Args:
+        max_workers (int): jobs run concurrently, others wait queued
+        keep (int): finished jobs kept for display
+        state_dir (str): folder to share job status through
+    """
+
+    def __init__(self, max_workers=_defaultMaxJobs, keep=_defaultKeep, state_dir=None):
+        self.keep = keep
+        self.state_dir = state_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def submit(self, description, func, *args, **kwargs):
+        """Queue `func(job, *args, **kwargs)`, returning the `Job`.
+        Whatever `func` returns becomes `job.result`"""
+        job = Job(uuid.uuid4().hex[:12], description, onChange=self._persist)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._persist(job)
+        self._startWatcher()
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, id):
+        return self._jobs.get(id)
+
+    def jobs(self):
+        """All jobs in this process, newest first"""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: -job.created)
+
+    def status(self, ids):
+        """Status dicts for job `ids`, newest first, including jobs
+        running in other processes sharing `state_dir`"""
+        ret = []
+        for id in ids:
+            job = self.get(id)
+            if job is not None:
+                ret.append(job.asDict())
+            elif self.state_dir and _validId(id) and os.path.exists(self._path(id)):
+                try:
+                    with open(self._path(id), "r") as fp:
+                        ret.append(json.load(fp))
+                except ValueError:
+                    # mid-write by another process, skip this round
+                    pass
+        return sorted(ret, key=lambda job: -job["created"])
+
+    def cancel(self, id):
+        job = self.get(id)
+        if job is not None:
+            job.cancel()
+        elif self.state_dir and _validId(id):
+            # running elsewhere, leave a marker for its process to pick up
+            open(self._path(id, ".cancel"), "w").close()
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancelled.is_set():
+            job._finish("cancelled")
+            return
+
+        job._start()
+        try:
+            job._finish("done", func(job, *args, **kwargs))
+        except JobCancelled:
+            job._finish("cancelled")
+        except Exception as e:
+            job._finish("failed", str(e))
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if not job.active]
+        finished.sort(key=lambda job: job.created)
+        for job in finished[: max(len(finished) - self.keep, 0)]:
+            del self._jobs[job.id]
+            for suffix in (".json", ".cancel"):
+                if self.state_dir and os.path.exists(self._path(job.id, suffix)):
+                    os.remove(self._path(job.id, suffix))
+
+    def _path(self, id, suffix=".json"):
+        if not _validId(id):
+            # ids come from the browser, dont let them walk the filesystem
+            raise ValueError("Invalid job id: {!r}".format(id))
+        return os.path.join(self.state_dir, "{}{}".format(id, suffix))
+
+    def _persist(self, job):
+        if not self.state_dir:
+            return
+
+        # write then move so readers never see a partial file. The temporary
+        # file is per process and thread, as server workers share the folder
+        path = self._path(job.id)
+        tmp = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp, "w") as fp:
+                json.dump(job.asDict(), fp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _startWatcher(self):
+        if not self.state_dir or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        """pick up cancellations requested by other processes"""
+        while True:
+            for job in self.jobs():
+                if job.active and os.path.exists(self._path(job.id, ".cancel")):
+                    job.cancel()
+            time.sleep(_watchInterval)
+
+
+def _validId(id):
+    return isinstance(id, str) and _idPattern.fullmatch(id) is not None
@@ -0,0 +1,159 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import json
+import os
+import os.path
+import threading
+import time
+
+from ...utils import cacheDir
+
+# Seconds before a cached id/key/subkey listing is refreshed
+_defaultTTL = 24 * 60 * 60
+
+
+class MetadataIndex(object):
+    """In-memory id -> key -> subkey index of time-series metadata,
+    persisted to disk between runs.
+
+    Listings are fetched with `client.queryMetadata` the first time they
+    are needed and served from memory afterwards. Listings older than
+    `ttl` are still served, but refreshed in a background thread.
+
+    Args:
+        client (pyEX.Client): client to query metadata with
+        path (str): JSON file to persist the index to, defaults to
+                    metadata_index.json in the cache folder
+        ttl (float): seconds before a listing is refreshed
+        timer (callable): wall clock, overridable for testing
+    """
+
+    def __init__(self, client, path=None, ttl=_defaultTTL, timer=time.time):
+        self.client = client
+        self.path = path or os.path.join(cacheDir(), "metadata_index.json")
+        self.ttl = ttl
+        self.timer = timer
+
+        # "ids" -> entry, "keys" -> {id: entry}, "subkeys" -> {id: {key: entry}}
+        # where an entry is {"fetched": timestamp, "values": [...]}
+        self._index = {"ids": None, "keys": {}, "subkeys": {}}
+        self._lock = threading.RLock()
+
+        # listings currently being refreshed in the background
+        self._refreshing = set()
+
+        # set once the id listing is available
+        self.ready = threading.Event()
+
+    def start(self):
+        """Warm the index in a background thread"""
+        thread = threading.Thread(target=self.warm, daemon=True)
+        thread.start()
+        return thread
+
+    def warm(self):
+        """Load the index from disk, then make sure ids are available"""
+        try:
+            self.load()
+            self.ids(wait=True)
+        except Exception as e:
+            print("Could not load time-series metadata: {}".format(e))
+        finally:
+            self.ready.set()
+
+    def ids(self, wait=False):
+        """All timeseries IDs. Returns [] until the index is warm unless `wait`"""
+        if not wait and not self.ready.is_set() and self._index["ids"] is None:
+            return []
+        return self._lookup(("ids",), lambda: self.client.queryMetadata())
+
+    def keys(self, id):
+        """All keys for timeseries `id`"""
+        return self._lookup(("keys", id), lambda: self.client.queryMetadata(id=id))
+
+    def subkeys(self, id, key):
+        """All subkeys for timeseries `id` and `key`"""
+        return self._lookup(
+            ("subkeys", id, key), lambda: self.client.queryMetadata(id=id, key=key)
+        )
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as fp:
+            index = json.load(fp)
+        with self._lock:
+            self._index = index
+        if index.get("ids") is not None:
+            self.ready.set()
+
+    def save(self):
+        """Persist the index. Failures are only logged, the index in memory
+        is still good and the dropdowns shouldnt break over it"""
+        # write then move so readers never see a partial file. One save at
+        # a time here, and a temporary file per process for server workers
+        # sharing the folder
+        tmp = "{}.{}.{}.tmp".format(self.path, os.getpid(), threading.get_ident())
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp, "w") as fp:
+                    json.dump(self._index, fp)
+                os.replace(tmp, self.path)
+            except (OSError, TypeError, ValueError) as e:
+                print("Could not save time-series metadata: {}".format(e))
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def _get(self, path):
+        node = self._index
+        for part in path:
+            if node is None:
+                return None
+            node = node.get(part)
+        return node
+
+    def _set(self, path, entry):
+        with self._lock:
+            node = self._index
+            for part in path[:-1]:
+                node = node.setdefault(part, {})
+            node[path[-1]] = entry
+
+    def _fetch(self, path, query):
+        values = [x["value"] for x in query()]
+        self._set(path, {"fetched": self.timer(), "values": values})
+        self.save()
+        return values
+
+    def _refresh(self, path, query):
+        try:
+            self._fetch(path, query)
+        except Exception as e:
+            print("Could not refresh time-series metadata {}: {}".format(path, e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(path)
+
+    def _lookup(self, path, query):
+        with self._lock:
+            entry = self._get(path)
+
+        if entry is None:
+            # never seen, so fetch now
+            return self._fetch(path, query)
+
+        if self.timer() - entry["fetched"] > self.ttl:
+            # stale, serve what we have and refresh in the background
+            with self._lock:
+                if path not in self._refreshing:
+                    self._refreshing.add(path)
+                    threading.Thread(
+                        target=self._refresh, args=(path, query), daemon=True
+                    ).start()
+        return entry["values"]
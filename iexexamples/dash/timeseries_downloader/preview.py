@@ -0,0 +1,192 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Server-side preview of a downloaded series, for a paged table.
+
+The file is loaded on the server, and only the page of rows being looked
+at is sent to the browser. Sorting and filtering follow dash_table's
+`sort_by` and `filter_query` (with `sort_action` and `filter_action` set
+to "custom"), and the row order of the last query is kept, so paging
+through it is a slice.
+"""
+
+import json
+import re
+import threading
+
+from .formats import read
+
+# Rows per page of the preview table
+_defaultPageSize = 50
+
+# One clause of a filter query, e.g. `{close} >= 100` or `{key} contains AAPL`
+_clausePattern = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s+(?P<operator>\S+)\s*(?P<value>.*)$"
+)
+
+# dash_table filter operators, by symbol or name
+_operators = {
+    "=": "eq",
+    "eq": "eq",
+    "!=": "ne",
+    "ne": "ne",
+    "<": "lt",
+    "lt": "lt",
+    "<=": "le",
+    "le": "le",
+    ">": "gt",
+    "gt": "gt",
+    ">=": "ge",
+    "ge": "ge",
+    "contains": "contains",
+    "datestartswith": "datestartswith",
+}
+
+
+def parseFilter(query):
+    """`(column, operator, value)` clauses of a dash_table filter query.
+    Only clauses joined with `&&` are supported, as the table writes them"""
+    clauses = []
+    for part in (query or "").split(" && "):
+        part = part.strip()
+        if not part:
+            continue
+        match = _clausePattern.match(part)
+        if not match or match.group("operator") not in _operators:
+            raise ValueError("Unsupported filter: {}".format(part))
+
+        value = match.group("value").strip()
+        if len(value) > 1 and value[0] in "\"'`" and value[-1] == value[0]:
+            value = value[1:-1]
+        clauses.append(
+            (match.group("column"), _operators[match.group("operator")], value)
+        )
+    return clauses
+
+
+def summarize(df):
+    """Row count, first and last date, and nulls per column of `df`"""
+    # one pass over every column for the null counts
+    nulls = df.isna().sum()
+    dates = df["date"].dropna() if "date" in df.columns else df.iloc[:0, 0]
+    return {
+        "rows": len(df),
+        "start": _text(dates.min()) if len(dates) else None,
+        "end": _text(dates.max()) if len(dates) else None,
+        "nulls": {str(k): int(v) for k, v in nulls.items()},
+    }
+
+
+class Preview(object):
+    """A downloaded file, loaded once and served a page at a time.
+
+    Args:
+        path (str): file written by one of the writers in formats.py
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.df = read(path)
+        self.summary = summarize(self.df)
+
+        # (sort, filter) of the last query and its row positions
+        self._view = None
+        self._lock = threading.Lock()
+
+    def columns(self):
+        """dash_table column definitions, typed so that the table writes
+        filters that compare numbers and dates rather than text"""
+        import pandas as pd
+
+        columns = []
+        for name, dtype in self.df.dtypes.items():
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                type = "datetime"
+            elif pd.api.types.is_numeric_dtype(dtype):
+                type = "numeric"
+            else:
+                type = "text"
+            columns.append({"name": str(name), "id": str(name), "type": type})
+        return columns
+
+    def page(self, page=0, page_size=_defaultPageSize, sort_by=None, filter_query=""):
+        """(records of page `page`, number of pages, rows matching the filter)"""
+        # both come from the browser
+        page = max(page, 0)
+        page_size = max(page_size, 1)
+        positions = self.view(sort_by, filter_query)
+        start = page * page_size
+        rows = self.df.iloc[positions[start : start + page_size]]
+        pages = max(-(-len(positions) // page_size), 1)
+        return _records(rows), pages, len(positions)
+
+    def view(self, sort_by=None, filter_query=""):
+        """Row positions matching `filter_query`, in `sort_by` order"""
+        import numpy as np
+
+        key = (json.dumps(sort_by or [], sort_keys=True), filter_query or "")
+        with self._lock:
+            if self._view is not None and self._view[0] == key:
+                return self._view[1]
+
+        positions = np.flatnonzero(self.mask(parseFilter(filter_query)))
+        if sort_by:
+            # positional index, so the sorted labels are positions too
+            rows = self.df.iloc[positions][[s["column_id"] for s in sort_by]]
+            order = (
+                rows.reset_index(drop=True)
+                .sort_values(
+                    by=list(rows.columns),
+                    ascending=[s["direction"] == "asc" for s in sort_by],
+                    kind="stable",
+                    na_position="last",
+                )
+                .index.to_numpy()
+            )
+            positions = positions[order]
+
+        with self._lock:
+            self._view = (key, positions)
+        return positions
+
+    def mask(self, clauses):
+        """Rows matching every `(column, operator, value)` clause"""
+        import numpy as np
+        import pandas as pd
+
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, operator, value in clauses:
+            if column not in self.df.columns:
+                raise ValueError("Unknown column: {}".format(column))
+            series = self.df[column]
+
+            if operator == "contains":
+                match = series.astype(str).str.contains(value, regex=False)
+            elif operator == "datestartswith":
+                match = series.astype(str).str.startswith(value)
+            else:
+                if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                    value = pd.Timestamp(value)
+                elif pd.api.types.is_numeric_dtype(series.dtype):
+                    value = float(value)
+                match = getattr(series, operator)(value)
+            mask &= match.to_numpy(dtype=bool)
+        return mask
+
+
+def _records(rows):
+    """`rows` as JSON-ready records, dates as text and nulls as None"""
+    rows = rows.astype(object).where(rows.notna(), None)
+    for name in rows.columns:
+        rows[name] = [_text(x) if hasattr(x, "isoformat") else x for x in rows[name]]
+    return rows.to_dict("records")
+
+
+def _text(date):
+    """`date` as text, without the time for daily series"""
+    text = str(date)
+    return text[: -len(" 00:00:00")] if text.endswith(" 00:00:00") else text
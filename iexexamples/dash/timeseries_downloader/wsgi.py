@@ -0,0 +1,23 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+# Production entry point, e.g.
+#   gunicorn -w 4 -b 0.0.0.0:8050 iexexamples.dash.timeseries_downloader.wsgi:server
+#
+# Downloads run in whichever worker process accepted them, their status is
+# shared with the other workers through files in IEX_JOBS_DIR.
+import os
+import os.path
+
+from ...utils import cacheDir
+from .app import TimeseriesDownloader
+
+app = TimeseriesDownloader(
+    jobs_dir=os.environ.get("IEX_JOBS_DIR", os.path.join(cacheDir(), "jobs")),
+    metrics=True,
+)
+server = app.app.server
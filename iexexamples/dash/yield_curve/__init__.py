@@ -7,4 +7,12 @@
 #
 
 from .app import YieldCurveApp
-from .charts import yieldCurveSurface, lineOverlay
+
+
+def __getattr__(name):
+    # charts.py imports plotly, only when its functions are asked for
+    if name in ("yieldCurveSurface", "lineOverlay"):
+        from . import charts
+
+        return getattr(charts, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -5,9 +5,17 @@
 # This file is part of the iexexamples library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import sys
 
 from .app import YieldCurveApp
 
 if __name__ == "__main__":
-    app = YieldCurveApp()
-    app.debug()
+    if "--startup-time" in sys.argv:
+        # python -m iexexamples.dash.yield_curve --startup-time
+        from ...utils.startup import printStartup
+
+        printStartup("iexexamples.dash.yield_curve", "YieldCurveApp")
+    else:
+        # --live to poll for new data, e.g. with IEX_CLIENT_MODE=playback
+        app = YieldCurveApp(live="--live" in sys.argv)
+        app.debug()
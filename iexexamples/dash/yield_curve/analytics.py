@@ -0,0 +1,256 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Analytics of the yield curve history: spreads, inversions and factors.
+
+Everything is computed with whole-column NumPy/pandas operations over the
+curve frame (dates by curves, shortest maturity first, as `YieldCurveApp.df`):
+
+- `spreads`: long minus short curve, e.g. 10Y-2Y and 10Y-3M
+- `inversions`: episodes of a spread below zero, with their length and trough
+- `factors`: principal components of the curves, i.e. level, slope and
+  curvature, their loadings per curve and share of the variance
+
+`CurveAnalytics` keeps all of them up to date as dates are appended,
+touching only the new rows where it can.
+"""
+
+import numpy as np
+
+# Spread name -> (long curve, short curve)
+_spreads = {
+    "10Y-2Y": ("10 Year", "2 Year"),
+    "10Y-3M": ("10 Year", "3 Month"),
+}
+
+# Names of the leading principal components of a yield curve
+_factorNames = ("level", "slope", "curvature")
+
+
+def spreads(df, pairs=_spreads):
+    """Spread between each pair of curves in `df`, long minus short"""
+    import pandas as pd
+
+    # by position, selecting columns by name costs more than the subtraction
+    longs = df.columns.get_indexer([long for long, _ in pairs.values()])
+    shorts = df.columns.get_indexer([short for _, short in pairs.values()])
+    if (longs < 0).any() or (shorts < 0).any():
+        raise KeyError("Spread curves missing from {}".format(list(df.columns)))
+
+    values = df.values
+    return pd.DataFrame(
+        values[:, longs] - values[:, shorts], index=df.index, columns=list(pairs)
+    )
+
+
+def inversions(spreads):
+    """Episodes of each spread in `spreads` below zero, one row per episode
+    with the spread, its first and last inverted dates, the number of dates
+    inverted and the trough (lowest spread), ordered by start and spread"""
+    return _episodeFrame(_episodes(spreads))
+
+
+def _episodes(spreads):
+    """`inversions` as a dict of unsorted arrays"""
+    values = spreads.values
+    rows, cols = values.shape
+
+    # +1 where an inverted run starts, -1 just after it ends, per column
+    inverted = np.zeros((rows + 2, cols), dtype="int8")
+    inverted[1:-1] = values < 0
+    edges = np.diff(inverted, axis=0)
+
+    # (spread, date) of each start and end, column by column so that the
+    # n-th start and end of a spread pair up
+    startCols, starts = np.nonzero(edges.T == 1)
+    _, ends = np.nonzero(edges.T == -1)
+
+    # lowest spread between each start and end, over the columns laid end
+    # to end (plus a sentinel for runs ending on the last date)
+    flat = np.r_[values.T.ravel(), 0]
+    bounds = np.ravel([startCols * rows + starts, startCols * rows + ends], "F")
+    troughs = np.minimum.reduceat(flat, bounds)[::2] if len(bounds) else flat[:0]
+
+    dates = spreads.index.values
+    return {
+        "spread": np.asarray(spreads.columns, dtype=str)[startCols],
+        "start": dates[starts],
+        "end": dates[ends - 1],
+        "days": ends - starts,
+        "trough": troughs,
+    }
+
+
+def _episodeFrame(episodes):
+    import pandas as pd
+
+    order = np.lexsort((episodes["spread"], episodes["start"]))
+    return pd.DataFrame({k: v[order] for k, v in episodes.items()})
+
+
+def factors(df, n=len(_factorNames)):
+    """Leading `n` principal components of the curves in `df`, as
+    (scores by date, loadings by curve, share of variance explained)"""
+    values = df.values
+    mean = values.mean(axis=0)
+    centered = values - mean
+    return _project(df, mean, centered.T @ centered / max(len(df) - 1, 1), n)
+
+
+def _project(df, mean, cov, n):
+    import pandas as pd
+
+    eigenvalues, eigenvectors = np.linalg.eigh(cov)
+
+    # eigh sorts ascending, largest first
+    order = np.argsort(eigenvalues)[::-1][:n]
+    loadings = eigenvectors[:, order]
+
+    # components have no inherent sign, pick the conventional one: level
+    # up, slope up when long rates are above short ones, curvature up when
+    # the middle of the curve is above the ends
+    middle = loadings.shape[0] // 2
+    signs = [
+        loadings[:, 0].sum(),
+        loadings[-1, 1] - loadings[0, 1] if n > 1 else 1,
+        2 * loadings[middle, 2] - loadings[0, 2] - loadings[-1, 2] if n > 2 else 1,
+    ] + [1] * (n - 3)
+    loadings = loadings * np.where(np.asarray(signs[:n]) < 0, -1.0, 1.0)
+
+    names = list(_factorNames[:n]) + ["pc{}".format(i + 1) for i in range(3, n)]
+    total = np.trace(cov)
+    return (
+        pd.DataFrame((df.values - mean) @ loadings, index=df.index, columns=names),
+        pd.DataFrame(loadings, index=df.columns, columns=names),
+        pd.Series(
+            eigenvalues[order] / total if total else np.zeros(len(order)), index=names
+        ),
+    )
+
+
+class CurveAnalytics(object):
+    """Spreads, inversions and factors of a curve frame, updated as dates
+    are appended.
+
+    `update` works out whether it was given the frame it saw last time with
+    rows added. If so, only the new rows are processed: spreads are
+    computed for them, only inversion episodes still running are revisited,
+    and the factors are derived from running sums of the curves and their
+    cross products. Otherwise everything is computed afresh.
+
+    Args:
+        pairs (dict): spread name -> (long curve, short curve)
+        n_factors (int): number of principal components
+    """
+
+    def __init__(self, pairs=_spreads, n_factors=len(_factorNames)):
+        self.pairs = pairs
+        self.n_factors = n_factors
+        self.reset()
+
+    def reset(self):
+        # results, see the module functions
+        self.spreads = None
+        self.inversions = None
+        self.factors = None
+        self.loadings = None
+        self.explained = None
+
+        # rows seen, running sums for the covariance of the curves, and the
+        # inversion episodes as arrays
+        self._df = None
+        self._episodes = None
+        self._sum = None
+        self._cross = None
+
+    def update(self, df):
+        """Bring the analytics up to date with `df`, returns whether anything
+        changed"""
+        import pandas as pd
+
+        # the factors need every curve on every date
+        if np.isnan(df.values).any():
+            df = df.dropna()
+
+        if self._extends(df):
+            new = df.iloc[len(self._df) :]
+            if new.empty:
+                return False
+            previousLast = self._df.index[-1]
+        else:
+            self.reset()
+            new = df
+            previousLast = None
+            if new.empty:
+                return False
+
+        # running sums, for the covariance
+        values = new.values
+        if self._sum is None:
+            self._sum = values.sum(axis=0)
+            self._cross = values.T @ values
+        else:
+            self._sum = self._sum + values.sum(axis=0)
+            self._cross = self._cross + values.T @ values
+        self._df = df
+
+        # spreads of the new dates only
+        added = spreads(new, self.pairs)
+        self.spreads = (
+            added if previousLast is None else pd.concat([self.spreads, added])
+        )
+        self.inversions = self._updateInversions(added, previousLast)
+
+        n = len(df)
+        mean = self._sum / n
+        cov = (self._cross - n * np.outer(mean, mean)) / max(n - 1, 1)
+
+        # the components shift with every new date, so all dates are
+        # projected again, a single matrix product
+        self.factors, self.loadings, self.explained = _project(
+            df, mean, cov, min(self.n_factors, df.shape[1])
+        )
+        return True
+
+    def _extends(self, df):
+        """whether `df` is the frame seen last time, with rows appended"""
+        seen = self._df
+        if seen is None or len(df) < len(seen) or not len(seen):
+            return False
+        if list(df.columns) != list(seen.columns):
+            return False
+
+        # same last row as before, so the history wasnt reloaded under us
+        last = len(seen) - 1
+        return df.index[last] == seen.index[-1] and np.array_equal(
+            df.iloc[last].values, seen.iloc[-1].values
+        )
+
+    def _updateInversions(self, added, previousLast):
+        if previousLast is None:
+            self._episodes = _episodes(added)
+            return _episodeFrame(self._episodes)
+
+        old = self._episodes
+        running = old["end"] == np.datetime64(previousLast)
+        if not running.any() and not (added.values < 0).any():
+            # nothing inverted across the new dates
+            return self.inversions
+
+        # episodes running at the previous last date may carry on into the
+        # new dates, so are recomputed from their start. Other spreads only
+        # get episodes starting on the new dates
+        cuts = dict.fromkeys(added.columns, added.index.values[0])
+        cuts.update(zip(old["spread"][running], old["start"][running]))
+        new = _episodes(self.spreads.loc[min(cuts.values()) :])
+        cut = np.array([cuts[name] for name in new["spread"]], new["start"].dtype)
+        fresh = new["start"] >= cut
+
+        self._episodes = {
+            k: np.concatenate([old[k][~running], new[k][fresh]]) for k in old
+        }
+        return _episodeFrame(self._episodes)
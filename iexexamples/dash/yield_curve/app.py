@@ -6,16 +6,30 @@
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
 # visit http://127.0.0.1:8050/ in your web browser.
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+import datetime
+import os.path
+import threading
 import dash
-from dash.dependencies import Output, Input
+from dash.dependencies import Output, Input, State
+from dash.exceptions import PreventUpdate
 import dash_core_components as dcc
 import dash_html_components as html
-import os
-import os.path
-import pandas as pd
-import pyEX as p
 
-from .charts import yieldCurveSurface, lineOverlay
+from ...utils import (
+    LazyClient,
+    Metrics,
+    SharedClient,
+    TTLCache,
+    TokenBucket,
+    resolveClient,
+)
+from ...utils.shared import _defaultRetries
+from .cache import getCache, migrateLegacyCache
+from .figures import FigureCache, fingerprint
+
+# pandas, numpy and plotly (charts.py) are imported where
+# they are used, so the server can start without waiting on them
 
 _curves = {
     "DGS1MO": "1 Month",
@@ -89,13 +103,189 @@ _overlays = {
 _defaultFrom = "2008-01-01"
 _defaultTo = "2021-01-01"
 
+# Number of treasury curves to fetch concurrently, all of them so a cold
+# load takes about one request. The rate limiter does the throttling
+_defaultMaxWorkers = len(_curves)
+
+# Seconds to wait on the curve requests of a load, which run at once
+_defaultTimeout = 30
+
+# Max requests per second to IEX, across all sessions
+_defaultRateLimit = 10
+
+# Seconds to keep a fetched overlay series before refetching
+_defaultOverlayTTL = 60 * 60
+
+# Memory cap for cached overlay series
+_defaultOverlayBytes = 64 * 1024 * 1024
+
+# Max number of dates drawn on the surface before it is downsampled
+_defaultSurfaceRows = 500
+
+# Seconds between polls for new treasury prints in live mode
+_defaultLiveInterval = 60
+
+# Most new dates sent to a browser per live update, the rest follow on the
+# next ones
+_defaultLiveRows = 100
+
+# Longest wait between polls while they fail, in seconds
+_defaultLiveMaxBackoff = 15 * 60
+
+# Most recent inversion episodes listed under the analytics chart
+_defaultInversionRows = 20
+
+# Seconds per date in curve playback
+_defaultPlaybackInterval = 0.1
+
+# Dates per chunk of curve playback sent to the browser
+_defaultPlaybackChunk = 250
+
+
+def _dateWindow(relayoutData):
+    """Extract a (start, end) date window from a 3D graph's `relayoutData`.
+
+    Returns (None, None) if the date axis was reset, or None if the
+    relayout didnt touch the date axis (e.g. a camera rotation).
+    """
+    if not relayoutData:
+        return None
+    if relayoutData.get("scene.yaxis.autorange"):
+        return None, None
+    if "scene.yaxis.range" in relayoutData:
+        return tuple(relayoutData["scene.yaxis.range"])
+    if "scene.yaxis.range[0]" in relayoutData:
+        return (
+            relayoutData["scene.yaxis.range[0]"],
+            relayoutData.get("scene.yaxis.range[1]"),
+        )
+    return None
+
 
 class YieldCurveApp(object):
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers=_defaultMaxWorkers,
+        timeout=_defaultTimeout,
+        rate_limit=_defaultRateLimit,
+        retries=_defaultRetries,
+        cache_format=None,
+        cache_dir=None,
+        overlay_ttl=_defaultOverlayTTL,
+        overlay_max_bytes=_defaultOverlayBytes,
+        max_surface_rows=_defaultSurfaceRows,
+        end_date=_defaultTo,
+        figure_cache=True,
+        clientside_overlays=False,
+        live=False,
+        live_interval=_defaultLiveInterval,
+        live_max_rows=_defaultLiveRows,
+        live_max_backoff=_defaultLiveMaxBackoff,
+        analytics=True,
+        playback=True,
+        playback_interval=_defaultPlaybackInterval,
+        playback_chunk=_defaultPlaybackChunk,
+        compress=True,
+        client=None,
+        metrics=False,
+        background_warmup=True,
+    ):
+        # pyEX client, or a stand-in from utils/client.py. Defaults to
+        # getClient(), called on first use
+        self.client = client
+
+        # Serve Prometheus-style metrics on /metrics, pass True or a
+        # utils.Metrics instance. See utils/metrics.py
+        self.metrics = Metrics() if metrics is True else (metrics or None)
+
+        # Concurrency limit and per-request timeout for curve fetches
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        # All sessions share one client, which coalesces identical requests
+        # in flight, rate limits, and retries failed ones. See utils/shared.py.
+        # A whole curve load fits in the burst
+        self.limiter = (
+            TokenBucket(rate_limit, burst=len(_curves)) if rate_limit else None
+        )
+        self.retries = retries
+
+        # On-disk cache of the yield curve data, see cache.py. It is read
+        # on first use, see curveData
+        self.cache = getCache(cache_format, cache_dir)
+        self._df = None
+        self._cacheMtime = None
+        self._fingerprint = self._lastFingerprint = None
+        self._dataLock = threading.RLock()
+
+        # Load data and import heavy modules in a background thread
+        # straight after startup, rather than on the first request
+        self.background_warmup = background_warmup
+
+        # In-memory cache of overlay series, see addOverlays
+        self.overlay_cache = TTLCache(ttl=overlay_ttl, max_bytes=overlay_max_bytes)
+
+        # Longer histories are averaged down to this many dates until zoomed in
+        self.max_surface_rows = max_surface_rows
+
+        # Last date of the curve history, for full and incremental loads
+        # alike. None for today, e.g. to follow new prints in live mode
+        self.end_date = end_date
+
+        # Drawn figures by data fingerprint, next to the data cache on disk
+        # and in memory. Overlays are part of the figure, so entries expire
+        # with them. See figures.py
+        self.figure_cache = (
+            FigureCache(
+                os.path.splitext(self.cache.path)[0] + "_figures",
+                ttl=overlay_ttl,
+            )
+            if figure_cache
+            else None
+        )
+
+        # Send every overlay series to the browser once and toggle them there,
+        # rather than redrawing the figure on the server for each selection.
+        # See clientside.py
+        self.clientside_overlays = clientside_overlays
+
+        # Poll for new treasury prints in the background every `live_interval`
+        # seconds, and send only the new dates to the browsers, at most
+        # `live_max_rows` per update, by extending the surface in place.
+        # Polls back off up to `live_max_backoff` seconds while failing
+        self.live = live
+        self.live_interval = live_interval
+        self.live_max_rows = live_max_rows
+        self.live_max_backoff = live_max_backoff
+        self._poller = None
+        self._stopPolling = threading.Event()
+
+        # Spreads, inversions and factors of the curves, shown under the
+        # chart and updated with the data. See analytics.py
+        self.analytics = analytics
+        self._curveAnalytics = None
+        self._analyticsVersion = None
+        self._analyticsLock = threading.RLock()
+
+        # Nelson-Siegel(-Svensson) parameters by model, fitted per date on
+        # first use, see fittedCurves
+        self._fitters = {}
+        self._fitLock = threading.Lock()
+
+        # Animate the curve in 2D, one date per `playback_interval` seconds.
+        # The browser plays it from chunks of `playback_chunk` dates, asked
+        # for as playback reaches them. See playback.py
+        self.playback = playback
+        self.playback_interval = playback_interval
+        self.playback_chunk = playback_chunk
+        self._playbackFrames = None
+        self._playbackLock = threading.Lock()
+
         # Instantiate dash instance
         self.app = dash.Dash(
             title="IEX - Yield Curve",
             suppress_callback_exceptions=True,
+            compress=compress,  # gzip/brotli responses via flask-compress
             external_stylesheets=["https://iexcloud.io/css/cloud.css"],
         )
 
@@ -113,21 +303,22 @@ class YieldCurveApp(object):
     def initialize(self):
         """Initialize:
         - pyEX Client
-        - Pull data from cache if available
         - Setup Dash layouts
         - Setup Dash callbacks
+        - Warm up in the background
+        - Poll for new data in live mode
         """
-        # create a client
-        try:
-            self.client = p.Client()  # set IEX_TOKEN env var or provide here
-        except Exception as e:
-            print(
-                "To run this app, set IEX_TOKEN environmnent variable or hard code in app.py"
-            )
-            raise e
+        # create a client on first use, unless one was provided. Set
+        # IEX_TOKEN env var, or IEX_CLIENT_MODE=replay to run offline
+        self.client = self.client or LazyClient()
+
+        self.client = SharedClient(
+            self.client, limiter=self.limiter, retries=self.retries
+        )
 
-        # load data from cache if available
-        self.loadData()
+        if self.metrics is not None:
+            # count and time upstream requests
+            self.client = self.metrics.instrumentClient(self.client)
 
         # initialize the layout
         self.initializeLayout()
@@ -135,21 +326,71 @@ class YieldCurveApp(object):
         # initialize the callbacks
         self.initializeCallbacks()
 
+        # initialize the metrics endpoint
+        self.initializeMetrics()
+
+        if self.background_warmup:
+            threading.Thread(target=self.warmup, daemon=True).start()
+
+        if self.live:
+            self.startPolling()
+
+    def warmup(self):
+        """Do ahead of the first request what it would otherwise wait on:
+        create the client, import the plotting modules and load the cache"""
+        try:
+            resolveClient(self.client)
+            from . import charts  # noqa: F401
+
+            self.curveData()
+
+            if self.clientside_overlays:
+                # every session asks for all of them on page load
+                self.overlaySeries()
+        except Exception as e:
+            # the first request will try again, and fail visibly
+            print("Warm-up failed: {}".format(e))
+
+    def initializeMetrics(self):
+        if self.metrics is None:
+            return
+        self.metrics.instrumentCallbacks(self.app)
+        self.metrics.instrumentCache("overlay", self.overlay_cache)
+        if self.figure_cache is not None:
+            self.metrics.instrumentCache("figure", self.figure_cache)
+        self.metrics.install(self.app.server)
+
     def initializeLayout(self):
-        # Div that contains the 3D chart once we have data available
-        self.chart_container = html.Div(
-            id="chart-container",  # this is used in a callback below
+        # build the layout on every page load, so that new sessions pick up
+        # data loaded by any server process since this one started
+        self.app.layout = self.layout
+
+    def layout(self):
+        # dont wait on the data, the chart is drawn by the initial callback
+        hasData = self.hasData()
+        figure = {"data": [], "layout": {}}
+
+        # Div that contains the 3D chart
+        chart_container = html.Div(
+            id="chart-container",
             className="border mt2 flex",  # these are dictated by cloud.css
             style={"height": "100%", "width": "100%"},
+            children=[
+                dcc.Graph(
+                    id="3d-graph",  # this is used in a callback below
+                    figure=figure,
+                    style=self.graphStyle(hasData),
+                    className="flex-1",
+                ),
+            ],
         )
 
         # Div that contains our overlay multi-select dropdown
-        self.overlayconfig_container = html.Div(
+        overlayconfig_container = html.Div(
             className="px2 flex flex-column flex-1",  # these are dictated by cloud.css
             id="overlayconfig-container",  # this is used in a callback below
-            style={
-                "display": "none"
-            },  # leave hidden to start until we have data and the chart is renderered
+            # leave hidden to start until we have data and the chart is renderered
+            style={} if hasData else {"display": "none"},
             children=[
                 # Title of the block
                 html.H3(className="section-title mt2", children="Overlay datasets"),
@@ -164,38 +405,63 @@ class YieldCurveApp(object):
                     multi=True,  # overlay more than one
                     value="",  # dont overlay anything by default
                 ),
+                # Zoom the surface into a date window at full resolution
+                html.P(className="mt2", children="Date window"),
+                dcc.DatePickerRange(
+                    id="date-window",  # this is used in a callback below
+                    clearable=True,
+                ),
             ],
         )
 
-        # if i have cached data, adjust button accordingly
-        if not self.df.empty:
-            # First update the 3D chart
-            self.updateChart()
-
-            # show overlay config
-            self.overlayconfig_container.style = {}
+        # Div that contains the analytics chart and inversions table
+        analytics_container = html.Div(
+            id="analytics-container",  # this is used in a callback below
+            className="px2 flex flex-column",  # these are dictated by cloud.css
+            style={} if hasData else {"display": "none"},
+            children=[
+                html.H3(className="section-title mt2", children="Curve analytics"),
+                html.P(children="Spreads, inversions and level/slope/curvature"),
+                dcc.Graph(id="analytics-graph", figure=figure),
+                # Most recent inversion episodes
+                html.Div(id="inversions-table"),
+                # Data version shown, see initializeAnalyticsCallbacks
+                dcc.Store(id="analytics-version"),
+            ],
+        )
 
-            # set the data button to "Reload"
-            self.load_reload_button = html.Button(
-                "Reload",
-                id="start-load-data",  # this is used in a callback below
-                n_clicks=0,
-                className="cloud-btn",  # these are dictated by cloud.css
-            )
-        else:
-            # Make sure figure is none
-            self.fig = None
-
-            # No data yet so set button to "Load"
-            self.load_reload_button = html.Button(
-                "Load",
-                id="start-load-data",  # this is used in a callback below
-                n_clicks=0,
-                className="cloud-btn",  # these are dictated by cloud.css
-            )
+        # Div that contains the curve playback, see initializePlaybackCallbacks
+        playback_container = html.Div(
+            id="playback-container",  # this is used in a callback below
+            className="px2 flex flex-column",  # these are dictated by cloud.css
+            style={} if hasData else {"display": "none"},
+            children=[
+                html.H3(className="section-title mt2", children="Curve playback"),
+                html.P(children="The curve date by date"),
+                html.Button(
+                    "Play",
+                    id="playback-button",  # this is used in a callback below
+                    n_clicks=0,
+                    className="cloud-btn",  # these are dictated by cloud.css
+                ),
+                dcc.Graph(id="playback-graph", figure=figure),
+                # one date per tick while playing
+                dcc.Interval(
+                    id="playback-interval",
+                    interval=self.playback_interval * 1000,
+                    disabled=True,
+                ),
+                # dates, curves and version of the data, the last chunk
+                # received and the one asked for, and where playback is
+                dcc.Store(id="playback-meta"),
+                dcc.Store(id="playback-chunk"),
+                dcc.Store(id="playback-request"),
+                dcc.Store(id="playback-position"),
+            ],
+        )
 
         # specify div for config content, this holds the data load button
-        self.config_container = html.Div(
+        config_container = html.Div(
             id="config-container",
             className="px2 flex flex-column",  # these are dictated by cloud.css
             children=[
@@ -203,13 +469,45 @@ class YieldCurveApp(object):
                 html.H3(className="section-title mt2", children="Yield Curve Data"),
                 # Description of the block
                 html.P(children="Pull historical treasury yield curves"),
-                # Load/Reload button
-                self.load_reload_button,
+                # Load/Reload button, "Reload" if we have cached data
+                html.Button(
+                    "Reload" if hasData else "Load",
+                    id="start-load-data",  # this is used in a callback below
+                    n_clicks=0,
+                    className="cloud-btn",  # these are dictated by cloud.css
+                ),
+                # Reload either the full history or only dates newer than the cache
+                dcc.RadioItems(
+                    id="reload-mode",  # this is used in a callback below
+                    className="mt2",
+                    options=[
+                        {"label": "Only new dates", "value": "incremental"},
+                        {"label": "Full history", "value": "full"},
+                    ],
+                    value="incremental",
+                ),
             ],
         )
 
+        # the date window the chart is zoomed to, the figure itself is drawn
+        # and cached on the server and never sent back
+        stores = [dcc.Store(id="chart-view")]
+
+        # in clientside overlay mode, the surface drawn by the server and the
+        # overlay series are kept in the browser and combined there
+        if self.clientside_overlays:
+            stores += [dcc.Store(id="surface-figure"), dcc.Store(id="overlay-series")]
+
+        if self.live:
+            # check for new dates every `live_interval`, see initializeLiveCallbacks
+            stores += [
+                dcc.Interval(id="live-interval", interval=self.live_interval * 1000),
+                dcc.Store(id="live-drawn"),
+                dcc.Store(id="live-sent"),
+            ]
+
         # setup base layout
-        self.app.layout = html.Section(
+        return html.Section(
             style={"height": "110vh"},  # slightly oversize for good chart dimensions
             # Store as:
             # Flex column:
@@ -247,128 +545,809 @@ class YieldCurveApp(object):
                     # Store data load config and overlay config as flex row
                     className="section flex",
                     children=[
-                        self.config_container,
-                        self.overlayconfig_container,
+                        config_container,
+                        overlayconfig_container,
                     ],
                 ),
                 # Finally show chart underneath it all
                 html.Div(
                     className="flex-2",
-                    children=[dcc.Loading(children=[self.chart_container])],
+                    children=[dcc.Loading(children=[chart_container])],
                 ),
-            ],
+            ]
+            + ([analytics_container] if self.analytics else [])
+            + ([playback_container] if self.playback else [])
+            + stores,
         )
 
+    def graphStyle(self, visible):
+        if visible:
+            return {"height": "95%"}
+        return {"display": "none"}
+
     def initializeCallbacks(self):
+        if self.live:
+            self.initializeLiveCallbacks()
+
+        if self.analytics:
+            self.initializeAnalyticsCallbacks()
+
+        if self.playback:
+            self.initializePlaybackCallbacks()
+
+        if self.clientside_overlays:
+            return self.initializeClientsideCallbacks()
+
+        # The date window each session is looking at lives in the browser and
+        # comes back in as State, so any server process can handle any
+        # request. Figures are drawn from it and the shared, cached data
         @self.app.callback(
             [
                 # Show overlay once data loaded
                 Output("overlayconfig-container", "style"),
+                # Switch to "Reload" once data loaded
+                Output("start-load-data", "children"),
+                # The chart itself
+                Output("3d-graph", "figure"),
                 # Show chart once data loaded
-                Output("chart-container", "children"),
+                Output("3d-graph", "style"),
+                # The date window drawn
+                Output("chart-view", "data"),
             ],
             [
                 # Data load button
                 Input("start-load-data", "n_clicks"),
                 # Data overlay values
                 Input("data-overlay", "value"),
+                # Date axis changes on the chart itself
+                Input("3d-graph", "relayoutData"),
+                # Date window picker
+                Input("date-window", "start_date"),
+                Input("date-window", "end_date"),
+            ]
+            # New dates, for surfaces redrawn rather than extended
+            + self.liveInputs(),
+            [
+                # Incremental or full reload
+                State("reload-mode", "value"),
+                # The date window currently shown in this session
+                State("chart-view", "data"),
+            ],
+        )
+        def handleChart(*args):
+            buttonClick, overlays, relayoutData, startDate, endDate = args[:5]
+            reloadMode, view = args[-2:]
+
+            # figure out which input fired
+            triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+
+            figure, view = self.updateChart(
+                triggered,
+                buttonClick,
+                overlays or [],
+                relayoutData,
+                startDate,
+                endDate,
+                reloadMode,
+                view,
+            )
+            return {}, "Reload", figure, self.graphStyle(True), view
+
+    def liveInputs(self):
+        """The live update tick as a callback input, in live mode"""
+        return [Input("live-interval", "n_intervals")] if self.live else []
+
+    def initializeClientsideCallbacks(self):
+        # Same as above, except the server only draws the surface, into the
+        # `surface-figure` store. The overlays are added in the browser
+        @self.app.callback(
+            [
+                Output("overlayconfig-container", "style"),
+                Output("start-load-data", "children"),
+                # The chart without overlays
+                Output("surface-figure", "data"),
+                Output("3d-graph", "style"),
+                Output("chart-view", "data"),
+            ],
+            [
+                Input("start-load-data", "n_clicks"),
+                Input("3d-graph", "relayoutData"),
+                Input("date-window", "start_date"),
+                Input("date-window", "end_date"),
+            ]
+            + self.liveInputs(),
+            [
+                State("reload-mode", "value"),
+                State("chart-view", "data"),
+            ],
+        )
+        def handleSurface(*args):
+            buttonClick, relayoutData, startDate, endDate = args[:4]
+            reloadMode, view = args[-2:]
+
+            triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+
+            figure, view = self.updateChart(
+                triggered,
+                buttonClick,
+                (),
+                relayoutData,
+                startDate,
+                endDate,
+                reloadMode,
+                view,
+            )
+            return {}, "Reload", figure, self.graphStyle(True), view
+
+        # Every overlay series, once per page load
+        @self.app.callback(
+            Output("overlay-series", "data"),
+            [Input("start-load-data", "n_clicks")],
+            [State("overlay-series", "data")],
+        )
+        def handleOverlaySeries(buttonClick, series):
+            if series:
+                # already in the browser, overlays dont change on reload
+                raise PreventUpdate
+            return self.overlaySeries()
+
+        # Surface plus the selected overlays, without a server round-trip
+        from .clientside import composeOverlays
+
+        self.app.clientside_callback(
+            composeOverlays,
+            Output("3d-graph", "figure"),
+            [
+                Input("surface-figure", "data"),
+                Input("data-overlay", "value"),
+                Input("overlay-series", "data"),
+            ],
+        )
+
+    def initializeLiveCallbacks(self):
+        # Which figure the browser is showing, and the newest date on it. The
+        # surface is only extended while the latest dates are in view, not
+        # when zoomed into a date window
+        from .clientside import trackDrawn
+
+        self.app.clientside_callback(
+            trackDrawn,
+            Output("live-drawn", "data"),
+            [Input("3d-graph", "figure")],
+            [State("live-drawn", "data")],
+        )
+
+        # New dates only, appended to the surface in the browser
+        @self.app.callback(
+            [
+                Output("3d-graph", "extendData"),
+                # The newest date sent, for the figure it was sent to
+                Output("live-sent", "data"),
+            ],
+            [Input("live-interval", "n_intervals")],
+            [State("live-drawn", "data"), State("live-sent", "data")],
+        )
+        def handleLive(intervals, drawn, sent):
+            if not drawn or not drawn.get("last"):
+                # nothing drawn yet, or zoomed in
+                raise PreventUpdate
+
+            # a newly drawn figure has everything up to its own last date
+            if sent and sent.get("figure") == drawn["figure"]:
+                since = sent["last"]
+            else:
+                since = drawn["last"]
+
+            update = self.liveUpdate(since)
+            if update is None:
+                # nothing new, the response is empty
+                raise PreventUpdate
+
+            extendData, last = update
+            return extendData, {"figure": drawn["figure"], "last": last}
+
+    def initializeAnalyticsCallbacks(self):
+        # Redrawn after the chart is, and on live updates, but only sent when
+        # the data changed since this browser last got them
+        inputs = [Input("start-load-data", "children")]
+        if self.live:
+            inputs.append(Input("live-interval", "n_intervals"))
+
+        @self.app.callback(
+            [
+                Output("analytics-container", "style"),
+                Output("analytics-graph", "figure"),
+                Output("inversions-table", "children"),
+                Output("analytics-version", "data"),
             ],
+            inputs,
+            [State("analytics-version", "data")],
         )
-        def handleLoad(buttonClick, overlays):
-            if buttonClick:
-                # grab data
+        def handleAnalytics(*args):
+            panel = self.analyticsPanel(shown=args[-1])
+            if panel is None:
+                raise PreventUpdate
+            return ({},) + panel
+
+    def initializePlaybackCallbacks(self):
+        # What the browser needs to know before playing, sent when the data
+        # changed since it last got it
+        inputs = [Input("start-load-data", "children")]
+        if self.live:
+            inputs.append(Input("live-interval", "n_intervals"))
+        # a chunk of newer data than the browser knows of means it missed
+        # a change, so check again whenever one is sent
+        inputs.append(Input("playback-chunk", "data"))
+
+        @self.app.callback(
+            [
+                Output("playback-container", "style"),
+                Output("playback-meta", "data"),
+            ],
+            inputs,
+            [State("playback-meta", "data")],
+        )
+        def handlePlaybackMeta(*args):
+            shown = args[-1]
+            if not self.hasData():
+                raise PreventUpdate
+            meta = self.playbackFrames().meta()
+            if shown and shown.get("version") == meta["version"]:
+                raise PreventUpdate
+            return {}, meta
+
+        # A chunk of dates, as the browser asks for them
+        @self.app.callback(
+            Output("playback-chunk", "data"),
+            [Input("playback-request", "data")],
+        )
+        def handlePlaybackChunk(request):
+            if not request or not self.hasData():
+                raise PreventUpdate
+            frames = self.playbackFrames()
+            if frames.version != request.get("version"):
+                # the data changed: answer without dates, so the browser
+                # stops waiting, and the new meta follows
+                return {"version": frames.version, "index": request["index"]}
+            chunk = frames.payload(request["index"])
+            if chunk is None:
+                raise PreventUpdate
+            return chunk
+
+        # Playing, and drawing, happens in the browser
+        from .clientside import stepPlayback
+
+        self.app.clientside_callback(
+            stepPlayback,
+            [
+                Output("playback-graph", "figure"),
+                Output("playback-position", "data"),
+                Output("playback-request", "data"),
+                Output("playback-interval", "disabled"),
+                Output("playback-button", "children"),
+            ],
+            [
+                Input("playback-interval", "n_intervals"),
+                Input("playback-button", "n_clicks"),
+                Input("playback-chunk", "data"),
+                Input("playback-meta", "data"),
+            ],
+            [State("playback-position", "data")],
+        )
+
+    def updateChart(
+        self,
+        triggered,
+        buttonClick,
+        overlays,
+        relayoutData,
+        startDate,
+        endDate,
+        reloadMode,
+        view,
+    ):
+        """(figure, view) to show after `triggered` inputs changed, given the
+        view, i.e. the date window, shown now. Raises PreventUpdate if it
+        stays as is"""
+        window = (view or {}).get("window")
+
+        if "live-interval.n_intervals" in triggered:
+            # new dates are appended to full resolution surfaces in the
+            # browser (see liveUpdate), downsampled ones are redrawn
+            df, version = self.curveVersion()
+            if (
+                not view
+                or window is not None
+                or view.get("version") == version
+                or not self.downsampled(df)
+            ):
+                raise PreventUpdate
+        elif buttonClick and "start-load-data.n_clicks" in triggered:
+            # grab data, only fetching new dates if we already have some,
+            # including any loaded by other server processes
+            if reloadMode == "incremental" and not self.curveData().empty:
+                self.refreshYieldCurve()
+            else:
                 self.buildYieldCurve()
 
-                # set load button to be reload
-                self.load_reload_button.value = "Reload"
+            # ready to go, redraw in full with the selected overlays
+            window = None
+        elif "3d-graph.relayoutData" in triggered:
+            window = _dateWindow(relayoutData)
+            if window is None:
+                # camera move or similar, nothing to re-query
+                raise PreventUpdate
+        elif any(t.startswith("date-window.") for t in triggered):
+            window = startDate, endDate
+        # otherwise the overlays changed, or this is the first draw in this
+        # session, left out of the layout so the page can be served before
+        # the data is read
 
-                # ready to go, move on
-                self.updateChart()
+        if self.curveData().empty:
+            # nothing loaded yet
+            raise PreventUpdate
 
-                # show overlay config
-                self.overlayconfig_container.style = {}
+        if window is not None and tuple(window) == (None, None):
+            window = None
+        if window is not None and self.curveData().loc[window[0] : window[1]].empty:
+            # nothing to show, leave the chart as is
+            raise PreventUpdate
 
-                # add overlays
-                self.addOverlays(overlays or [])
+        # the version drawn, or an older one if the data changes meanwhile,
+        # which is then only redrawn once more
+        window = list(window) if window is not None else None
+        view = {"window": window, "version": self.curveVersion()[1]}
+        return self.buildFigure(overlays, window), view
 
-            return self.overlayconfig_container.style, self.chart_container.children
+    def curveAnalytics(self):
+        """`CurveAnalytics` of the curve data and the data version, updated
+        incrementally when dates were appended"""
+        from .analytics import CurveAnalytics
 
-    def updateChart(self):
-        if not self.df.empty:
-            # assemble 3D figure
-            self.fig = yieldCurveSurface(self.df)
+        df, version = self.curveVersion()
+        with self._analyticsLock:
+            if self._curveAnalytics is None:
+                self._curveAnalytics = CurveAnalytics()
+            if version != self._analyticsVersion:
+                self._curveAnalytics.update(df)
+                self._analyticsVersion = version
+            return self._curveAnalytics, version
 
-            # Add graph to chart container
-            self.chart_container.children = [
-                dcc.Graph(
-                    id="3d-graph",
-                    figure=self.fig,
-                    style={"height": "95%"},
-                    className="flex-1",
-                ),
+    def fittedCurves(self, grid, model="ns", dates=None):
+        """(dates x grid) yields at maturities `grid`, in years, for `dates`
+        (all by default), fitted with `model`: `spline` for a cubic spline,
+        `ns` for Nelson-Siegel or `nss` for Nelson-Siegel-Svensson.
+
+        Fitted parameters are kept per date, so later calls only fit dates
+        added since. See fitting.py
+        """
+        from .fitting import CurveFitter, splineCurves
+
+        df = self.curveData()
+        if dates is not None:
+            df = df.loc[dates]
+        if model == "spline":
+            return splineCurves(df, grid)
+
+        with self._fitLock:
+            if model not in self._fitters:
+                self._fitters[model] = CurveFitter(model)
+            fitter = self._fitters[model]
+            fitter.fit(df)
+            return fitter.curves(grid, df.index)
+
+    def playbackFrames(self):
+        """`PlaybackFrames` of the curve data, computed once per data version"""
+        from .playback import PlaybackFrames
+
+        df, version = self.curveVersion()
+        with self._playbackLock:
+            frames = self._playbackFrames
+            if frames is None or frames.version != version:
+                frames = PlaybackFrames(df, version, self.playback_chunk)
+                self._playbackFrames = frames
+            return frames
+
+    def analyticsPanel(self, shown=None):
+        """(figure, inversions table, data version) for the analytics panel,
+        or None if there is no data, or it is the `shown` version"""
+        from .charts import analyticsFigure
+
+        if not self.hasData():
+            return None
+
+        with self._analyticsLock:
+            analytics, version = self.curveAnalytics()
+            if analytics.spreads is None or version == shown:
+                return None
+            figure = analyticsFigure(
+                analytics.spreads, analytics.factors, analytics.inversions
+            )
+            episodes = analytics.inversions.iloc[::-1][:_defaultInversionRows]
+
+        header = ["Spread", "Start", "End", "Days", "Trough"]
+        table = html.Table(
+            [html.Tr([html.Th(x) for x in header])]
+            + [
+                html.Tr(
+                    [
+                        html.Td(row.spread),
+                        html.Td(row.start.strftime("%Y-%m-%d")),
+                        html.Td(row.end.strftime("%Y-%m-%d")),
+                        html.Td(row.days),
+                        html.Td("{:.2f}".format(row.trough)),
+                    ]
+                )
+                for row in episodes.itertuples()
             ]
+        )
+        return figure.to_plotly_json(), table, version
+
+    def liveUpdate(self, since):
+        """`extendData` appending the dates after `since` to the surface, at
+        most `live_max_rows` of them, and the last date appended. None if
+        there are none"""
+        import pandas as pd
+
+        df = self.curveData()
+        df = df[df.index > pd.Timestamp(since)].iloc[: self.live_max_rows]
+        if df.empty:
+            return None
+
+        dates = df.index.strftime("%Y-%m-%d").tolist()
+
+        # [update, trace indices], one list of new values per key and trace.
+        # Surface rows are dates, so new rows extend both y and z
+        return [{"y": [dates], "z": [df.values.tolist()]}, [0]], dates[-1]
+
+    def startPolling(self):
+        """Start polling for new treasury prints in a background thread"""
+        if self._poller is None:
+            self._stopPolling.clear()
+            self._poller = threading.Thread(target=self.poll, daemon=True)
+            self._poller.start()
+
+    def stopPolling(self):
+        """Stop the background poller, waiting for a poll in progress"""
+        self._stopPolling.set()
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+
+    def poll(self):
+        """Fetch new dates every `live_interval` seconds until stopped.
+
+        Polls run one at a time, so a slow upstream delays the next poll
+        rather than stacking requests up, and failures double the wait up to
+        `live_max_backoff`.
+        """
+        delay = self.live_interval
+        while not self._stopPolling.wait(delay):
+            try:
+                self.refreshYieldCurve()
+                delay = self.live_interval
+            except Exception as e:
+                delay = min(delay * 2, self.live_max_backoff)
+                print("Live update failed, retrying in {}s: {}".format(delay, e))
+
+    def buildFigure(self, overlays=(), window=None):
+        """3D figure of the yield curve with `overlays` drawn on it, zoomed to
+        `window`, a `[start, end]` of dates, if given. From the figure cache
+        if this data was drawn the same way before"""
+        df, version = self.curveVersion()
+
+        def draw():
+            if overlays:
+                # the surface is drawn, and cached, once for any overlays on it
+                return self.addOverlays(self.buildFigure((), window), overlays)
+            return self.renderFigure(df, window)
+
+        if self.figure_cache is None:
+            return draw()
+
+        key = self.figure_cache.key(
+            version, list(overlays), self.max_surface_rows, window
+        )
+        return self.figure_cache.getOrSet(key, draw)
+
+    def renderFigure(self, df, window=None):
+        """Draw the 3D surface of `df`, or of the dates in `window` of it,
+        full resolution if it fits"""
+        from .charts import yieldCurveSurface
 
-    def addOverlays(self, overlays):
-        for overlay in overlays:
+        if window is None:
+            figure = yieldCurveSurface(df, max_rows=self.max_surface_rows)
+
+            # the newest date drawn, for live updates to carry on from. Rows
+            # of single dates dont fit a downsampled surface, so it isnt
+            # extended but redrawn instead, see updateChart
+            lastDate = None if self.downsampled(df) else df.index[-1]
+            figure.update_layout(
+                meta={"lastDate": lastDate.strftime("%Y-%m-%d") if lastDate else None}
+            )
+            return self.figurePayload(figure)
+
+        df = df.loc[window[0] : window[1]]
+        figure = yieldCurveSurface(df, max_rows=self.max_surface_rows)
+        figure.update_layout(
+            # clip overlays to the same window
+            scene_yaxis=dict(range=[df.index[0], df.index[-1]], autorange=False),
+            # and dont extend it with live updates
+            meta={"lastDate": None},
+        )
+        return self.figurePayload(figure)
+
+    def downsampled(self, df):
+        """Whether the full surface of `df` is averaged down"""
+        return self.max_surface_rows is not None and len(df) > self.max_surface_rows
+
+    def figurePayload(self, figure):
+        """`figure` as sent to the browser"""
+        return figure.to_plotly_json()
+
+    def tracePayload(self, trace):
+        """a single trace as sent to the browser, see figurePayload"""
+        return trace.to_plotly_json() if hasattr(trace, "to_plotly_json") else trace
+
+    def updateOverlays(self, figure, overlays):
+        """add newly selected overlays to `figure` and remove deselected ones"""
+        selected = {_overlays[overlay]["name"] for overlay in overlays}
+        drawn = {
+            trace.get("name")
+            for trace in figure["data"]
+            if trace.get("type") == "scatter3d"
+        }
+
+        # drop deselected overlays, the surface trace is untouched
+        figure = self.removeOverlays(figure, drawn - selected)
+
+        # only add overlays that arent already drawn
+        return self.addOverlays(
+            figure,
+            [
+                overlay
+                for overlay in overlays
+                if _overlays[overlay]["name"] not in drawn
+            ],
+        )
+
+    def removeOverlays(self, figure, names):
+        """`figure` without the overlay traces `names`"""
+        return dict(
+            figure,
+            data=[
+                trace
+                for trace in figure["data"]
+                if trace.get("type") != "scatter3d" or trace.get("name") not in names
+            ],
+        )
+
+    def addOverlays(self, figure, overlays):
+        """`figure` with a line trace added for each of `overlays`"""
+        from .charts import lineOverlayTrace
+
+        traces = [
+            self.tracePayload(
+                lineOverlayTrace(self.fetchOverlay(overlay), _overlays[overlay]["name"])
+            )
+            for overlay in overlays
+        ]
+        return dict(figure, data=list(figure["data"]) + traces)
+
+    def overlaySeries(self):
+        """Every overlay series in compact form, by overlay, for the
+        `overlay-series` store. See charts.compactOverlay"""
+        from .charts import compactOverlay
+
+        def fetch(overlay):
+            try:
+                return compactOverlay(
+                    self.fetchOverlay(overlay), _overlays[overlay]["name"]
+                )
+            except Exception as e:
+                # leave it out rather than lose every other overlay
+                print("Failed to fetch overlay {}: {}".format(overlay, e))
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            series = dict(zip(_overlays, executor.map(fetch, _overlays)))
+        return {k: v for k, v in series.items() if v is not None}
+
+    def fetchOverlay(self, overlay, from_=_defaultFrom, to_=_defaultTo):
+        """fetch an overlay series, reusing recently fetched ones"""
+        timeseriesId = _overlays[overlay]["timeseriesId"]
+
+        def fetch():
             df = self.client.timeSeriesDF(
-                _overlays[overlay]["timeseriesId"],
+                timeseriesId,
                 overlay,
-                from_=_defaultFrom,
-                to_=_defaultTo,
+                from_=from_,
+                to_=to_,
             )
 
-            if _overlays[overlay]["timeseriesId"] == "HISTORICAL_PRICES":
+            if timeseriesId == "HISTORICAL_PRICES":
                 df["value"] = df["close"]
 
             df = df[["date", "value"]]
             df.set_index("date", inplace=True)
-            lineOverlay(self.fig, df, _overlays[overlay]["name"])
+            return df
 
-    def buildYieldCurve(self):
-        """build a full yield curve from `from_` to `to_`"""
-        dfs = pd.DataFrame()
-        for curve in _curves.keys():
-            df = self.client.timeSeriesDF(
-                "TREASURY",
-                curve,
-                from_=_defaultFrom,
-                to_=_defaultTo,
-                filter="date,value",
-            )
+        return self.overlay_cache.getOrSet((timeseriesId, overlay, from_, to_), fetch)
 
-            # Filter out nones
-            # TODO we dont want to do this really because rates can be 0
-            df = df[df["value"] > 0]
+    def fetchCurve(self, curve, from_=_defaultFrom, to_=_defaultTo):
+        """fetch a single treasury curve from `from_` to `to_`"""
+        import pandas as pd
 
-            # set date column to be index
-            df.set_index("date", inplace=True)
+        df = self.client.timeSeriesDF(
+            "TREASURY",
+            curve,
+            from_=from_,
+            to_=to_,
+            filter="date,value",
+        )
+
+        if df.empty:
+            # nothing in this window
+            return pd.Series(dtype="float64")
+
+        # Filter out nones
+        # TODO we dont want to do this really because rates can be 0
+        df = df[df["value"] > 0]
 
-            # drop any remaining nans
-            dfs[_curves[curve]] = df["value"]
+        # set date column to be index
+        df.set_index("date", inplace=True)
+        return df["value"]
 
-        self.df = dfs
-        self.df.dropna(inplace=True)
-        self.saveData()
+    def fetchCurves(self, from_=_defaultFrom, to_=_defaultTo):
+        """fetch all curves from `from_` to `to_` as a single dataframe"""
+        import pandas as pd
+
+        # fetch all curves concurrently, bounded by `max_workers`
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        try:
+            for curve in _curves.keys():
+                futures[curve] = executor.submit(self.fetchCurve, curve, from_, to_)
+
+            # one deadline for all of them, not `timeout` each in turn
+            _, pending = wait(futures.values(), timeout=self.timeout)
+            if pending:
+                raise TimeoutError(
+                    "No response within {}s for {}".format(
+                        self.timeout,
+                        ", ".join(c for c, f in futures.items() if f in pending),
+                    )
+                )
+
+            # assemble in `_curves` order so the columns are deterministic
+            dfs = pd.DataFrame()
+            for curve, future in futures.items():
+                dfs[_curves[curve]] = future.result()
+        finally:
+            # dont wait on stragglers if a request failed or timed out
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        # drop any remaining nans
+        dfs.dropna(inplace=True)
+        return dfs
+
+    def buildYieldCurve(self):
+        """build a full yield curve from `_defaultFrom` to `end_date`"""
+        df = self.fetchCurves(to_=self.endDate())
+        with self._dataLock:
+            self.df = df
+            self.saveData()
+
+    def refreshYieldCurve(self):
+        """fetch only dates newer than the cached yield curve and append them"""
+        import pandas as pd
 
-    def saveData(self):
         if self.df.empty:
+            # nothing cached, so nothing to extend
+            return self.buildYieldCurve()
+
+        # request the window after the last cached date, up to the same end
+        # as a full reload
+        lastDate = self.df.index.max()
+        if lastDate >= pd.Timestamp(self.endDate()):
             # nothing to do
             return
-        self.df.to_csv(os.path.join(os.path.dirname(__file__), "data_cache.csv"))
+        df = self.fetchCurves(
+            from_=(lastDate + datetime.timedelta(days=1)).strftime("%Y-%m-%d"),
+            to_=self.endDate(),
+        )
 
-    def loadData(self):
-        if os.path.exists(os.path.join(os.path.dirname(__file__), "data_cache.csv")):
-            self.df = pd.read_csv(
-                os.path.join(os.path.dirname(__file__), "data_cache.csv")
-            )
+        # only keep rows we dont already have
+        df = df[df.index > lastDate]
+        if df.empty:
+            # nothing to do
+            return
+
+        # merge and dedupe on the date index
+        with self._dataLock:
+            merged = pd.concat([self.df, df])
+            self.df = merged[~merged.index.duplicated(keep="last")].sort_index()
+            self.saveData(df, append=True)
 
-            # parse date columns
-            self.df["date"] = pd.to_datetime(self.df["date"])
+    def endDate(self):
+        """`end_date`, or today"""
+        return self.end_date or datetime.date.today().strftime("%Y-%m-%d")
 
-            # set date column to be index
-            self.df.set_index("date", inplace=True)
+    def saveData(self, df=None, append=False):
+        """write `df` (default all of `self.df`) to the cache, optionally appending"""
+        df = self.df if df is None else df
+        if df.empty:
+            # nothing to do
+            return
 
-            # drop any remaining nans
-            self.df.dropna(inplace=True)
+        if append:
+            # add new rows to the end of the existing cache
+            self.cache.append(df)
         else:
-            self.df = pd.DataFrame()
+            self.cache.save(df)
+
+        # self.df already has these rows, no need to read them back
+        self._cacheMtime = self.cacheMtime()
+
+    def loadData(self):
+        with self._dataLock:
+            # pick up a cache written by older versions of this app
+            migrateLegacyCache(self.cache)
+
+            self._cacheMtime = self.cacheMtime()
+            df = self.cache.load()
+
+            # drop any remaining nans, and rows appended twice by concurrent reloads
+            df.dropna(inplace=True)
+            self._df = df[~df.index.duplicated(keep="last")]
+            self._fingerprint = None
+
+    def cacheMtime(self):
+        return os.path.getmtime(self.cache.path) if self.cache.exists() else None
+
+    def curveData(self):
+        """The yield curve history, shared by all sessions.
+
+        This is read-only state backed by the on-disk cache, which is
+        read on first use and reloaded if another server process has
+        written to it since.
+        """
+        with self._dataLock:
+            if self._df is None or self.cacheMtime() != self._cacheMtime:
+                self.loadData()
+            return self._df
+
+    @property
+    def df(self):
+        with self._dataLock:
+            if self._df is None:
+                self.loadData()
+            return self._df
+
+    @df.setter
+    def df(self, df):
+        # taken as up to date with the cache as it stands
+        with self._dataLock:
+            self._df = df
+            self._cacheMtime = self.cacheMtime()
+            self._fingerprint = None
+
+    def curveVersion(self):
+        """The yield curve history and its fingerprint, see figures.py"""
+        with self._dataLock:
+            df = self.curveData()
+            if self._fingerprint is None:
+                version = fingerprint(df)
+                if self.figure_cache is not None and version != self._lastFingerprint:
+                    # the data changed, figures of anything else are stale
+                    self.figure_cache.invalidate(keep=version)
+                self._fingerprint = self._lastFingerprint = version
+            return df, self._fingerprint
+
+    def hasData(self):
+        """Whether there is curve data, without reading it"""
+        if self._df is not None and not self._df.empty:
+            return True
+        return self.cache.exists()
@@ -0,0 +1,173 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import importlib.util
+import os
+import os.path
+import threading
+
+from ...utils import cacheDir
+
+# Legacy cache location, inside the installed package
+_legacyPath = os.path.join(os.path.dirname(__file__), "data_cache.csv")
+
+
+def _hasArrow():
+    # without importing it, pyarrow is slow to import
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class DataCache(object):
+    """Base class for an on-disk cache of a date-indexed dataframe"""
+
+    extension = ""
+
+    def __init__(self, cache_dir, name="data_cache"):
+        self.path = os.path.join(cache_dir, "{}.{}".format(name, self.extension))
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Read the cached dataframe, or an empty one if nothing is cached"""
+        if not self.exists():
+            import pandas as pd
+
+            return pd.DataFrame()
+        return self.read()
+
+    def save(self, df):
+        """Replace the cache with `df`"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # write then move so readers never see a partial file. The temporary
+        # file is per process and thread, as server workers share the folder
+        tmp = "{}.{}.{}.tmp".format(self.path, os.getpid(), threading.get_ident())
+        try:
+            self.write(df, tmp)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def append(self, df):
+        """Add new rows in `df` to the end of the cache"""
+        import pandas as pd
+
+        self.save(pd.concat([self.load(), df]))
+
+    def read(self):
+        raise NotImplementedError()
+
+    def write(self, df, path):
+        raise NotImplementedError()
+
+
+class CSVCache(DataCache):
+    """Plain CSV, dates are re-parsed on every load"""
+
+    extension = "csv"
+
+    def read(self):
+        import pandas as pd
+
+        df = pd.read_csv(self.path)
+
+        # parse date columns
+        df["date"] = pd.to_datetime(df["date"])
+
+        # set date column to be index
+        df.set_index("date", inplace=True)
+        return df
+
+    def write(self, df, path):
+        df.to_csv(path)
+
+    def append(self, df):
+        if not self.exists():
+            return self.save(df)
+
+        # add new rows to the end of the existing cache
+        df.to_csv(self.path, mode="a", header=False)
+
+
+class ParquetCache(DataCache):
+    """Parquet, keeps dtypes and the datetime index"""
+
+    extension = "parquet"
+
+    def __init__(self, cache_dir, name="data_cache", compression="snappy"):
+        super(ParquetCache, self).__init__(cache_dir, name)
+        self.compression = compression
+
+    def read(self):
+        import pandas as pd
+
+        return pd.read_parquet(self.path, memory_map=True)
+
+    def write(self, df, path):
+        df.to_parquet(path, compression=self.compression)
+
+
+class FeatherCache(DataCache):
+    """Uncompressed Arrow IPC, memory-mapped on load"""
+
+    extension = "feather"
+
+    def read(self):
+        from pyarrow import feather
+
+        return feather.read_table(self.path, memory_map=True).to_pandas()
+
+    def write(self, df, path):
+        import pyarrow as pa
+        from pyarrow import feather
+
+        # keep the index, and leave uncompressed so it can be memory-mapped
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        feather.write_feather(table, path, compression="uncompressed")
+
+
+_backends = {
+    "csv": CSVCache,
+    "parquet": ParquetCache,
+    "feather": FeatherCache,
+}
+
+
+def getCache(format=None, cache_dir=None, name="data_cache"):
+    """Construct a cache backend.
+
+    Args:
+        format (str): one of `csv`, `parquet`, `feather`. Defaults to
+                      `feather` if pyarrow is installed, else `csv`
+        cache_dir (str): folder for cache files, defaults to IEX_CACHE_DIR
+                         or ~/.cache/iexexamples
+        name (str): base filename for the cache
+    """
+    if format is None:
+        format = "feather" if _hasArrow() else "csv"
+    if format not in _backends:
+        raise ValueError(
+            "Unknown cache format: {} (expected one of {})".format(
+                format, ", ".join(_backends)
+            )
+        )
+
+    return _backends[format](cacheDir(cache_dir), name)
+
+
+def migrateLegacyCache(cache, legacyPath=_legacyPath):
+    """One-time copy of the old in-package CSV cache into `cache`"""
+    if cache.exists() or not os.path.exists(legacyPath):
+        # already migrated, or nothing to migrate
+        return False
+
+    name, _ = os.path.splitext(os.path.basename(legacyPath))
+    legacy = CSVCache(os.path.dirname(legacyPath), name)
+    cache.save(legacy.load())
+    return True
@@ -5,10 +5,44 @@
 # This file is part of the iexexamples library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import numpy as np
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 
 
-def yieldCurveSurface(df):
+def downsample(df, max_rows):
+    """Average `df` into at most `max_rows` equal-width time buckets.
+
+    Each bucket is labelled with its first date. Frames already small
+    enough are returned as is.
+    """
+    if max_rows is None or len(df) <= max_rows:
+        return df
+
+    # assign each row to a bucket by its position in the date span
+    t = df.index.values.astype("datetime64[ns]").astype("int64")
+    span = float(max(t[-1] - t[0], 1))
+    buckets = np.floor((t - t[0]) / span * max_rows).astype("int64")
+    buckets = np.minimum(buckets, max_rows - 1)
+
+    out = df.groupby(buckets).mean()
+    out.index = df.index[np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]]
+    return out
+
+
+def updateSurface(figure, df, max_rows=None):
+    """Replace the surface data in `figure` in place, downsampling if needed"""
+    df = downsample(df, max_rows)
+    figure.update_traces(
+        y=df.index.values,
+        z=df.values,
+        selector=dict(type="surface"),
+    )
+
+
+def yieldCurveSurface(df, max_rows=None):
+    """3D surface of the yield curve, downsampled to at most `max_rows` dates"""
+    df = downsample(df, max_rows)
     fig = go.Figure(
         data=[
             go.Surface(
@@ -65,17 +99,92 @@ def yieldCurveSurface(df):
     return fig
 
 
-def lineOverlay(figure, df, name):
-    figure.add_trace(
-        go.Scatter3d(
-            x=[name] * len(df),
-            y=df.index.values,
-            z=df["value"].values,
-            marker=dict(
-                size=4,
-                color="darkblue",
-            ),
-            line=dict(color="darkblue", width=5),
-            name=name,
+def lineOverlayTrace(df, name):
+    """3D line of a single `value` series, drawn alongside the surface"""
+    return go.Scatter3d(
+        x=[name] * len(df),
+        y=df.index.values,
+        z=df["value"].values,
+        marker=dict(
+            size=4,
+            color="darkblue",
+        ),
+        line=dict(color="darkblue", width=5),
+        name=name,
+    )
+
+
+def analyticsFigure(spreads, factors, inversions):
+    """2D panels of the curve analytics, see analytics.py: the spreads with
+    inversion episodes shaded, and the factor scores"""
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.08,
+        subplot_titles=("Spreads", "Factors"),
+    )
+    for name in spreads.columns:
+        fig.add_trace(
+            go.Scatter(x=spreads.index.values, y=spreads[name].values, name=name),
+            row=1,
+            col=1,
         )
+    for name in factors.columns:
+        fig.add_trace(
+            go.Scatter(x=factors.index.values, y=factors[name].values, name=name),
+            row=2,
+            col=1,
+        )
+
+    # all shapes at once, adding them one by one is slow for long histories
+    shapes = [
+        dict(
+            type="rect",
+            xref="x",
+            yref="y domain",
+            x0=start,
+            x1=end,
+            y0=0,
+            y1=1,
+            fillcolor="firebrick",
+            opacity=0.15,
+            line_width=0,
+            layer="below",
+        )
+        for start, end in zip(inversions["start"], inversions["end"])
+    ]
+    fig.update_layout(
+        height=600,
+        margin=dict(t=50, b=0, l=0, r=0),
+        shapes=shapes,
+        hovermode="x unified",
     )
+    return fig
+
+
+def lineOverlay(figure, df, name):
+    figure.add_trace(lineOverlayTrace(df, name))
+
+
+def compactOverlay(df, name):
+    """`lineOverlayTrace` of `df` in a compact form for the browser.
+
+    The trace is sent without its data, and the series as its first date
+    in days since the epoch, the gaps in days between the following dates,
+    and the values. Missing values are dropped. See clientside.py for the
+    decoding.
+    """
+    df = df[df["value"].notna()]
+    days = np.asarray(df.index.values, dtype="datetime64[D]").astype("int64")
+
+    trace = lineOverlayTrace(df.iloc[:0], name).to_plotly_json()
+    for key in ("x", "y", "z"):
+        trace.pop(key, None)
+
+    return {
+        "trace": trace,
+        "start": int(days[0]) if len(days) else 0,
+        "days": np.diff(days).tolist(),
+        "values": df["value"].astype("float64").round(4).tolist(),
+    }
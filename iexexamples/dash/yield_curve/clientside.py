@@ -0,0 +1,211 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Clientside (JavaScript) callbacks for the yield curve app.
+
+With `clientside_overlays=True`, the overlay series are sent to the
+browser once, into the `overlay-series` store (see charts.compactOverlay),
+and picking overlays just shows or hides their traces there, with no
+request to the server. In live mode, the browser keeps track of the figure
+it is showing, so the server knows which dates to extend it with.
+"""
+
+# function(surface figure, selected overlays, overlay series) -> figure.
+# Every overlay trace is always drawn, hidden unless selected, so that
+# toggling one only changes its `visible` flag and plotly can update the
+# chart in place. Decoded series are kept per store value
+composeOverlays = """
+(function () {
+    var decoded = new WeakMap();
+
+    function decode(series) {
+        var day = series.start;
+        var x = [];
+        var y = [];
+        for (var i = 0; i < series.values.length; i++) {
+            if (i > 0) {
+                day += series.days[i - 1];
+            }
+            x.push(series.trace.name);
+            y.push(new Date(day * 86400000).toISOString().slice(0, 10));
+        }
+        return Object.assign({}, series.trace, {x: x, y: y, z: series.values});
+    }
+
+    return function (figure, selected, overlaySeries) {
+        if (!figure || !figure.data || !figure.data.length) {
+            // nothing drawn yet
+            return window.dash_clientside.no_update;
+        }
+        if (!overlaySeries) {
+            return figure;
+        }
+
+        if (!decoded.has(overlaySeries)) {
+            decoded.set(overlaySeries, Object.keys(overlaySeries).map(function (key) {
+                return [key, decode(overlaySeries[key])];
+            }));
+        }
+        selected = Array.isArray(selected) ? selected : [];
+
+        var traces = decoded.get(overlaySeries).map(function (entry) {
+            return Object.assign({}, entry[1], {visible: selected.indexOf(entry[0]) >= 0});
+        });
+        return Object.assign({}, figure, {data: figure.data.concat(traces)});
+    };
+})()
+"""
+
+# function(figure, previous) -> {figure, last}: a count of the figures
+# drawn in this browser, and the newest date on the current one if live
+# updates should extend it (see YieldCurveApp.initializeLiveCallbacks).
+# Live updates extend the chart in place, without changing its figure
+trackDrawn = """
+function (figure, previous) {
+    var meta = (figure && figure.layout && figure.layout.meta) || {};
+    return {
+        figure: ((previous && previous.figure) || 0) + 1,
+        last: meta.lastDate || null
+    };
+}
+"""
+
+# function(intervals, clicks, chunk, meta, position) -> [figure, position,
+# chunk request, interval disabled, button label]. Plays the curve one
+# date per interval tick from chunks sent by the server (see playback.py),
+# keeping only the current chunk and the next one, which is requested as
+# soon as the current one is in. Waits for a chunk that hasnt arrived yet,
+# asking again if the server answered for newer data or didnt answer
+stepPlayback = """
+(function () {
+    var loaded = {version: null, chunks: {}};
+    // ms to wait for a chunk before asking for it again
+    var requestTimeout = 5000;
+
+    function decode(chunk) {
+        var rows = [];
+        var row = null;
+        chunk.values.forEach(function (values, i) {
+            row = i === 0 ? values.slice() : row.map(function (v, j) {
+                return v + values[j];
+            });
+            rows.push(row);
+        });
+        return {start: chunk.start, dates: chunk.dates, rows: rows};
+    }
+
+    return function (intervals, clicks, chunk, meta, position) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!meta || !meta.count) {
+            return [noUpdate, noUpdate, noUpdate, true, "Play"];
+        }
+        var triggered = window.dash_clientside.callback_context.triggered.map(
+            function (t) { return t.prop_id; }
+        );
+
+        position = Object.assign({index: 0, playing: false}, position);
+        if (loaded.version !== meta.version) {
+            // new data, keep the place but drop chunks of the old data
+            loaded = {version: meta.version, chunks: {}};
+            position.index = Math.min(position.index, meta.count - 1);
+            position.requested = null;
+        }
+        // a chunk of newer data than the meta is answered by new meta,
+        // which resets the requests above
+        if (
+            triggered.indexOf("playback-chunk.data") >= 0 &&
+            chunk &&
+            chunk.version === meta.version
+        ) {
+            if (chunk.values && !loaded.chunks[chunk.index]) {
+                loaded.chunks[chunk.index] = decode(chunk);
+            }
+            position.requested = null;
+        }
+
+        if (triggered.indexOf("playback-button.n_clicks") >= 0) {
+            position.playing = !position.playing;
+            if (position.playing && position.index >= meta.count - 1) {
+                // from the top
+                position.index = 0;
+            }
+        }
+
+        var current = Math.floor(position.index / meta.chunk);
+        if (
+            triggered.indexOf("playback-interval.n_intervals") >= 0 &&
+            position.playing &&
+            loaded.chunks[current]
+        ) {
+            if (position.index < meta.count - 1) {
+                position.index += 1;
+            } else {
+                position.playing = false;
+            }
+            current = Math.floor(position.index / meta.chunk);
+        }
+
+        // done with earlier chunks
+        Object.keys(loaded.chunks).forEach(function (k) {
+            if (Number(k) < current) {
+                delete loaded.chunks[k];
+            }
+        });
+
+        // fetch the current chunk if missing, else the next one
+        var chunks = Math.ceil(meta.count / meta.chunk);
+        var need = null;
+        if (!loaded.chunks[current]) {
+            need = current;
+        } else if (current + 1 < chunks && !loaded.chunks[current + 1]) {
+            need = current + 1;
+        }
+        // and again if the answer never came
+        var now = Date.now();
+        var request = noUpdate;
+        if (
+            need !== null &&
+            (need !== position.requested ||
+                now - position.requestedAt > requestTimeout)
+        ) {
+            request = {version: meta.version, index: need, at: now};
+            position.requested = need;
+            position.requestedAt = now;
+        }
+
+        var figure = noUpdate;
+        var frames = loaded.chunks[current];
+        if (frames) {
+            var i = position.index - frames.start;
+            figure = {
+                data: [{
+                    type: "scatter",
+                    mode: "lines+markers",
+                    x: meta.curves,
+                    y: frames.rows[i].map(function (v) { return v / 100; }),
+                    line: {color: "darkblue"},
+                }],
+                layout: {
+                    title: {text: frames.dates[i]},
+                    height: 400,
+                    margin: {t: 50, b: 40, l: 50, r: 20},
+                    xaxis: {type: "category", title: {text: "Curve"}},
+                    yaxis: {range: meta.range, title: {text: "Yield"}},
+                },
+            };
+        }
+
+        return [
+            figure,
+            position,
+            request,
+            !position.playing,
+            position.playing ? "Pause" : "Play",
+        ];
+    };
+})()
+"""
@@ -0,0 +1,189 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Typed-array encoding of figure payloads, for measuring payload sizes.
+
+plotly.js (>= 2.28) accepts data arrays as `{"dtype", "bdata", "shape"}`
+objects holding base64 encoded little-endian buffers, which are much
+smaller than JSON number and date lists and skip JSON number parsing.
+
+The apps don't send figures this way: the plotly.js bundled with the
+pinned dash 1.x can't decode them, and once responses are brotli
+compressed float32 arrays come out larger than JSON lists (see `measure`).
+This module is kept to compare the two as the data and dash change.
+"""
+
+import base64
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+# numpy dtype name -> plotly.js typed array dtype
+_dtypes = {
+    "float32": "f4",
+    "float64": "f8",
+}
+
+
+def encodeArray(values, dtype="float64"):
+    """Encode `values` as a plotly.js typed array spec"""
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    spec = {
+        "dtype": _dtypes[dtype],
+        "bdata": base64.b64encode(values.tobytes()).decode("ascii"),
+    }
+    if values.ndim > 1:
+        spec["shape"] = ", ".join(str(x) for x in values.shape)
+    return spec
+
+
+def decodeArray(spec):
+    """Decode a plotly.js typed array spec back into a numpy array"""
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype="<" + spec["dtype"])
+    if "shape" in spec:
+        values = values.reshape([int(x) for x in str(spec["shape"]).split(",")])
+    return values
+
+
+def _asArray(values):
+    """numpy array from a list, array, or typed array spec"""
+    if isinstance(values, dict) and "bdata" in values:
+        return decodeArray(values)
+    return np.asarray(values)
+
+
+def _epochMillis(values):
+    """dates as float64 milliseconds since epoch.
+
+    plotly.js has no int64 typed arrays, but float64 is exact for
+    millisecond timestamps, and numbers on a date axis are read as epoch ms.
+    """
+    values = _asArray(values)
+    if values.dtype.kind not in "Mm":
+        values = pd.to_datetime(values).values
+    return values.astype("datetime64[ms]").astype("int64").astype("float64")
+
+
+def _checkDtype(dtype):
+    if dtype not in _dtypes:
+        raise ValueError(
+            "Unknown encoding: {} (expected one of {})".format(
+                dtype, ", ".join(_dtypes)
+            )
+        )
+
+
+def encodeTrace(trace, dtype="float32"):
+    """Serialize a single trace (or partial trace dict) with typed-array
+    z and date data, see encodeFigure"""
+    _checkDtype(dtype)
+    trace = dict(trace.to_plotly_json() if hasattr(trace, "to_plotly_json") else trace)
+    if trace.get("z") is not None:
+        trace["z"] = encodeArray(_asArray(trace["z"]).astype("float64"), dtype)
+    if trace.get("y") is not None:
+        trace["y"] = encodeArray(_epochMillis(trace["y"]), "float64")
+    return trace
+
+
+def encodeFigure(figure, dtype="float32"):
+    """Serialize `figure` to a dict with typed-array z and date data.
+
+    Values are encoded as `dtype` (`float32` or `float64`), dates as
+    float64 epoch milliseconds with the date axis typed explicitly.
+    """
+    _checkDtype(dtype)
+
+    fig = figure.to_plotly_json() if hasattr(figure, "to_plotly_json") else figure
+    fig = dict(fig, data=[encodeTrace(trace, dtype) for trace in fig.get("data", [])])
+
+    # numeric y values need to be read as dates
+    layout = dict(fig.get("layout", {}))
+    scene = dict(layout.get("scene", {}))
+    scene["yaxis"] = dict(scene.get("yaxis", {}), type="date")
+    layout["scene"] = scene
+    fig["layout"] = layout
+    return fig
+
+
+def plainFigure(figure):
+    """Serialize `figure` to a dict with plain JSON lists for z and dates.
+
+    Recent plotly.py versions typed-array encode numpy data themselves,
+    this undoes that to give a baseline comparable across versions.
+    """
+    fig = figure.to_plotly_json() if hasattr(figure, "to_plotly_json") else figure
+    fig = dict(fig, data=[dict(trace) for trace in fig.get("data", [])])
+
+    for trace in fig["data"]:
+        if trace.get("z") is not None:
+            trace["z"] = _asArray(trace["z"]).tolist()
+        if trace.get("y") is not None:
+            y = _asArray(trace["y"])
+            if y.dtype.kind == "M":
+                y = np.datetime_as_string(y)
+            trace["y"] = y.tolist()
+    return fig
+
+
+def toJSON(figure):
+    """Serialize a figure or figure dict the way Dash sends it"""
+    import plotly
+
+    fig = figure.to_plotly_json() if hasattr(figure, "to_plotly_json") else figure
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def payloadSizes(figure, dtype="float32"):
+    """Bytes on the wire for `figure` as plain JSON vs typed arrays,
+    uncompressed and gzip/brotli compressed"""
+    payloads = {
+        "json": toJSON(plainFigure(figure)).encode("utf-8"),
+        dtype: toJSON(encodeFigure(figure, dtype)).encode("utf-8"),
+    }
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    sizes = {}
+    for name, payload in payloads.items():
+        sizes[name] = len(payload)
+        sizes[name + "+gzip"] = len(gzip.compress(payload))
+        if brotli is not None:
+            sizes[name + "+br"] = len(brotli.compress(payload))
+    return sizes
+
+
+def measure(rows, dtype="float32"):
+    """Payload sizes of the yield curve surface plus one overlay for
+    `rows` days of synthetic history"""
+    from .charts import lineOverlay, yieldCurveSurface
+
+    index = pd.date_range("2008-01-01", periods=rows, freq="D", name="date")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        np.abs(rng.normal(2.0, 1.0, size=(rows, 11))).round(2),
+        index=index,
+        columns=["T{}".format(i) for i in range(11)],
+    )
+
+    fig = yieldCurveSurface(df)
+    lineOverlay(fig, df[["T0"]].rename(columns={"T0": "value"}), "overlay")
+    return payloadSizes(fig, dtype)
+
+
+if __name__ == "__main__":
+    # python -m iexexamples.dash.yield_curve.encoding
+    for rows in (250, 1000, 3000, 10000):
+        sizes = measure(rows)
+        print(
+            "{:>6} rows: ".format(rows)
+            + ", ".join("{}={:,}".format(k, v) for k, v in sizes.items())
+        )
@@ -0,0 +1,157 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Cache of rendered figures, keyed by a fingerprint of the curve data.
+
+Drawing the surface and serializing it is most of the cost of showing the
+chart, and the data only changes on a reload. Figures are kept as JSON on
+disk, so they survive restarts and are shared between server processes,
+and in memory for the process that last used them.
+"""
+
+import hashlib
+import json
+import os
+import os.path
+import threading
+import time
+
+from ...utils import TTLCache
+
+# Memory cap for cached figures
+_defaultFigureBytes = 64 * 1024 * 1024
+
+
+def fingerprint(df):
+    """Short hash of the contents of `df`, including its index and columns"""
+    import pandas as pd
+
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(json.dumps([str(x) for x in df.columns]).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class FigureCache(object):
+    """Figure payloads by key, in memory and as JSON files in `path`.
+
+    Keys start with the data fingerprint (see `key`), so `invalidate` can
+    drop everything drawn from other data.
+
+    Args:
+        path (str): folder for figure files, or None to keep them in memory only
+        ttl (float): seconds an entry stays valid, or None to never expire
+        max_bytes (int): memory cap, by serialized size
+    """
+
+    def __init__(self, path=None, ttl=None, max_bytes=_defaultFigureBytes):
+        self.path = path
+        self.ttl = ttl
+
+        # key -> (figure, serialized size)
+        self._memory = TTLCache(ttl=ttl, max_bytes=max_bytes, sizeof=lambda x: x[1])
+
+        # stats, figures read back from disk count as hits too
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def key(self, fingerprint, *parts):
+        """Key for a figure of data with `fingerprint`, drawn with `parts`
+        (overlays, settings, anything JSON serializable)"""
+        call = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        return "{}-{}".format(fingerprint, hashlib.sha1(call).hexdigest()[:12])
+
+    def get(self, key):
+        """The cached figure for `key`, or None"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+
+        text = self._read(key)
+        try:
+            figure = json.loads(text) if text is not None else None
+        except ValueError as e:
+            # a corrupt file is a miss, it gets drawn and written again
+            print("Could not read cached figure {}: {}".format(key, e))
+            figure = None
+        if figure is None:
+            self.misses += 1
+            return None
+
+        self._memory.set(key, (figure, len(text)))
+        self.hits += 1
+        self.disk_hits += 1
+        return figure
+
+    def set(self, key, figure):
+        from .encoding import toJSON
+
+        text = toJSON(figure)
+        self._memory.set(key, (figure, len(text)))
+        try:
+            self._write(key, text)
+        except OSError as e:
+            # still cached in memory, and the chart shouldnt break over it
+            print("Could not save cached figure {}: {}".format(key, e))
+
+    def getOrSet(self, key, func):
+        """Return the cached figure for `key`, calling `func()` to draw it on a miss"""
+        figure = self.get(key)
+        if figure is None:
+            figure = func()
+            self.set(key, figure)
+        return figure
+
+    def invalidate(self, keep=None):
+        """Drop every figure, except those of data with fingerprint `keep`"""
+        self._memory.clear()
+        if self.path is None or not os.path.isdir(self.path):
+            return
+
+        for name in os.listdir(self.path):
+            if keep is None or not name.startswith(keep + "-"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    # another process got there first
+                    pass
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".json")
+
+    def _read(self, key):
+        if self.path is None:
+            return None
+        try:
+            if self.ttl is not None:
+                if os.path.getmtime(self._file(key)) + self.ttl <= time.time():
+                    return None
+            with open(self._file(key), "r") as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print("Could not read cached figure {}: {}".format(key, e))
+            return None
+
+    def _write(self, key, text):
+        if self.path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+
+        # write then move so readers never see a partial file. The temporary
+        # file is per process and thread, as server workers share the folder
+        tmp = "{}.{}.{}.tmp".format(self._file(key), os.getpid(), threading.get_ident())
+        try:
+            with open(tmp, "w") as fp:
+                fp.write(text)
+            os.replace(tmp, self._file(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
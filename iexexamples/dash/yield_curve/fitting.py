@@ -0,0 +1,269 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Fitted yield curves, for maturities in between the treasury tenors.
+
+Curves are fitted on every date of a curve frame at once (dates by curves,
+named like "3 Month" or "10 Year", as `YieldCurveApp.df`):
+
+- `splineCurves`: natural cubic spline through the tenors. A spline is
+  linear in the yields, so for a given maturity grid it is a single
+  (tenors x grid) weight matrix, applied to all dates in one product
+- `CurveFitter`: Nelson-Siegel, or Nelson-Siegel-Svensson with a second
+  hump. For fixed decay constants both are linear in their betas, so
+  every date is solved by least squares against a grid of decay
+  constants, and the best fit kept per date. Parameters are cached per
+  date, so only new or changed dates are fitted again
+
+Maturities are in years throughout.
+"""
+
+import functools
+import itertools
+
+import numpy as np
+
+# Decay constants tried, in years
+_defaultLambdas = np.geomspace(0.25, 10, 30)
+
+# Svensson's two decay constants are kept at least this far apart, closer
+# ones make its two hump terms nearly collinear
+_minLambdaRatio = 2.0
+
+# Dates fitted per batch, bounding memory to about chunk x candidates
+_defaultChunk = 512
+
+# Model name -> number of betas
+_models = {"ns": 3, "nss": 4}
+
+
+def _checkModel(model):
+    if model not in _models:
+        raise ValueError(
+            "Unknown model: {} (expected one of {})".format(model, ", ".join(_models))
+        )
+
+
+def maturities(names):
+    """Maturity in years of each curve name, e.g. "3 Month" -> 0.25"""
+    out = []
+    for name in names:
+        count, unit = str(name).split()
+        out.append(float(count) / (12.0 if unit.lower().startswith("month") else 1.0))
+    return np.asarray(out)
+
+
+def splineWeights(knots, grid):
+    """(knots x grid) matrix taking yields at `knots` to the natural cubic
+    spline through them at `grid`. Flat beyond the first and last knot"""
+    knots = np.asarray(knots, dtype="float64")
+    grid = np.clip(np.asarray(grid, dtype="float64"), knots[0], knots[-1])
+    k = len(knots)
+    h = np.diff(knots)
+
+    # second derivatives M from the yields: T M[1:-1] = R y, M[0] = M[-1] = 0
+    T = (
+        np.diag((h[:-1] + h[1:]) / 3)
+        + np.diag(h[1:-1] / 6, 1)
+        + np.diag(h[1:-1] / 6, -1)
+    )
+    R = np.zeros((k - 2, k))
+    rows = np.arange(k - 2)
+    R[rows, rows] = 1 / h[:-1]
+    R[rows, rows + 1] = -1 / h[:-1] - 1 / h[1:]
+    R[rows, rows + 2] = 1 / h[1:]
+    M = np.zeros((k, k))
+    M[1:-1] = np.linalg.solve(T, R)
+
+    # S(g) = a y[i] + b y[i+1] + c M[i] + d M[i+1] on knot interval i
+    i = np.clip(np.searchsorted(knots, grid, side="right") - 1, 0, k - 2)
+    width = h[i]
+    a = (knots[i + 1] - grid) / width
+    b = 1 - a
+    c = (a**3 - a) * width**2 / 6
+    d = (b**3 - b) * width**2 / 6
+
+    W = np.zeros((k, len(grid)))
+    cols = np.arange(len(grid))
+    W[i, cols] += a
+    W[i + 1, cols] += b
+    return W + M[i].T * c + M[i + 1].T * d
+
+
+def splineCurves(df, grid):
+    """(dates x grid) yields of `df` at maturities `grid`, by natural cubic
+    spline. Dates missing any tenor are NaN"""
+    knots = maturities(df.columns)
+    order = np.argsort(knots)
+    return df.values[:, order] @ splineWeights(knots[order], grid)
+
+
+def basis(tau, lambdas, model="ns"):
+    """Nelson-Siegel(-Svensson) loadings of maturities `tau` for decay
+    constants `lambdas` ((lambda1,) or (lambda1, lambda2)), as
+    (len(tau) x betas)"""
+    tau = np.maximum(np.asarray(tau, dtype="float64"), 1e-6)
+    columns = [np.ones_like(tau)]
+    for j, lam in enumerate(lambdas[: _models[model] - 2]):
+        x = tau / lam
+        slope = (1 - np.exp(-x)) / x
+        if j == 0:
+            columns.append(slope)
+        columns.append(slope - np.exp(-x))
+    return np.stack(columns, axis=-1)
+
+
+def candidates(model="ns", lambdas=_defaultLambdas):
+    """Decay constants tried for `model`, as (candidates x 1 or 2)"""
+    if model == "ns":
+        return np.asarray(lambdas, dtype="float64")[:, None]
+    pairs = [
+        (l1, l2)
+        for l1, l2 in itertools.product(lambdas, lambdas)
+        if l2 >= l1 * _minLambdaRatio
+    ]
+    return np.asarray(pairs, dtype="float64")
+
+
+def fitCurves(values, tau, model="ns", lambdas=_defaultLambdas, chunk=_defaultChunk):
+    """Fit `model` to each row of `values` (dates x maturities `tau`).
+
+    Returns (betas, decay constants, rmse) per row, NaN for rows with
+    missing values.
+    """
+    _checkModel(model)
+    values = np.asarray(values, dtype="float64")
+    grid, P, residual = _designs(
+        tuple(np.asarray(tau, dtype="float64")), model, tuple(lambdas)
+    )
+
+    n = len(values)
+    betas = np.full((n, _models[model]), np.nan)
+    decays = np.full((n, grid.shape[1]), np.nan)
+    rmse = np.full(n, np.nan)
+
+    complete = np.flatnonzero(~np.isnan(values).any(axis=1))
+    for start in range(0, len(complete), chunk):
+        rows = complete[start : start + chunk]
+        Y = values[rows]
+
+        # squared error of every date against every candidate at once
+        sse = np.einsum("nm,cmk,nk->nc", Y, residual, Y, optimize=True)
+        best = np.argmin(sse, axis=1)
+
+        betas[rows] = np.einsum("npm,nm->np", P[best], Y)
+        decays[rows] = grid[best]
+        rmse[rows] = np.sqrt(np.maximum(sse[np.arange(len(rows)), best], 0) / len(tau))
+
+    return betas, decays, rmse
+
+
+@functools.lru_cache(maxsize=8)
+def _designs(tau, model, lambdas):
+    """(candidates, pseudo-inverses, residual makers) of each candidate's
+    design X, so that fitting y is P y and its squared error y' (I - X P) y.
+    The same for every call with the same tenors, so kept"""
+    grid = candidates(model, lambdas)
+    X = np.stack([basis(tau, lams, model) for lams in grid])
+    P = np.linalg.pinv(X)
+    residual = np.eye(len(tau)) - X @ P
+    for array in (grid, P, residual):
+        array.flags.writeable = False
+    return grid, P, residual
+
+
+def evaluate(betas, decays, grid, model="ns"):
+    """(dates x grid) yields of fitted parameters at maturities `grid`"""
+    out = np.full((len(betas), len(grid)), np.nan)
+    fitted = np.flatnonzero(~np.isnan(decays).any(axis=1))
+    if not len(fitted):
+        return out
+
+    # dates fitted with the same decay constants share a design matrix
+    unique, inverse = np.unique(decays[fitted], axis=0, return_inverse=True)
+    X = np.stack([basis(grid, lams, model) for lams in unique])
+    out[fitted] = np.einsum("ngp,np->ng", X[inverse.ravel()], betas[fitted])
+    return out
+
+
+class CurveFitter(object):
+    """Nelson-Siegel(-Svensson) parameters of a curve frame per date,
+    cached so that only new dates, or dates whose yields changed, are
+    fitted again.
+
+    Args:
+        model (str): `ns` for Nelson-Siegel, `nss` for Nelson-Siegel-Svensson
+        lambdas (array): decay constants tried, in years
+        chunk (int): dates fitted per batch
+    """
+
+    def __init__(self, model="ns", lambdas=_defaultLambdas, chunk=_defaultChunk):
+        _checkModel(model)
+        self.model = model
+        self.lambdas = lambdas
+        self.chunk = chunk
+
+        # the yields each cached fit was made from, and its parameters
+        self._inputs = None
+        self.params = None
+
+    def fit(self, df):
+        """Fit the dates of `df` not already cached with the same yields,
+        returns the number fitted. See `params` for the results"""
+        import pandas as pd
+
+        stale = self.staleDates(df)
+        if len(stale):
+            rows = df.loc[stale]
+            betas, decays, rmse = fitCurves(
+                rows.values,
+                maturities(df.columns),
+                self.model,
+                self.lambdas,
+                self.chunk,
+            )
+            params = pd.DataFrame(
+                np.column_stack([betas, decays, rmse]),
+                index=rows.index,
+                columns=["beta{}".format(i) for i in range(betas.shape[1])]
+                + ["lambda{}".format(i + 1) for i in range(decays.shape[1])]
+                + ["rmse"],
+            )
+            if self.params is None:
+                self._inputs, self.params = rows, params
+            else:
+                self._inputs = _upsert(self._inputs, rows)
+                self.params = _upsert(self.params, params)
+        return len(stale)
+
+    def staleDates(self, df):
+        """dates of `df` with no cached fit, or one made from other yields"""
+        if self._inputs is None or list(df.columns) != list(self._inputs.columns):
+            self._inputs = self.params = None
+            return df.index
+
+        cached = df.index.isin(self._inputs.index)
+        known = df.index[cached]
+        changed = ~np.isclose(
+            df.loc[known].values, self._inputs.loc[known].values, equal_nan=True
+        ).all(axis=1)
+        return df.index[~cached].append(known[changed])
+
+    def curves(self, grid, dates=None):
+        """(dates x grid) fitted yields at maturities `grid`, for `dates`
+        (all cached dates by default). Call `fit` first"""
+        params = self.params if dates is None else self.params.loc[dates]
+        betas = params.filter(like="beta").values
+        decays = params.filter(like="lambda").values
+        return evaluate(betas, decays, np.asarray(grid, dtype="float64"), self.model)
+
+
+def _upsert(df, rows):
+    """`df` with `rows` replacing or added to its rows, by date"""
+    import pandas as pd
+
+    return pd.concat([df[~df.index.isin(rows.index)], rows]).sort_index()
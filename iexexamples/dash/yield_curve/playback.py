@@ -0,0 +1,78 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Frames for the animated 2D curve playback, see clientside.stepPlayback.
+
+Each frame is the curve on one date. Frames are computed once per data
+version and sent to the browser a chunk of dates at a time, as playback
+reaches them, rather than the whole history up front. Yields are sent in
+whole basis points, and every row of a chunk but the first as its change
+from the row before, which is mostly a small integer.
+"""
+
+import numpy as np
+
+# Dates per chunk sent to the browser
+_defaultChunk = 250
+
+
+class PlaybackFrames(object):
+    """Curves of `df` by date, in chunks of `chunk` dates. Dates missing any
+    curve are left out.
+
+    Args:
+        df (DataFrame): curve data, as `YieldCurveApp.df`
+        version (str): data version, sent along so browsers can tell
+                       chunks of older data apart
+        chunk (int): dates per chunk
+    """
+
+    def __init__(self, df, version=None, chunk=_defaultChunk):
+        df = df.dropna()
+        self.version = version
+        self.chunk = chunk
+        self.count = len(df)
+        self.curves = [str(x) for x in df.columns]
+
+        # basis points, as changes from the previous date except on the
+        # first date of each chunk
+        bp = np.rint(df.values * 100).astype("int64")
+        deltas = np.diff(bp, axis=0, prepend=0)
+        deltas[::chunk] = bp[::chunk]
+
+        self.dates = df.index.strftime("%Y-%m-%d").tolist()
+        self._values = deltas.tolist()
+        self.range = [float(bp.min()) / 100, float(bp.max()) / 100] if len(bp) else []
+
+    def chunks(self):
+        """number of chunks"""
+        return -(-self.count // self.chunk)
+
+    def meta(self):
+        """What the browser needs before any chunk: the data version, number
+        of dates, chunk size, curve names and yield range"""
+        return {
+            "version": self.version,
+            "count": self.count,
+            "chunk": self.chunk,
+            "curves": self.curves,
+            "range": self.range,
+        }
+
+    def payload(self, index):
+        """chunk `index`, or None past the end"""
+        if not 0 <= index < self.chunks():
+            return None
+        start = index * self.chunk
+        end = start + self.chunk
+        return {
+            "version": self.version,
+            "index": index,
+            "start": start,
+            "dates": self.dates[start:end],
+            "values": self._values[start:end],
+        }
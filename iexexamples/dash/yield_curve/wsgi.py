@@ -0,0 +1,16 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+# Production entry point, e.g.
+#   gunicorn -w 4 -b 0.0.0.0:8050 iexexamples.dash.yield_curve.wsgi:server
+#
+# Each worker process loads its own app. Curve data is shared through the
+# on-disk cache (IEX_CACHE_DIR), figures live in each browser session.
+from .app import YieldCurveApp
+
+app = YieldCurveApp(metrics=True)
+server = app.app.server
@@ -5,10 +5,163 @@
 # This file is part of the iexexamples library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import json
+
+from .test_download import _dailyClient
 
 
 class TestTimeseriesDownloaderApp:
-    def test_import(self):
+    def test_import(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader import TimeseriesDownloader
+        from iexexamples.utils import ReplayClient
+
+        # offline, against the recorded fixtures
+        app = TimeseriesDownloader(
+            client=ReplayClient(strict=True),
+            metadata_path=str(tmpdir.join("metadata.json")),
+            jobs_dir=str(tmpdir.join("jobs")),
+            background_warmup=False,
+        )
+        assert app.metadata.ready.wait(5)
+        assert "TREASURY" in app.metadata.ids()
+        assert "DGS10" in app.metadata.keys("TREASURY")
+
+    def test_preview(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader import TimeseriesDownloader
+
+        app = TimeseriesDownloader(
+            client=_dailyClient(),
+            metadata_path=str(tmpdir.join("metadata.json")),
+            jobs_dir=str(tmpdir.join("jobs")),
+            rate_limit=None,
+            background_warmup=False,
+        )
+        job = app.jobs.submit(
+            "download", app.runDownload, str(tmpdir), [("ID", "KEY", "", "5d")]
+        )
+        job.future.result(5)
+        (path,) = job.files
+
+        # offered once downloaded, by job and file index
+        (status,) = app.jobs.status([job.id])
+        buttons = app.renderJob(status).children[2:]
+        assert [b.id for b in buttons] == [
+            {"type": "preview-file", "job": job.id, "index": 0}
+        ]
+        picked = {"job": job.id, "file": 0}
+        assert app.previewPath(picked, [job.id]) == path
+
+        style, summary, columns, records, pages = app.previewPage(path, 0, 2)
+        assert summary.startswith("ID_KEY__5d.csv: 6 rows")
+        assert [c["id"] for c in columns] == ["date", "value"]
+        assert (len(records), pages) == (2, 3)
+        assert app.preview(path) is app.preview(path)
+
+        # a bad filter is reported rather than raised
+        _, summary, _, records, _ = app.previewPage(path, 0, 2, None, "{x} = 1")
+        assert summary == "Unknown column: x" and records == []
+
+        client = app.app.server.test_client()
+
+        def post(outputs, inputs, state, changed):
+            return client.post(
+                "/_dash-update-component",
+                json={
+                    "output": "..{}..".format("...".join(outputs)),
+                    "outputs": [
+                        dict(zip(("id", "property"), x.split("."))) for x in outputs
+                    ],
+                    "inputs": inputs,
+                    "state": state,
+                    "changedPropIds": [changed],
+                },
+            )
+
+        # only files downloaded in the session can be picked
+        def pick(jobId, index, sessionJobs):
+            button = {"type": "preview-file", "job": jobId, "index": index}
+            return post(
+                [
+                    "preview-picked.data",
+                    "preview-table.page_current",
+                    "preview-table.sort_by",
+                    "preview-table.filter_query",
+                ],
+                [[{"id": button, "property": "n_clicks", "value": 1}]],
+                [{"id": "session-jobs", "property": "data", "value": sessionJobs}],
+                json.dumps(button, sort_keys=True, separators=(",", ":")) + ".n_clicks",
+            )
+
+        response = pick(job.id, 0, [job.id])
+        assert response.status_code == 200
+        assert response.get_json()["response"]["preview-picked"]["data"] == picked
+        assert pick(job.id, 0, []).status_code == 204
+        assert pick(job.id, 1, [job.id]).status_code == 204
+        assert pick("0123456789ab", 0, ["0123456789ab"]).status_code == 204
+
+        # and every page is resolved again against the session's jobs, so a
+        # path, or a job of another session, posted to the table is refused
+        def page(picked, sessionJobs):
+            return post(
+                [
+                    "preview-container.style",
+                    "preview-summary.children",
+                    "preview-table.columns",
+                    "preview-table.data",
+                    "preview-table.page_count",
+                ],
+                [
+                    {"id": "preview-picked", "property": "data", "value": picked},
+                    {"id": "preview-table", "property": "page_current", "value": 0},
+                    {"id": "preview-table", "property": "page_size", "value": 2},
+                    {"id": "preview-table", "property": "sort_by", "value": []},
+                    {"id": "preview-table", "property": "filter_query", "value": ""},
+                ],
+                [{"id": "session-jobs", "property": "data", "value": sessionJobs}],
+                "preview-picked.data",
+            )
+
+        response = page(picked, [job.id])
+        assert response.status_code == 200
+        assert len(response.get_json()["response"]["preview-table"]["data"]) == 2
+        assert page(picked, []).status_code == 204
+        assert page("/etc/passwd", [job.id]).status_code == 204
+        assert page({"job": job.id, "file": "/etc/passwd"}, [job.id]).status_code == 204
+        assert page({"job": "../../etc", "file": 0}, ["../../etc"]).status_code == 204
+
+    def test_cancel(self, tmpdir):
         from iexexamples.dash.timeseries_downloader import TimeseriesDownloader
 
-        TimeseriesDownloader()
+        app = TimeseriesDownloader(
+            client=_dailyClient(),
+            metadata_path=str(tmpdir.join("metadata.json")),
+            jobs_dir=str(tmpdir.join("jobs")),
+            background_warmup=False,
+        )
+        job = app.jobs.submit("wait", lambda job: job.cancelled.wait(5))
+        client = app.app.server.test_client()
+
+        def cancel(sessionJobs):
+            button = {"type": "cancel-job", "index": job.id}
+            return client.post(
+                "/_dash-update-component",
+                json={
+                    "output": "fake-output1.children",
+                    "outputs": {"id": "fake-output1", "property": "children"},
+                    "inputs": [[{"id": button, "property": "n_clicks", "value": 1}]],
+                    "state": [
+                        {"id": "session-jobs", "property": "data", "value": sessionJobs}
+                    ],
+                    "changedPropIds": [
+                        json.dumps(button, sort_keys=True, separators=(",", ":"))
+                        + ".n_clicks"
+                    ],
+                },
+            )
+
+        # only jobs of the session can be cancelled from it
+        assert cancel(["0123456789ab"]).status_code == 200
+        assert not job.cancelled.is_set()
+        assert cancel([job.id]).status_code == 200
+        assert job.cancelled.is_set()
+        job.future.result(5)
@@ -0,0 +1,175 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import datetime
+import os
+
+import pandas as pd
+from mock import MagicMock, patch
+
+
+def _dailyClient(rowsPerDay=1):
+    """Fake pyEX client with `rowsPerDay` rows for every day, honoring `limit`"""
+    client = MagicMock()
+
+    def timeSeriesDF(from_, to_, limit, **kwargs):
+        dates = pd.date_range(from_, to_, freq="D").repeat(rowsPerDay)
+        df = pd.DataFrame({"date": dates, "value": range(len(dates))})
+        return df.iloc[:limit]
+
+    client.timeSeriesDF.side_effect = timeSeriesDF
+    return client
+
+
+class TestDownload:
+    def test_date_windows(self):
+        from iexexamples.dash.timeseries_downloader.download import (
+            dateWindows,
+            rangeStart,
+        )
+
+        today = datetime.date(2021, 3, 31)
+        start = rangeStart("3m", today)
+        assert start == datetime.date(2020, 12, 31)
+
+        windows = dateWindows(start, today, window_days=30)
+        assert windows[0][0] == start and windows[-1][1] == today
+        for (_, end), (nextStart, _) in zip(windows, windows[1:]):
+            assert nextStart - end == datetime.timedelta(days=1)
+
+    def test_download_has_no_row_cap(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.download import (
+            downloadTimeseries,
+        )
+
+        client = _dailyClient(rowsPerDay=10)
+        progress = []
+        path = str(tmpdir.join("out.csv"))
+
+        # 2020-01-01 to 2021-01-01 is 367 days * 10 rows, far more than one page
+        rows = downloadTimeseries(
+            client,
+            path,
+            "ID",
+            "KEY",
+            "",
+            "1y",
+            progress=lambda *args: progress.append(args),
+            page_size=500,
+            today=datetime.date(2021, 1, 1),
+        )
+
+        df = pd.read_csv(path, index_col=0)
+        assert rows == len(df) == 3670
+        assert df.index.is_unique
+        assert pd.to_datetime(df["date"]).is_monotonic_increasing
+        assert progress[-1] == (3670, len(progress), len(progress))
+
+    def test_busy_day_is_not_truncated(self, tmpdir):
+        import pytest
+
+        from iexexamples.dash.timeseries_downloader.download import (
+            downloadTimeseries,
+            fetchWindow,
+        )
+
+        # a single day with more rows than a page is fetched again in full
+        client = _dailyClient(rowsPerDay=30)
+        day = datetime.date(2021, 1, 1)
+        (df,) = fetchWindow(client, day, day, page_size=8, id="ID")
+        assert len(df) == 30
+        assert [c.kwargs["limit"] for c in client.timeSeriesDF.call_args_list] == [
+            8,
+            16,
+            32,
+        ]
+
+        # beyond the largest page the download fails rather than dropping rows
+        path = str(tmpdir.join("out.csv"))
+        with patch("iexexamples.dash.timeseries_downloader.download._maxPageSize", 16):
+            with pytest.raises(ValueError):
+                downloadTimeseries(
+                    client, path, "ID", "KEY", "", "1d", page_size=8, today=day
+                )
+        assert not os.path.exists(path)
+
+    def test_failed_download_keeps_earlier_file(self, tmpdir):
+        import pytest
+
+        from iexexamples.dash.timeseries_downloader.download import (
+            downloadTimeseries,
+        )
+
+        path = str(tmpdir.join("out.csv"))
+        tmpdir.join("out.csv").write("from an earlier run")
+
+        # the file is only replaced once the download is complete, and the
+        # partial one is removed
+        client = _dailyClient()
+        client.timeSeriesDF.side_effect = [
+            client.timeSeriesDF.side_effect("2021-01-01", "2021-01-07", 5000),
+            IOError("connection reset"),
+        ]
+        with pytest.raises(IOError):
+            downloadTimeseries(
+                client,
+                path,
+                "ID",
+                "KEY",
+                "",
+                "13d",
+                window_days=7,
+                today=datetime.date(2021, 1, 14),
+            )
+        assert tmpdir.listdir() == [tmpdir.join("out.csv")]
+        assert tmpdir.join("out.csv").read() == "from an earlier run"
+
+        rows = downloadTimeseries(
+            _dailyClient(), path, "ID", "KEY", "", "13d", window_days=7
+        )
+        assert rows == 14 and tmpdir.listdir() == [tmpdir.join("out.csv")]
+
+    def test_expand_jobs(self):
+        from iexexamples.dash.timeseries_downloader.download import (
+            WILDCARD,
+            expandJobs,
+        )
+
+        metadata = MagicMock()
+        metadata.subkeys.side_effect = lambda id, key: {"A": ["X", "Y"], "B": []}[key]
+
+        assert expandJobs(metadata, "ID", "A", None, "1m") == [("ID", "A", None, "1m")]
+        assert expandJobs(metadata, "ID", ["A", "B"], [WILDCARD], "1m") == [
+            ("ID", "A", "X", "1m"),
+            ("ID", "A", "Y", "1m"),
+            ("ID", "B", None, "1m"),
+        ]
+
+    def test_download_batch(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.download import downloadBatch
+        from iexexamples.utils import TokenBucket
+
+        client = _dailyClient()
+        jobs = [("ID", key, None, "5d") for key in ("A", "B", "C")]
+        progress = []
+
+        results = downloadBatch(
+            client,
+            str(tmpdir),
+            jobs,
+            max_workers=2,
+            limiter=TokenBucket(1000, burst=2),
+            progress=lambda *args: progress.append(args),
+            today=datetime.date(2021, 1, 10),
+        )
+
+        assert [job for job, _, _ in results] == jobs
+        assert sorted(tmpdir.listdir()) == [
+            tmpdir.join("ID_{}_None_5d.csv".format(key)) for key in ("A", "B", "C")
+        ]
+        assert [rows for _, _, rows in results] == [6, 6, 6]
+        assert progress[-1] == (3, 3, 18)
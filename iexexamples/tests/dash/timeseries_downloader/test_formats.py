@@ -0,0 +1,141 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import datetime
+
+import pandas as pd
+import pytest
+
+from .test_download import _dailyClient
+
+
+def _read(path, format):
+    if format == "csv.zst":
+        import pyarrow as pa
+
+        # pandas needs zstandard for this, pyarrow can do it too
+        with pa.CompressedInputStream(path, "zstd") as fp:
+            return pd.read_csv(fp, index_col=0, parse_dates=["date"])
+    if format.startswith("csv"):
+        return pd.read_csv(path, index_col=0, parse_dates=["date"])
+    if format.startswith("parquet"):
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
+
+
+class TestFormats:
+    @pytest.mark.parametrize(
+        "format", ["csv", "csv.gz", "csv.zst", "parquet", "parquet-zstd", "feather"]
+    )
+    def test_roundtrip(self, tmpdir, format):
+        pytest.importorskip("pyarrow")
+        from iexexamples.dash.timeseries_downloader.formats import (
+            extension,
+            getWriter,
+            read,
+        )
+
+        df = pd.DataFrame(
+            {
+                "date": pd.date_range("2020-01-01", periods=10),
+                "key": ["A", "B"] * 5,
+                "value": [float(x) for x in range(10)],
+            }
+        )
+        path = str(tmpdir.join("out." + extension(format)))
+
+        # written in windows, read back as one frame
+        with getWriter(format, path) as writer:
+            writer.write(df.iloc[:4])
+            writer.write(df.iloc[4:])
+
+        assert writer.rows == 10
+        pd.testing.assert_frame_equal(
+            _read(path, format).reset_index(drop=True), df, check_dtype=False
+        )
+
+        # and by the format's own reader, with the dates parsed
+        pd.testing.assert_frame_equal(read(path), df, check_dtype=False)
+
+    @pytest.mark.parametrize(
+        "format", ["csv", "csv.gz", "csv.zst", "parquet", "parquet-zstd", "feather"]
+    )
+    def test_columns_change_between_windows(self, tmpdir, format):
+        pytest.importorskip("pyarrow")
+        from iexexamples.dash.timeseries_downloader.download import (
+            downloadTimeseries,
+        )
+        from iexexamples.dash.timeseries_downloader.formats import extension, read
+
+        # IEX leaves out empty fields: `label` is empty in the first week,
+        # `volume` only turns up in the second, and `count` goes from whole
+        # numbers to fractions
+        client = _dailyClient()
+        dailyDF = client.timeSeriesDF.side_effect
+
+        def timeSeriesDF(from_, to_, limit, **kwargs):
+            df = dailyDF(from_, to_, limit, **kwargs)
+            if from_ == "2021-01-01":
+                return df.assign(label=None, count=1)
+            return df.assign(label="x", count=0.5, volume=10)
+
+        client.timeSeriesDF.side_effect = timeSeriesDF
+        path = str(tmpdir.join("out." + extension(format)))
+        rows = downloadTimeseries(
+            client,
+            path,
+            "ID",
+            "KEY",
+            "",
+            "13d",
+            format=format,
+            window_days=7,
+            today=datetime.date(2021, 1, 14),
+        )
+
+        df = read(path)
+        assert rows == len(df) == 14
+        assert list(df.columns) == ["date", "value", "label", "count", "volume"]
+        assert df["label"].isna().tolist() == [True] * 7 + [False] * 7
+        assert df["count"].tolist() == [1.0] * 7 + [0.5] * 7
+        assert df["volume"].isna().sum() == 7 and df["volume"].iloc[-1] == 10
+        assert df["date"].is_monotonic_increasing
+        assert tmpdir.listdir() == [tmpdir.join("out." + extension(format))]
+
+    def test_unknown_format(self):
+        from iexexamples.dash.timeseries_downloader.formats import formatOf, getWriter
+
+        with pytest.raises(ValueError):
+            getWriter("xlsx", "out.xlsx")
+        with pytest.raises(ValueError):
+            formatOf("out.xlsx")
+        assert formatOf("ID_KEY__1m.csv.gz") == "csv.gz"
+
+    def test_download_parquet(self, tmpdir):
+        pytest.importorskip("pyarrow")
+        from iexexamples.dash.timeseries_downloader.download import (
+            downloadTimeseries,
+            filename,
+        )
+
+        path = str(tmpdir.join(filename("ID", "KEY", "", "1m", "parquet-zstd")))
+        assert path.endswith("ID_KEY__1m.parquet")
+
+        rows = downloadTimeseries(
+            _dailyClient(),
+            path,
+            "ID",
+            "KEY",
+            "",
+            "1m",
+            format="parquet-zstd",
+            window_days=7,
+            today=datetime.date(2021, 1, 31),
+        )
+        df = pd.read_parquet(path)
+        assert rows == len(df) == 32
+        assert df["date"].is_monotonic_increasing
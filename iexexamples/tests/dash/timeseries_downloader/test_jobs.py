@@ -0,0 +1,132 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import threading
+
+
+class TestJobQueue:
+    def test_run_fail_and_cancel(self):
+        from iexexamples.dash.timeseries_downloader.jobs import JobQueue
+
+        queue = JobQueue(max_workers=1)
+        started = threading.Event()
+
+        def wait(job):
+            started.set()
+            while True:
+                job.checkCancelled()
+                job.cancelled.wait(0.01)
+
+        def fail(job):
+            raise ValueError("boom")
+
+        running = queue.submit("running", wait)
+        queued = queue.submit("queued", lambda job: "never")
+        started.wait(5)
+        assert (running.status, queued.status) == ("running", "queued")
+
+        # the queued job never starts, the running one stops
+        queue.cancel(queued.id)
+        queue.cancel(running.id)
+        running.future.result(5)
+        assert (running.status, queued.status) == ("cancelled", "cancelled")
+
+        done = queue.submit("done", lambda job: "ok")
+        failed = queue.submit("failed", fail)
+        failed.future.result(5)
+        assert (done.status, done.result) == ("done", "ok")
+        assert (failed.status, failed.result) == ("failed", "boom")
+        assert [job.description for job in queue.jobs()] == [
+            "failed",
+            "done",
+            "queued",
+            "running",
+        ]
+
+    def test_shared_state_dir(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.jobs import JobQueue
+
+        # two queues sharing a folder, like two server processes
+        worker1 = JobQueue(state_dir=str(tmpdir))
+        worker2 = JobQueue(state_dir=str(tmpdir))
+
+        def wait(job):
+            job.progress = "waiting"
+            while True:
+                job.checkCancelled()
+                job.cancelled.wait(0.01)
+
+        job = worker1.submit("shared", wait)
+        try:
+            # status is picked up from the shared folder
+            for _ in range(100):
+                (status,) = worker2.status([job.id])
+                if status["progress"]:
+                    break
+                job.cancelled.wait(0.01)
+            assert (status["status"], status["progress"]) == ("running", "waiting")
+        finally:
+            # cancelling from the other process reaches the running job
+            worker2.cancel(job.id)
+        job.future.result(5)
+        assert worker2.status([job.id])[0]["status"] == "cancelled"
+
+    def test_foreign_ids_never_name_files(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.jobs import JobQueue
+
+        # ids come from the browser, which can send anything
+        queue = JobQueue(state_dir=str(tmpdir.join("jobs")))
+        outside = tmpdir.join("injected.json")
+        outside.write('{"created": 0}')
+        for id in ["../injected", "../../injected", "abc", "0123456789ab\n", None]:
+            queue.cancel(id)
+            assert queue.status([id]) == []
+        assert sorted(x.basename for x in tmpdir.listdir()) == [
+            "injected.json",
+            "jobs",
+        ]
+        assert tmpdir.join("jobs").listdir() == []
+
+    def test_cancel_download_removes_partial_file(self, tmpdir):
+        import datetime
+
+        import pandas as pd
+        from mock import MagicMock
+
+        from iexexamples.dash.timeseries_downloader.download import (
+            downloadTimeseries,
+        )
+        from iexexamples.dash.timeseries_downloader.jobs import JobCancelled
+
+        cancel = threading.Event()
+        client = MagicMock()
+
+        def timeSeriesDF(from_, to_, **kwargs):
+            # cancel after the first window arrives
+            cancel.set()
+            return pd.DataFrame({"date": [from_], "value": [1.0]})
+
+        client.timeSeriesDF.side_effect = timeSeriesDF
+        path = tmpdir.join("out.csv")
+
+        try:
+            downloadTimeseries(
+                client,
+                str(path),
+                "ID",
+                "KEY",
+                None,
+                "1y",
+                cancel=cancel,
+                today=datetime.date(2021, 1, 1),
+            )
+            assert False, "expected JobCancelled"
+        except JobCancelled:
+            pass
+
+        assert client.timeSeriesDF.call_count == 1
+        assert not path.exists()
@@ -0,0 +1,102 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import time
+
+from mock import MagicMock
+
+
+def _metadataClient():
+    client = MagicMock()
+
+    def queryMetadata(id="", key=""):
+        if not id:
+            return [{"value": "TREASURY"}, {"value": "ECONOMIC"}]
+        if not key:
+            return [{"value": id + "_KEY"}]
+        return [{"value": key + "_SUBKEY"}]
+
+    client.queryMetadata.side_effect = queryMetadata
+    return client
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMetadataIndex:
+    def test_warm_and_serve_from_memory(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.metadata import MetadataIndex
+
+        client = _metadataClient()
+        index = MetadataIndex(client, path=str(tmpdir.join("index.json")))
+        assert index.ids() == []
+
+        index.start().join()
+        assert index.ready.is_set()
+        assert index.ids() == ["TREASURY", "ECONOMIC"]
+
+        for _ in range(3):
+            assert index.keys("TREASURY") == ["TREASURY_KEY"]
+            assert index.subkeys("TREASURY", "TREASURY_KEY") == ["TREASURY_KEY_SUBKEY"]
+        assert client.queryMetadata.call_count == 3
+
+    def test_persisted_and_refreshed_after_ttl(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.metadata import MetadataIndex
+
+        path = str(tmpdir.join("index.json"))
+        MetadataIndex(_metadataClient(), path=path).warm()
+
+        # a new index starts from disk without touching the network
+        client = _metadataClient()
+        clock = _Clock()
+        index = MetadataIndex(client, path=path, ttl=10, timer=clock)
+        index.load()
+        assert index.ready.is_set()
+        assert index.ids() == ["TREASURY", "ECONOMIC"]
+        assert client.queryMetadata.call_count == 0
+
+        # stale entries are served, then refreshed in the background
+        clock.now = 1e12
+        assert index.ids() == ["TREASURY", "ECONOMIC"]
+        for _ in range(100):
+            if client.queryMetadata.call_count:
+                break
+            time.sleep(0.01)
+        assert client.queryMetadata.call_count == 1
+
+    def test_save_failures_dont_break_lookups(self, tmpdir):
+        import threading
+
+        from iexexamples.dash.timeseries_downloader.metadata import MetadataIndex
+
+        # saves from many threads at once leave one whole file
+        index = MetadataIndex(_metadataClient(), path=str(tmpdir.join("index.json")))
+        threads = [
+            threading.Thread(target=index.keys, args=("ID{}".format(i),))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert tmpdir.listdir() == [tmpdir.join("index.json")]
+
+        reloaded = MetadataIndex(_metadataClient(), path=index.path)
+        reloaded.load()
+        assert len(reloaded._index["keys"]) == 8
+
+        # a folder that cant be created is logged, the listing still served
+        tmpdir.join("file").write("")
+        broken = MetadataIndex(
+            _metadataClient(), path=str(tmpdir.join("file", "index.json"))
+        )
+        assert broken.keys("TREASURY") == ["TREASURY_KEY"]
@@ -0,0 +1,103 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _write(path, rows=10):
+    from iexexamples.dash.timeseries_downloader.formats import getWriter
+
+    df = pd.DataFrame(
+        {
+            "date": pd.date_range("2020-01-01", periods=rows),
+            "key": ["A", "B"] * (rows // 2),
+            "value": [float(x) for x in range(rows)],
+        }
+    )
+    df.loc[3, "value"] = np.nan
+    with getWriter("csv", path) as writer:
+        writer.write(df)
+    return df
+
+
+class TestPreview:
+    def test_parse_filter(self):
+        from iexexamples.dash.timeseries_downloader.preview import parseFilter
+
+        assert parseFilter("") == []
+        assert parseFilter('{value} >= 2 && {key} contains "A"') == [
+            ("value", "ge", "2"),
+            ("key", "contains", "A"),
+        ]
+        with pytest.raises(ValueError):
+            parseFilter("{value} between 1")
+
+    def test_summary(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.preview import Preview
+
+        path = str(tmpdir.join("out.csv"))
+        _write(path)
+        preview = Preview(path)
+        assert preview.summary == {
+            "rows": 10,
+            "start": "2020-01-01",
+            "end": "2020-01-10",
+            "nulls": {"date": 0, "key": 0, "value": 1},
+        }
+        assert [c["type"] for c in preview.columns()] == [
+            "datetime",
+            "text",
+            "numeric",
+        ]
+
+    def test_page(self, tmpdir):
+        from iexexamples.dash.timeseries_downloader.preview import Preview
+
+        path = str(tmpdir.join("out.csv"))
+        _write(path)
+        preview = Preview(path)
+
+        records, pages, matching = preview.page(1, 4)
+        assert (pages, matching) == (3, 10)
+        assert records[0] == {"date": "2020-01-05", "key": "A", "value": 4.0}
+        assert records[-1]["date"] == "2020-01-08"
+
+        # sorted and filtered on the server, nulls last
+        sortBy = [
+            {"column_id": "key", "direction": "desc"},
+            {"column_id": "value", "direction": "asc"},
+        ]
+        records, pages, matching = preview.page(0, 10, sortBy, "{value} < 6")
+        assert matching == 5
+        assert [r["value"] for r in records] == [1.0, 5.0, 0.0, 2.0, 4.0]
+
+        # paging through the same query reuses its row order
+        view = preview.view(sortBy, "{value} < 6")
+        assert preview.view(sortBy, "{value} < 6") is view
+
+        records, _, matching = preview.page(0, 10, None, "{date} >= 2020-01-09")
+        assert matching == 2 and records[0]["date"] == "2020-01-09"
+        with pytest.raises(ValueError):
+            preview.page(0, 10, None, "{missing} = 1")
+
+        # page and size come from the browser
+        records, pages, _ = preview.page(-1, 0)
+        assert (len(records), pages) == (1, 10)
+
+    def test_app_import_is_light(self):
+        import subprocess
+        import sys
+
+        # the downloader starts without numpy and pandas, see preview.py
+        script = (
+            "import sys, iexexamples.dash.timeseries_downloader.app; "
+            "print(sorted({'numpy', 'pandas'} & set(sys.modules)))"
+        )
+        output = subprocess.check_output([sys.executable, "-c", script], text=True)
+        assert output.strip() == "[]"
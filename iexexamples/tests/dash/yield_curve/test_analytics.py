@@ -0,0 +1,90 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import numpy as np
+import pandas as pd
+
+
+def _curves(rows=300, seed=0):
+    """Synthetic curves moving in level and slope, with some noise"""
+    from iexexamples.dash.yield_curve.app import _curves
+
+    rng = np.random.default_rng(seed)
+    maturities = np.linspace(-0.5, 0.5, len(_curves))
+    level = 2 + np.cumsum(rng.normal(0, 0.05, rows))
+    slope = np.sin(np.linspace(0, 12, rows))
+    values = level[:, None] + slope[:, None] * maturities
+    return pd.DataFrame(
+        values + rng.normal(0, 0.01, values.shape),
+        index=pd.bdate_range("2020-01-01", periods=rows, name="date"),
+        columns=list(_curves.values()),
+    )
+
+
+class TestAnalytics:
+    def test_inversions(self):
+        from iexexamples.dash.yield_curve.analytics import inversions
+
+        spreads = pd.DataFrame(
+            {
+                "10Y-2Y": [0.5, -0.1, -0.3, 0.2, -0.2],
+                "10Y-3M": [-0.4, -0.1, 0.1, 0.1, 0.1],
+            },
+            index=pd.date_range("2020-01-01", periods=5),
+        )
+        df = inversions(spreads)
+        assert df["spread"].tolist() == ["10Y-3M", "10Y-2Y", "10Y-2Y"]
+        assert df["start"].dt.day.tolist() == [1, 2, 5]
+        assert df["end"].dt.day.tolist() == [2, 3, 5]
+        assert df["days"].tolist() == [2, 2, 1]
+        assert np.allclose(df["trough"], [-0.4, -0.3, -0.2])
+
+        assert inversions(spreads.abs()).empty
+
+    def test_factors(self):
+        from iexexamples.dash.yield_curve.analytics import factors
+
+        scores, loadings, explained = factors(_curves())
+        assert list(scores.columns) == ["level", "slope", "curvature"]
+        assert explained.is_monotonic_decreasing
+        assert explained.iloc[:2].sum() > 0.99
+
+        # conventional signs, level up, slope up with long rates
+        assert (loadings["level"] > 0).all()
+        assert loadings["slope"].iloc[-1] > loadings["slope"].iloc[0]
+
+    def test_incremental(self):
+        from iexexamples.dash.yield_curve.analytics import (
+            CurveAnalytics,
+            factors,
+            inversions,
+            spreads,
+        )
+
+        df = _curves()
+        analytics = CurveAnalytics()
+        assert analytics.update(df.iloc[:150])
+        assert analytics.update(df)
+        assert not analytics.update(df)
+
+        # same as computing everything at once, including the episodes
+        # running across the appended dates
+        assert analytics.spreads.equals(spreads(df))
+        assert analytics.inversions.equals(inversions(spreads(df)))
+        episodes = analytics.inversions
+        running = (episodes["start"] < df.index[150]) & (
+            episodes["end"] >= df.index[150]
+        )
+        assert running.sum() == 2
+        scores, loadings, explained = factors(df)
+        assert np.allclose(analytics.factors, scores)
+        assert np.allclose(analytics.loadings, loadings)
+
+        # a different history is computed from scratch
+        other = _curves(seed=1)
+        assert analytics.update(other)
+        assert analytics.spreads.equals(spreads(other))
@@ -5,10 +5,737 @@
 # This file is part of the iexexamples library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import time
+
+import pandas as pd
+from mock import MagicMock, patch
+
+
+def _curveClient(delay=0.0):
+    """Fake pyEX client returning a small synthetic curve per key"""
+    client = MagicMock()
+
+    def timeSeriesDF(id, key, **kwargs):
+        time.sleep(delay)
+        dates = pd.date_range("2020-01-01", periods=5, freq="D")
+        values = [1.0 + len(key)] * 5
+        return pd.DataFrame({"date": dates, "value": values, "close": values})
+
+    client.timeSeriesDF.side_effect = timeSeriesDF
+    return client
+
+
+def _handleChart(client, inputs, view=None):
+    """Call the chart callback through the dash endpoint of a test `client`,
+    as the browser would when `inputs` change"""
+    values = {
+        "start-load-data.n_clicks": 0,
+        "data-overlay.value": [],
+        "3d-graph.relayoutData": None,
+        "date-window.start_date": None,
+        "date-window.end_date": None,
+    }
+    values.update(inputs)
+    state = {"reload-mode.value": "incremental", "chart-view.data": view}
+    outputs = [
+        "overlayconfig-container.style",
+        "start-load-data.children",
+        "3d-graph.figure",
+        "3d-graph.style",
+        "chart-view.data",
+    ]
+
+    def props(values):
+        return [
+            dict(zip(("id", "property"), k.split(".")), value=v)
+            for k, v in values.items()
+        ]
+
+    return client.post(
+        "/_dash-update-component",
+        json={
+            "output": "..{}..".format("...".join(outputs)),
+            "outputs": [dict(zip(("id", "property"), x.split("."))) for x in outputs],
+            "inputs": props(values),
+            "state": props(state),
+            "changedPropIds": list(inputs),
+        },
+    )
 
 
 class TestYieldCurveApp:
-    def test_import(self):
+    def test_import(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _curves
+        from iexexamples.utils import ReplayClient
+
+        # offline, against the recorded fixtures
+        app = YieldCurveApp(
+            client=ReplayClient(strict=True),
+            cache_dir=str(tmpdir),
+            background_warmup=False,
+        )
+        app.buildYieldCurve()
+        assert list(app.df.columns) == list(_curves.values())
+        assert not app.df.empty
+
+        figure = app.buildFigure(["SPY", "UNRATE"])
+        assert [t.get("name") for t in figure["data"][1:]] == [
+            "S&P500 ETF",
+            "Unemployment Rate",
+        ]
+
+    def test_build_yield_curve_concurrent(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _curves
+
+        app = YieldCurveApp(
+            client=_curveClient(delay=0.2),
+            cache_dir=str(tmpdir),
+            background_warmup=False,
+        )
+
+        with patch.object(YieldCurveApp, "saveData"):
+            start = time.time()
+            app.buildYieldCurve()
+            elapsed = time.time() - start
+
+        # about one round-trip, all curves at once by default
+        assert elapsed < 0.2 * 2
+        assert list(app.df.columns) == list(_curves.values())
+        assert app.df.shape == (5, len(_curves))
+
+    def test_build_yield_curve_timeout(self, tmpdir):
+        from concurrent.futures import TimeoutError
+
+        import pytest
+
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        app = YieldCurveApp(
+            client=_curveClient(delay=0.5),
+            timeout=0.1,
+            cache_dir=str(tmpdir),
+            background_warmup=False,
+        )
+
+        # one deadline for the whole load, not one per curve in turn
+        start = time.time()
+        with pytest.raises(TimeoutError):
+            app.fetchCurves()
+        assert time.time() - start < 0.4
+
+    def test_refresh_yield_curve_incremental(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _curves
+
+        client = _curveClient()
+        app = YieldCurveApp(
+            client=client, cache_dir=str(tmpdir), background_warmup=False
+        )
+        app.df = pd.DataFrame(
+            {name: [1.0, 2.0] for name in _curves.values()},
+            index=pd.DatetimeIndex(["2019-12-31", "2020-01-01"], name="date"),
+        )
+
+        with patch.object(YieldCurveApp, "saveData") as saveData:
+            app.refreshYieldCurve()
+
+        # only the window after the last cached date is requested
+        assert {c.kwargs["from_"] for c in client.timeSeriesDF.call_args_list} == {
+            "2020-01-02"
+        }
+
+        # overlapping dates are deduped, only new rows are appended
+        assert app.df.index.is_unique
+        assert len(app.df) == 6
+        (appended,) = saveData.call_args.args
+        assert len(appended) == 4
+        assert saveData.call_args.kwargs == {"append": True}
+
+    def test_update_overlays_diff(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp, yieldCurveSurface
+        from iexexamples.dash.yield_curve.app import _curves
+
+        client = _curveClient()
+        app = YieldCurveApp(
+            client=client, cache_dir=str(tmpdir), background_warmup=False
+        )
+        df = pd.DataFrame(
+            {name: [1.0, 2.0] for name in _curves.values()},
+            index=pd.DatetimeIndex(["2019-12-31", "2020-01-01"], name="date"),
+        )
+        figure = app.figurePayload(yieldCurveSurface(df))
+        surface = figure["data"][0]
+
+        figure = app.updateOverlays(figure, ["SPY"])
+        figure = app.updateOverlays(figure, ["SPY", "UNRATE"])
+        assert client.timeSeriesDF.call_count == 2
+        assert [t["name"] for t in figure["data"][1:]] == [
+            "S&P500 ETF",
+            "Unemployment Rate",
+        ]
+
+        # deselecting doesnt fetch or touch the surface
+        figure = app.updateOverlays(figure, ["UNRATE"])
+        assert client.timeSeriesDF.call_count == 2
+        assert [t["name"] for t in figure["data"][1:]] == ["Unemployment Rate"]
+        assert figure["data"][0] is surface
+
+        # reselecting a recently fetched series is served from the cache
+        figure = app.updateOverlays(figure, ["UNRATE", "SPY"])
+        assert client.timeSeriesDF.call_count == 2
+        assert len(figure["data"]) == 3
+
+    def test_zoom_figure(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _curves
+
+        app = YieldCurveApp(
+            client=_curveClient(),
+            cache_dir=str(tmpdir),
+            max_surface_rows=10,
+            background_warmup=False,
+        )
+        app.df = pd.DataFrame(
+            {name: range(100) for name in _curves.values()},
+            index=pd.date_range("2020-01-01", periods=100, name="date"),
+        )
+        app.saveData()
+
+        figure = app.buildFigure(["SPY"])
+        assert len(figure["data"][0]["y"]) == 10
+
+        # zooming redraws the surface from the shared data, overlays are kept
+        zoomed = app.buildFigure(["SPY"], ["2020-02-01", "2020-02-05"])
+        assert len(zoomed["data"][0]["y"]) == 5
+        assert zoomed["data"][1]["name"] == figure["data"][1]["name"]
+        assert zoomed["layout"]["scene"]["yaxis"]["autorange"] is False
+        assert zoomed["layout"]["meta"] == {"lastDate": None}
+        assert len(figure["data"][0]["y"]) == 10
+
+    def test_chart_requests(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        app = YieldCurveApp(
+            client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+        )
+        app.buildYieldCurve()
+        client = app.app.server.test_client()
+
+        def chart(inputs, view=None):
+            return _handleChart(client, inputs, view).get_json()["response"]
+
+        # the browser only sends the date window it shows, never the figure
+        response = chart({"date-window.start_date": "2020-01-02"})
+        view = response["chart-view"]["data"]
+        assert view == {
+            "window": ["2020-01-02", None],
+            "version": app.curveVersion()[1],
+        }
+        assert len(response["3d-graph"]["figure"]["data"][0]["y"]) == 4
+
+        # overlays are drawn on the cached surface of the same window
+        with patch("iexexamples.dash.yield_curve.charts.yieldCurveSurface") as draw:
+            response = chart({"data-overlay.value": ["SPY"]}, view)
+            assert not draw.called
+        figure = response["3d-graph"]["figure"]
+        assert [t["name"] for t in figure["data"][1:]] == ["S&P500 ETF"]
+        assert len(figure["data"][0]["y"]) == 4
+        assert response["chart-view"]["data"] == view
+
+        # back out to the full history, or nothing for a camera move
+        response = chart({"3d-graph.relayoutData": {"scene.yaxis.autorange": True}})
+        assert response["chart-view"]["data"]["window"] is None
+        assert len(response["3d-graph"]["figure"]["data"][0]["y"]) == 5
+        camera = {"3d-graph.relayoutData": {"scene.camera": {}}}
+        assert _handleChart(client, camera, view).status_code == 204
+
+    def test_curve_data_reloads(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _curves
+
+        # two server processes sharing a cache folder
+        worker1 = YieldCurveApp(
+            client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+        )
+        worker2 = YieldCurveApp(
+            client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+        )
+        assert worker2.curveData().empty
+
+        worker1.buildYieldCurve()
+        assert worker2.curveData().shape == (5, len(_curves))
+
+    def test_metrics(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _curves
+        from iexexamples.utils import ReplayClient
+
+        app = YieldCurveApp(
+            client=ReplayClient(strict=True),
+            cache_dir=str(tmpdir),
+            metrics=True,
+            background_warmup=False,
+        )
+        client = app.app.server.test_client()
+
+        # press Load, through the dash endpoint so the callback is timed
+        response = _handleChart(client, {"start-load-data.n_clicks": 1})
+        assert response.status_code == 200
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'dash_callback_duration_seconds_count{callback="handleChart"} 1' in text
+        assert 'dash_callback_response_bytes_count{callback="handleChart"} 1' in text
+        requests = app.metrics.request_duration
+        assert requests.count(method="timeSeriesDF", id="TREASURY") == len(_curves)
+        assert 'cache_misses_total{cache="overlay"} 0' in text
+        assert (
+            'iex_client_events_total{method="timeSeriesDF",id="TREASURY",event="requests"} 11'
+            in text
+        )
+
+    def test_lazy_startup(self, tmpdir):
+        import json
+
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.utils import ReplayClient
+
+        # cached data from an earlier run
+        YieldCurveApp(
+            client=ReplayClient(strict=True),
+            cache_dir=str(tmpdir),
+            background_warmup=False,
+        ).buildYieldCurve()
+
+        app = YieldCurveApp(
+            client=ReplayClient(strict=True),
+            cache_dir=str(tmpdir),
+            background_warmup=False,
+        )
+        client = app.app.server.test_client()
+
+        # the page is served without reading the cache
+        layout = client.get("/_dash-layout").get_data(as_text=True)
+        assert "Reload" in layout
+        assert app._df is None
+
+        # the chart is drawn by the initial callback instead
+        response = _handleChart(client, {})
+        figure = json.loads(response.data)["response"]["3d-graph"]["figure"]
+        assert figure["data"][0]["type"] == "surface"
+        assert app.client.calls == {}
+
+    def test_warmup(self, tmpdir):
         from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.utils import LazyClient, ReplayClient
+
+        client = LazyClient(lambda: ReplayClient(strict=True))
+        app = YieldCurveApp(
+            client=client, cache_dir=str(tmpdir), background_warmup=False
+        )
+        assert client._client is None
+
+        app.warmup()
+        assert isinstance(client._client, ReplayClient)
+        assert app._df is not None and app._df.empty
+
+    def test_figure_cache(self, tmpdir):
+        import json
+        import os
+
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.encoding import toJSON
+        from iexexamples.dash.yield_curve.app import _curves
+
+        app = YieldCurveApp(
+            client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+        )
+        app.df = pd.DataFrame(
+            {name: [1.0, 2.0] for name in _curves.values()},
+            index=pd.DatetimeIndex(["2019-12-31", "2020-01-01"], name="date"),
+        )
+        app.saveData()
+
+        figure = app.buildFigure(["SPY"])
+        with patch("iexexamples.dash.yield_curve.charts.yieldCurveSurface") as draw:
+            # same data and overlays, served from the cache
+            assert app.buildFigure(["SPY"]) is figure
+
+            # a restarted app reads it from disk
+            restarted = YieldCurveApp(
+                client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+            )
+            assert restarted.buildFigure(["SPY"]) == json.loads(toJSON(figure))
+            assert not draw.called
+
+        # new dates change the fingerprint, and drop the old figures
+        app.refreshYieldCurve()
+        figure = app.buildFigure(["SPY"])
+        assert len(figure["data"][0]["y"]) == 6
+        version = app.curveVersion()[1]
+        assert all(f.startswith(version) for f in os.listdir(app.figure_cache.path))
+
+    def test_clientside_overlays(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.dash.yield_curve.app import _overlays
+
+        app = YieldCurveApp(
+            client=_curveClient(),
+            cache_dir=str(tmpdir),
+            clientside_overlays=True,
+            background_warmup=False,
+        )
+
+        # overlays are composed in the browser, not on the server
+        (callback,) = [
+            c for c in app.app._callback_list if c["output"] == "3d-graph.figure"
+        ]
+        assert callback["clientside_function"] is not None
+
+        series = app.overlaySeries()
+        assert list(series) == list(_overlays)
+        assert series["SPY"] == {
+            "trace": {
+                "type": "scatter3d",
+                "name": "S&P500 ETF",
+                "marker": {"size": 4, "color": "darkblue"},
+                "line": {"color": "darkblue", "width": 5},
+            },
+            # 2020-01-01 in days since epoch, then a day apart
+            "start": 18262,
+            "days": [1, 1, 1, 1],
+            "values": [4.0] * 5,
+        }
+
+        # sent once per page load
+        client = app.app.server.test_client()
+        payload = {
+            "output": "overlay-series.data",
+            "outputs": {"id": "overlay-series", "property": "data"},
+            "inputs": [{"id": "start-load-data", "property": "n_clicks", "value": 0}],
+            "state": [{"id": "overlay-series", "property": "data", "value": None}],
+            "changedPropIds": [],
+        }
+        response = client.post("/_dash-update-component", json=payload)
+        assert response.get_json()["response"]["overlay-series"]["data"] == series
+
+        payload["state"][0]["value"] = series
+        response = client.post("/_dash-update-component", json=payload)
+        assert response.status_code == 204
+
+    def test_date_window(self):
+        from iexexamples.dash.yield_curve.app import _dateWindow
+
+        assert _dateWindow(None) is None
+        assert _dateWindow({"scene.camera": {}}) is None
+        assert _dateWindow({"scene.yaxis.autorange": True}) == (None, None)
+        assert _dateWindow(
+            {"scene.yaxis.range[0]": "2010-01-01", "scene.yaxis.range[1]": "2011-01-01"}
+        ) == ("2010-01-01", "2011-01-01")
+
+    def test_live(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+        from iexexamples.utils import PlaybackClient
+
+        # recorded prints published a day a second, from 2020-12-01
+        now = [0.0]
+        app = YieldCurveApp(
+            client=PlaybackClient(start="2020-12-01", clock=lambda: now[0]),
+            cache_dir=str(tmpdir),
+            live=True,
+            live_interval=0.01,
+            rate_limit=None,
+            background_warmup=False,
+        )
+        try:
+            app.buildYieldCurve()
+            figure = app.buildFigure()
+            assert figure["layout"]["meta"] == {"lastDate": "2020-12-01"}
+
+            # the poller picks up new prints as they are published
+            now[0] = 7
+            deadline = time.time() + 5
+            while app.curveData().index.max() < pd.Timestamp("2020-12-08"):
+                assert time.time() < deadline
+                time.sleep(0.01)
+        finally:
+            app.stopPolling()
+
+        client = app.app.server.test_client()
+
+        def handleLive(drawn, sent=None):
+            return client.post(
+                "/_dash-update-component",
+                json={
+                    "output": "..3d-graph.extendData...live-sent.data..",
+                    "outputs": [
+                        {"id": "3d-graph", "property": "extendData"},
+                        {"id": "live-sent", "property": "data"},
+                    ],
+                    "inputs": [
+                        {"id": "live-interval", "property": "n_intervals", "value": 1}
+                    ],
+                    "state": [
+                        {"id": "live-drawn", "property": "data", "value": drawn},
+                        {"id": "live-sent", "property": "data", "value": sent},
+                    ],
+                    "changedPropIds": ["live-interval.n_intervals"],
+                },
+            )
+
+        # only the dates after the figure's last one are sent
+        drawn = {"figure": 1, "last": "2020-12-01"}
+        response = handleLive(drawn).get_json()["response"]
+        update, traces = response["3d-graph"]["extendData"]
+        dates = ["2020-12-02", "2020-12-03", "2020-12-04", "2020-12-07", "2020-12-08"]
+        assert update["y"] == [dates]
+        assert [len(row) for row in update["z"][0]] == [11] * 5
+        assert traces == [0]
+        sent = response["live-sent"]["data"]
+        assert sent == {"figure": 1, "last": "2020-12-08"}
+
+        # nothing new for this figure
+        assert handleLive(drawn, sent).status_code == 204
+
+        # a redrawn figure carries on from its own last date, in small batches
+        app.live_max_rows = 2
+        response = handleLive({"figure": 2, "last": "2020-12-04"}, sent).get_json()
+        assert response["response"]["3d-graph"]["extendData"][0]["y"] == [dates[3:]]
+
+        # zoomed in
+        assert handleLive({"figure": 3, "last": None}, sent).status_code == 204
+
+    def test_live_end_date(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        # full and incremental loads stop at the same date
+        client = _curveClient()
+        app = YieldCurveApp(
+            client=client,
+            cache_dir=str(tmpdir),
+            end_date="2020-01-10",
+            background_warmup=False,
+        )
+        app.buildYieldCurve()
+        app.refreshYieldCurve()
+        ends = {c.kwargs["to_"] for c in client.timeSeriesDF.call_args_list}
+        assert ends == {"2020-01-10"}
+
+        # and past it there is nothing to fetch
+        app.end_date = "2020-01-05"
+        calls = client.timeSeriesDF.call_count
+        app.refreshYieldCurve()
+        assert client.timeSeriesDF.call_count == calls
+
+    def test_live_downsampled(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        app = YieldCurveApp(
+            client=_curveClient(),
+            cache_dir=str(tmpdir),
+            max_surface_rows=3,
+            live=True,
+            live_interval=3600,
+            background_warmup=False,
+        )
+        try:
+            app.buildYieldCurve()
+            client = app.app.server.test_client()
+
+            # a downsampled surface isnt extended with single dates
+            response = _handleChart(client, {}).get_json()["response"]
+            assert response["3d-graph"]["figure"]["layout"]["meta"] == {
+                "lastDate": None
+            }
+            view = response["chart-view"]["data"]
+
+            # but redrawn on a live tick once the data changed
+            tick = {"live-interval.n_intervals": 1}
+            assert _handleChart(client, tick, view).status_code == 204
+
+            df = app.df
+            newer = df.iloc[-1:].set_axis([df.index[-1] + pd.Timedelta("1D")])
+            app.df = pd.concat([df, newer])
+            app.saveData()
+            response = _handleChart(client, tick, view).get_json()["response"]
+            assert response["chart-view"]["data"]["version"] != view["version"]
+            assert len(response["3d-graph"]["figure"]["data"][0]["y"]) <= 3
+
+            # not while zoomed in
+            zoomed = dict(view, window=["2020-01-02", "2020-01-03"])
+            assert _handleChart(client, tick, zoomed).status_code == 204
+        finally:
+            app.stopPolling()
+
+    def test_analytics(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        app = YieldCurveApp(
+            client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+        )
+        assert app.analyticsPanel() is None
+
+        app.buildYieldCurve()
+        figure, table, version = app.analyticsPanel()
+        assert [t["name"] for t in figure["data"]] == [
+            "10Y-2Y",
+            "10Y-3M",
+            "level",
+            "slope",
+            "curvature",
+        ]
+
+        # the fake 3 month curve is above the 10 year one throughout
+        (episode,) = table.children[1:]
+        assert [td.children for td in episode.children] == [
+            "10Y-3M",
+            "2020-01-01",
+            "2020-01-05",
+            5,
+            "-1.00",
+        ]
+        assert len(figure["layout"]["shapes"]) == 1
+
+        # sent once per data version
+        client = app.app.server.test_client()
+        outputs = [
+            "analytics-container.style",
+            "analytics-graph.figure",
+            "inversions-table.children",
+            "analytics-version.data",
+        ]
+        response = client.post(
+            "/_dash-update-component",
+            json={
+                "output": "..{}..".format("...".join(outputs)),
+                "outputs": [
+                    dict(zip(("id", "property"), x.split("."))) for x in outputs
+                ],
+                "inputs": [
+                    {"id": "start-load-data", "property": "children", "value": "Reload"}
+                ],
+                "state": [
+                    {"id": "analytics-version", "property": "data", "value": version}
+                ],
+                "changedPropIds": ["start-load-data.children"],
+            },
+        )
+        assert response.status_code == 204
+
+    def test_playback(self, tmpdir):
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        app = YieldCurveApp(
+            client=_curveClient(),
+            cache_dir=str(tmpdir),
+            background_warmup=False,
+            playback_chunk=2,
+        )
+        app.buildYieldCurve()
+        frames = app.playbackFrames()
+        assert app.playbackFrames() is frames
+        assert frames.meta()["count"] == 5
+
+        # played in the browser
+        (callback,) = [
+            c
+            for c in app.app._callback_list
+            if c["output"].startswith("..playback-graph.figure")
+        ]
+        assert callback["clientside_function"] is not None
+
+        # chunks on request, of the current data only
+        client = app.app.server.test_client()
+
+        def request(index, version):
+            return client.post(
+                "/_dash-update-component",
+                json={
+                    "output": "playback-chunk.data",
+                    "outputs": {"id": "playback-chunk", "property": "data"},
+                    "inputs": [
+                        {
+                            "id": "playback-request",
+                            "property": "data",
+                            "value": {"index": index, "version": version},
+                        }
+                    ],
+                    "changedPropIds": ["playback-request.data"],
+                },
+            )
+
+        response = request(2, frames.version)
+        assert response.status_code == 200
+        chunk = response.get_json()["response"]["playback-chunk"]["data"]
+        assert chunk["start"] == 4
+        assert chunk["dates"] == ["2020-01-05"]
+        assert request(3, frames.version).status_code == 204
+
+        # new data, new frames
+        app.df = app.df.iloc[:-1]
+        newer = app.playbackFrames()
+        assert newer.version != frames.version
+        assert newer.meta()["count"] == 4
+
+        # asking for the old data is answered without dates, so the
+        # browser stops waiting on it
+        response = request(0, frames.version)
+        assert response.status_code == 200
+        chunk = response.get_json()["response"]["playback-chunk"]["data"]
+        assert chunk == {"version": newer.version, "index": 0}
+
+        # which brings on the new meta
+        def meta(shown):
+            return client.post(
+                "/_dash-update-component",
+                json={
+                    "output": "..playback-container.style...playback-meta.data..",
+                    "outputs": [
+                        {"id": "playback-container", "property": "style"},
+                        {"id": "playback-meta", "property": "data"},
+                    ],
+                    "inputs": [
+                        {"id": "start-load-data", "property": "children"},
+                        {"id": "playback-chunk", "property": "data", "value": chunk},
+                    ],
+                    "state": [
+                        {"id": "playback-meta", "property": "data", "value": shown}
+                    ],
+                    "changedPropIds": ["playback-chunk.data"],
+                },
+            )
+
+        response = meta(frames.meta())
+        assert response.status_code == 200
+        sent = response.get_json()["response"]["playback-meta"]["data"]
+        assert sent["version"] == newer.version
+        assert meta(sent).status_code == 204
+
+        response = request(1, newer.version)
+        assert response.status_code == 200
+        chunk = response.get_json()["response"]["playback-chunk"]["data"]
+        assert chunk["dates"] == ["2020-01-03", "2020-01-04"]
+
+    def test_fitted_curves(self, tmpdir):
+        import numpy as np
+
+        from iexexamples.dash.yield_curve import YieldCurveApp
+
+        app = YieldCurveApp(
+            client=_curveClient(), cache_dir=str(tmpdir), background_warmup=False
+        )
+        app.buildYieldCurve()
+
+        # any maturities, through the tenors for a spline
+        values = app.fittedCurves([1.0, 10.0, 15.0], model="spline")
+        assert values.shape == (5, 3)
+        assert np.allclose(values[:, :2], app.df[["1 Year", "10 Year"]])
+
+        values = app.fittedCurves([0.5, 15.0], dates=app.df.index[-2:])
+        assert values.shape == (2, 2)
 
-        YieldCurveApp()
+        # fits are kept per date
+        with patch("iexexamples.dash.yield_curve.fitting.fitCurves") as fitCurves:
+            app.fittedCurves([0.5, 15.0], dates=app.df.index[-2:])
+            assert not fitCurves.called
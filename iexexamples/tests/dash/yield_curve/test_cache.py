@@ -0,0 +1,72 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import pandas as pd
+import pytest
+
+
+def _curveFrame(start="2020-01-01", periods=3):
+    index = pd.date_range(start, periods=periods, freq="D", name="date")
+    return pd.DataFrame({"1 Month": 0.1, "10 Year": 1.5}, index=index)
+
+
+class TestDataCache:
+    @pytest.mark.parametrize("format", ["csv", "parquet", "feather"])
+    def test_roundtrip_and_append(self, tmpdir, format):
+        from iexexamples.dash.yield_curve.cache import getCache
+
+        if format != "csv":
+            pytest.importorskip("pyarrow")
+
+        cache = getCache(format, str(tmpdir))
+        assert cache.load().empty
+
+        cache.save(_curveFrame())
+        cache.append(_curveFrame("2020-01-04", 2))
+
+        df = cache.load()
+        assert isinstance(df.index, pd.DatetimeIndex)
+        assert list(df.columns) == ["1 Month", "10 Year"]
+        assert len(df) == 5
+
+    def test_concurrent_save(self, tmpdir):
+        import threading
+
+        from iexexamples.dash.yield_curve.cache import getCache
+
+        # workers saving at once each write their own temporary file
+        cache = getCache("csv", str(tmpdir))
+        errors = []
+
+        def save(n):
+            try:
+                cache.save(_curveFrame(periods=n))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save, args=(n,)) for n in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert tmpdir.listdir() == [tmpdir.join("data_cache.csv")]
+        assert 1 <= len(cache.load()) <= 8
+
+    def test_migrate_legacy_csv(self, tmpdir):
+        from iexexamples.dash.yield_curve.cache import getCache, migrateLegacyCache
+
+        legacyPath = str(tmpdir.join("data_cache.csv"))
+        _curveFrame().to_csv(legacyPath)
+
+        cache = getCache("parquet", str(tmpdir.join("cache")))
+        assert migrateLegacyCache(cache, legacyPath)
+        assert len(cache.load()) == 3
+
+        # only happens once
+        assert not migrateLegacyCache(cache, legacyPath)
@@ -0,0 +1,41 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import numpy as np
+import pandas as pd
+
+
+def _curveFrame(periods):
+    index = pd.date_range("2008-01-01", periods=periods, freq="D", name="date")
+    return pd.DataFrame(
+        {"1 Month": np.linspace(0.1, 1.0, periods), "10 Year": 2.0}, index=index
+    )
+
+
+class TestCharts:
+    def test_downsample(self):
+        from iexexamples.dash.yield_curve.charts import downsample
+
+        df = _curveFrame(3000)
+        out = downsample(df, 100)
+        assert len(out) == 100
+        assert out.index[0] == df.index[0]
+        assert out.index.is_monotonic_increasing
+        assert (out["10 Year"] == 2.0).all()
+
+        # small frames pass straight through
+        assert downsample(df, 5000) is df
+
+    def test_surface_zoom_full_resolution(self):
+        from iexexamples.dash.yield_curve.charts import updateSurface, yieldCurveSurface
+
+        df = _curveFrame(3000)
+        fig = yieldCurveSurface(df, max_rows=100)
+        assert len(fig.data[0].z) == 100
+
+        updateSurface(fig, df.loc["2010-01-01":"2010-01-31"], max_rows=100)
+        assert len(fig.data[0].z) == 31
@@ -0,0 +1,36 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import numpy as np
+import pandas as pd
+
+
+class TestEncoding:
+    def test_encode_figure_roundtrip(self):
+        from iexexamples.dash.yield_curve import yieldCurveSurface
+        from iexexamples.dash.yield_curve.encoding import decodeArray, encodeFigure
+
+        index = pd.date_range("2020-01-01", periods=4, freq="D", name="date")
+        df = pd.DataFrame({"1 Month": [0.1, 0.2, 0.3, 0.4], "1 Year": 1.0}, index=index)
+
+        fig = encodeFigure(yieldCurveSurface(df), "float32")
+        surface = fig["data"][0]
+        assert surface["z"]["dtype"] == "f4"
+        assert surface["z"]["shape"] == "4, 2"
+        np.testing.assert_allclose(decodeArray(surface["z"]), df.values, rtol=1e-6)
+
+        # dates go as epoch milliseconds on an explicit date axis
+        y = decodeArray(surface["y"]).astype("int64").astype("datetime64[ms]")
+        assert (y == index.values.astype("datetime64[ms]")).all()
+        assert fig["layout"]["scene"]["yaxis"]["type"] == "date"
+
+    def test_measure(self):
+        from iexexamples.dash.yield_curve.encoding import measure
+
+        sizes = measure(500)
+        assert sizes["float32"] < sizes["json"]
+        assert sizes["json+gzip"] < sizes["json"]
@@ -0,0 +1,104 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import os
+
+import pandas as pd
+
+
+def _curves(rows=5):
+    return pd.DataFrame(
+        {"1 Year": range(rows), "10 Year": range(rows)},
+        index=pd.date_range("2020-01-01", periods=rows, name="date"),
+        dtype="float64",
+    )
+
+
+class TestFigures:
+    def test_fingerprint(self):
+        from iexexamples.dash.yield_curve.figures import fingerprint
+
+        df = _curves()
+        assert fingerprint(df) == fingerprint(df.copy())
+
+        changed = df.copy()
+        changed.iloc[-1, 0] = 0.5
+        assert fingerprint(changed) != fingerprint(df)
+        assert fingerprint(_curves(6)) != fingerprint(df)
+        assert fingerprint(df.rename(columns={"1 Year": "2 Year"})) != fingerprint(df)
+
+    def test_figure_cache(self, tmpdir):
+        from iexexamples.dash.yield_curve.figures import FigureCache
+
+        cache = FigureCache(str(tmpdir))
+        key = cache.key("abc", ["SPY"], 500)
+        assert key.startswith("abc-")
+        assert key != cache.key("abc", ["SPY", "DIA"], 500)
+
+        figure = {"data": [{"type": "surface", "z": [[1.0, 2.0]]}], "layout": {}}
+        assert cache.getOrSet(key, lambda: figure) is figure
+        assert cache.get(key) is figure
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # another process reads it back from disk
+        other = FigureCache(str(tmpdir))
+        assert other.get(key) == figure
+        assert other.disk_hits == 1
+
+        # figures of other data are dropped
+        other.set(other.key("def"), figure)
+        other.invalidate(keep="def")
+        assert os.listdir(str(tmpdir)) == [other.key("def") + ".json"]
+        assert other.get(key) is None
+
+    def test_concurrent_set(self, tmpdir):
+        import threading
+
+        from iexexamples.dash.yield_curve.figures import FigureCache
+
+        # callback threads caching the same figure each write their own
+        # temporary file
+        cache = FigureCache(str(tmpdir))
+        key = cache.key("abc")
+        errors = []
+
+        def set(n):
+            try:
+                for i in range(10):
+                    cache.set(key, {"data": [{"z": [[n, i]]}], "layout": {}})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=set, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert os.listdir(str(tmpdir)) == [key + ".json"]
+        assert FigureCache(str(tmpdir)).get(key)["data"][0]["z"][0][1] == 9
+
+    def test_failures_are_misses(self, tmpdir):
+        from iexexamples.dash.yield_curve.figures import FigureCache
+
+        figure = {"data": [], "layout": {}}
+
+        # a corrupt file is drawn again
+        cache = FigureCache(str(tmpdir))
+        key = cache.key("abc")
+        tmpdir.join(key + ".json").write("{not json")
+        assert cache.get(key) is None
+        assert cache.getOrSet(key, lambda: figure) is figure
+        assert FigureCache(str(tmpdir)).get(key) == figure
+
+        # and a folder that cant be written to still caches in memory
+        blocked = tmpdir.join("blocked")
+        blocked.write("")
+        cache = FigureCache(str(blocked))
+        cache.set(key, figure)
+        assert cache.get(key) is figure
@@ -0,0 +1,105 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _nelsonSiegelCurves(rows=50, seed=0):
+    """Curves drawn exactly from Nelson-Siegel, with random betas"""
+    from iexexamples.dash.yield_curve.app import _curves
+    from iexexamples.dash.yield_curve.fitting import basis, maturities
+
+    rng = np.random.default_rng(seed)
+    betas = rng.normal([4.0, -2.0, 1.0], 1.0, (rows, 3))
+    X = basis(maturities(_curves.values()), (2.0,))
+    df = pd.DataFrame(
+        betas @ X.T,
+        index=pd.bdate_range("2020-01-01", periods=rows, name="date"),
+        columns=list(_curves.values()),
+    )
+    return df, betas
+
+
+class TestFitting:
+    def test_maturities(self):
+        from iexexamples.dash.yield_curve.fitting import maturities
+
+        assert maturities(["3 Month", "1 Year", "30 Year"]).tolist() == [
+            0.25,
+            1.0,
+            30.0,
+        ]
+
+    def test_spline(self):
+        from iexexamples.dash.yield_curve.fitting import splineCurves, splineWeights
+
+        knots = np.array([0.25, 1.0, 2.0, 5.0, 10.0, 30.0])
+        grid = np.array([0.25, 0.5, 3.0, 7.5, 30.0])
+
+        # through the knots, and exact for straight lines
+        assert np.allclose(splineWeights(knots, knots), np.eye(len(knots)))
+        assert np.allclose(
+            (1 + 0.1 * knots) @ splineWeights(knots, grid), 1 + 0.1 * grid
+        )
+
+        # flat beyond the ends
+        assert np.allclose(knots @ splineWeights(knots, [0.0, 40.0]), [0.25, 30.0])
+
+        df, _ = _nelsonSiegelCurves()
+        values = splineCurves(df, grid)
+        assert values.shape == (len(df), len(grid))
+        assert np.allclose(values[:, -1], df["30 Year"])
+
+    def test_nelson_siegel(self):
+        from iexexamples.dash.yield_curve.fitting import CurveFitter, basis
+
+        df, betas = _nelsonSiegelCurves()
+        df.iloc[3, 0] = np.nan
+
+        fitter = CurveFitter("ns", lambdas=[0.5, 1.0, 2.0, 4.0])
+        assert fitter.fit(df) == len(df)
+
+        # recovered exactly, missing data isnt fitted
+        params = fitter.params.drop(df.index[3])
+        assert np.allclose(params[["beta0", "beta1", "beta2"]], np.delete(betas, 3, 0))
+        assert (params["lambda1"] == 2.0).all()
+        assert fitter.params.iloc[3].isna().all()
+
+        grid = np.array([0.1, 4.0, 15.0])
+        assert np.allclose(
+            fitter.curves(grid, df.index[:2]), betas[:2] @ basis(grid, (2.0,)).T
+        )
+
+        # only new and changed dates are fitted again
+        more, _ = _nelsonSiegelCurves(rows=52)
+        more.iloc[:50] = df.values
+        more.iloc[0] += 0.1
+        assert fitter.fit(more) == 3
+        assert len(fitter.params) == 52
+
+    def test_svensson(self):
+        from iexexamples.dash.yield_curve.fitting import CurveFitter
+
+        df, _ = _nelsonSiegelCurves()
+        fitter = CurveFitter("nss")
+        fitter.fit(df)
+        assert list(fitter.params.columns) == [
+            "beta0",
+            "beta1",
+            "beta2",
+            "beta3",
+            "lambda1",
+            "lambda2",
+            "rmse",
+        ]
+        assert (fitter.params["rmse"] < 0.01).all()
+        assert (fitter.params["lambda2"] >= 2 * fitter.params["lambda1"]).all()
+
+        with pytest.raises(ValueError):
+            CurveFitter("cubic")
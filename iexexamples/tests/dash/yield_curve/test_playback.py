@@ -0,0 +1,54 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import numpy as np
+import pandas as pd
+
+
+def _curves(rows=7):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        np.round(rng.uniform(0, 5, (rows, 3)), 2),
+        index=pd.date_range("2020-01-01", periods=rows, name="date"),
+        columns=["3 Month", "2 Year", "10 Year"],
+    )
+
+
+class TestPlayback:
+    def test_frames(self):
+        from iexexamples.dash.yield_curve.playback import PlaybackFrames
+
+        df = _curves()
+        df.iloc[2, 1] = np.nan
+        frames = PlaybackFrames(df, "abc", chunk=3)
+        assert frames.meta() == {
+            "version": "abc",
+            "count": 6,
+            "chunk": 3,
+            "curves": ["3 Month", "2 Year", "10 Year"],
+            "range": [df.min().min(), df.max().max()],
+        }
+        assert frames.chunks() == 2
+        assert frames.payload(2) is None
+
+        # chunks decode back to the curves in basis points, the dates
+        # missing a curve left out
+        complete = df.dropna()
+        for index in range(frames.chunks()):
+            chunk = frames.payload(index)
+            assert chunk["version"] == "abc"
+            rows = np.cumsum(chunk["values"], axis=0)
+            expected = complete.iloc[chunk["start"] : chunk["start"] + 3]
+            assert chunk["dates"] == expected.index.strftime("%Y-%m-%d").tolist()
+            assert (rows == np.rint(expected.values * 100)).all()
+
+    def test_empty(self):
+        from iexexamples.dash.yield_curve.playback import PlaybackFrames
+
+        frames = PlaybackFrames(_curves(0))
+        assert frames.meta()["count"] == 0
+        assert frames.payload(0) is None
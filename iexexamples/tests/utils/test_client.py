@@ -0,0 +1,117 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import time
+
+import pandas as pd
+import pytest
+from mock import MagicMock, patch
+
+
+def _liveClient():
+    """Fake live client with a daily series, returning whichever window is asked for"""
+    client = MagicMock()
+
+    def timeSeriesDF(id, key, subkey="", from_=None, to_=None, **kwargs):
+        dates = pd.date_range(from_, to_, freq="D")
+        return pd.DataFrame({"date": dates, "value": [float(d.day) for d in dates]})
+
+    client.timeSeriesDF.side_effect = timeSeriesDF
+    client.queryMetadata.return_value = [{"value": "TREASURY"}]
+    return client
+
+
+class TestClient:
+    def test_record_replay(self, tmpdir):
+        from iexexamples.utils import RecordingClient, ReplayClient
+
+        recorder = RecordingClient(_liveClient(), str(tmpdir))
+        recorder.timeSeriesDF("TREASURY", "DGS10", from_="2020-01-01", to_="2020-01-10")
+        recorder.timeSeriesDF(
+            id="TREASURY", key="DGS10", from_="2020-01-06", to_="2020-01-20"
+        )
+        assert recorder.queryMetadata() == [{"value": "TREASURY"}]
+
+        replay = ReplayClient(str(tmpdir), strict=True)
+        assert replay.queryMetadata() == [{"value": "TREASURY"}]
+
+        # overlapping windows were merged, any window inside them can be replayed
+        df = replay.timeSeriesDF(
+            "TREASURY", "DGS10", from_="2020-01-08", to_="2020-01-12", filter="date"
+        )
+        assert list(df.columns) == ["date"]
+        assert list(df["date"]) == list(pd.date_range("2020-01-08", "2020-01-12"))
+        assert len(replay.timeSeriesDF("TREASURY", "DGS10", limit=3)) == 3
+        assert len(replay.timeSeriesDF("TREASURY", "DGS10")) == 20
+
+        with pytest.raises(KeyError):
+            replay.timeSeriesDF("TREASURY", "DGS30")
+        assert ReplayClient(str(tmpdir)).timeSeriesDF("TREASURY", "DGS30").empty
+        assert replay.calls == {"queryMetadata": 1, "timeSeriesDF": 4}
+
+    def test_latency(self, tmpdir):
+        from iexexamples.utils import ReplayClient
+
+        replay = ReplayClient(str(tmpdir), latency=0.05)
+        start = time.time()
+        replay.queryMetadata()
+        assert time.time() - start >= 0.05
+
+    def test_get_client(self, tmpdir, monkeypatch):
+        from iexexamples.utils import RecordingClient, ReplayClient, getClient
+
+        monkeypatch.setenv("IEX_CLIENT_MODE", "replay")
+        monkeypatch.setenv("IEX_REPLAY_LATENCY", "0.5")
+        client = getClient(path=str(tmpdir))
+        assert isinstance(client, ReplayClient) and client.latency == 0.5
+
+        live = MagicMock()
+        with patch("pyEX.Client", return_value=live):
+            assert isinstance(getClient("record"), RecordingClient)
+            assert getClient("live") is live
+
+        with pytest.raises(ValueError):
+            getClient("sandbox")
+
+    def test_lazy_client(self):
+        from iexexamples.utils import LazyClient, SharedClient, resolveClient
+
+        live = MagicMock()
+        factory = MagicMock(return_value=live)
+        client = SharedClient(LazyClient(factory))
+        assert not factory.called
+
+        # created once, on first use or when resolved ahead of time
+        assert resolveClient(client) is live
+        client.timeSeriesDF("TREASURY", "DGS10")
+        assert factory.call_count == 1
+        live.timeSeriesDF.assert_called_once_with(id="TREASURY", key="DGS10")
+
+        # nothing to resolve for other clients
+        assert resolveClient(SharedClient(live)) is None
+
+    def test_playback(self, tmpdir):
+        from iexexamples.utils import PlaybackClient, RecordingClient
+
+        recorder = RecordingClient(_liveClient(), str(tmpdir))
+        recorder.timeSeriesDF("TREASURY", "DGS10", from_="2020-01-01", to_="2020-01-20")
+
+        now = [0.0]
+        playback = PlaybackClient(
+            str(tmpdir), start="2020-01-05", speed=2, clock=lambda: now[0]
+        )
+        df = playback.timeSeriesDF("TREASURY", "DGS10", to_="2021-01-01")
+        assert df["date"].max() == pd.Timestamp("2020-01-05")
+
+        # two recorded days a second
+        now[0] = 3
+        df = playback.timeSeriesDF("TREASURY", "DGS10", from_="2020-01-06")
+        assert list(df["date"]) == list(pd.date_range("2020-01-06", "2020-01-11"))
+
+        # earlier windows are served as recorded
+        df = playback.timeSeriesDF("TREASURY", "DGS10", to_="2020-01-02")
+        assert len(df) == 2
@@ -0,0 +1,51 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_ttl_eviction(self):
+        from iexexamples.utils import TTLCache
+
+        clock = _Clock()
+        cache = TTLCache(ttl=10, timer=clock)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        clock.now = 11
+        assert cache.get("a") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        from iexexamples.utils import TTLCache
+
+        cache = TTLCache(max_bytes=2, sizeof=lambda value: 1)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        # touch a, so b is the oldest
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache and "c" in cache and "b" not in cache
+        assert cache.nbytes == 2
+
+    def test_get_or_set(self):
+        from iexexamples.utils import TTLCache
+
+        calls = []
+        cache = TTLCache()
+        for _ in range(3):
+            cache.getOrSet("a", lambda: calls.append(1) or len(calls))
+        assert calls == [1]
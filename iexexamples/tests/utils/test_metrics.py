@@ -0,0 +1,104 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import pytest
+
+
+class TestMetrics:
+    def test_render(self):
+        from iexexamples.utils import Metrics
+
+        metrics = Metrics()
+        requests = metrics.counter("requests_total", "Requests", ["path"])
+        requests.inc(path="/")
+        requests.inc(2, path='/a"b')
+        metrics.gauge("queue_size", "Queue size", lambda: 3)
+
+        text = metrics.render()
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{path="/"} 1' in text
+        assert 'requests_total{path="/a\\"b"} 2' in text
+        assert "# TYPE queue_size gauge\nqueue_size 3\n" in text
+
+        with pytest.raises(ValueError):
+            requests.inc(method="GET")
+
+    def test_histogram(self):
+        from iexexamples.utils import Metrics
+
+        metrics = Metrics()
+        latency = metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            latency.observe(value)
+
+        # buckets are cumulative, and +Inf counts everything
+        lines = metrics.render().splitlines()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1"} 3' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+        assert "latency_seconds_sum 6.05" in lines
+        assert "latency_seconds_count 4" in lines
+
+        with latency.time():
+            pass
+        assert latency.count() == 5
+
+    def test_cache_hits(self):
+        from iexexamples.utils import Metrics, TTLCache
+
+        metrics = Metrics()
+        cache = TTLCache(ttl=60)
+        metrics.instrumentCache("overlay", cache)
+
+        cache.getOrSet("SPY", lambda: 1)
+        cache.getOrSet("SPY", lambda: 1)
+
+        text = metrics.render()
+        assert 'cache_hits_total{cache="overlay"} 1' in text
+        assert 'cache_misses_total{cache="overlay"} 1' in text
+
+    def test_metered_client(self):
+        from iexexamples.utils import Metrics, ReplayClient
+
+        metrics = Metrics()
+        client = metrics.instrumentClient(ReplayClient(strict=True))
+
+        client.timeSeriesDF("TREASURY", "DGS10")
+        client.timeSeriesDF(id="TREASURY", key="DGS30")
+        with pytest.raises(KeyError):
+            client.timeSeriesDF(id="MISSING", key="X")
+
+        duration = metrics.request_duration
+        assert duration.count(method="timeSeriesDF", id="TREASURY") == 2
+        assert duration.count(method="timeSeriesDF", id="MISSING") == 1
+        assert metrics.request_errors.get(method="timeSeriesDF", id="MISSING") == 1
+
+        # everything else passes through
+        assert client.calls["timeSeriesDF"] == 3
+
+    def test_metered_shared_client(self):
+        from mock import MagicMock
+
+        from iexexamples.utils import Metrics, SharedClient
+
+        upstream = MagicMock()
+        upstream.timeSeriesDF.side_effect = [ConnectionError("reset"), "df"]
+        metrics = Metrics()
+        client = metrics.instrumentClient(
+            SharedClient(upstream, retries=1, sleep=lambda _: None)
+        )
+
+        # timed below the retries, every upstream attempt on its own
+        assert isinstance(client, SharedClient)
+        assert client.timeSeriesDF(id="TREASURY", key="DGS10") == "df"
+        duration = metrics.request_duration
+        assert duration.count(method="timeSeriesDF", id="TREASURY") == 2
+        assert metrics.request_errors.get(method="timeSeriesDF", id="TREASURY") == 1
+        assert (
+            'iex_client_events_total{method="timeSeriesDF",id="TREASURY",event="calls"} 1'
+            in metrics.render()
+        )
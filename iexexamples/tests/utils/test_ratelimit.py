@@ -0,0 +1,33 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket:
+    def test_burst_then_rate(self):
+        from iexexamples.utils import TokenBucket
+
+        clock = _Clock()
+        bucket = TokenBucket(2, burst=3, timer=clock, sleep=clock.sleep)
+
+        assert all(bucket.tryAcquire() for _ in range(3))
+        assert not bucket.tryAcquire()
+
+        # next token after half a second at 2/s
+        bucket.acquire()
+        assert abs(clock.now - 0.5) < 1e-9
@@ -0,0 +1,127 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from mock import MagicMock
+
+
+class _PyEXception(Exception):
+    # as pyEX raises on http errors
+    pass
+
+
+def _slowClient(release):
+    client = MagicMock()
+
+    def timeSeriesDF(id, key, **kwargs):
+        release.wait(5)
+        return pd.DataFrame({"value": [1.0, 2.0]})
+
+    client.timeSeriesDF.side_effect = timeSeriesDF
+    return client
+
+
+class TestSharedClient:
+    def test_coalesce(self):
+        from iexexamples.utils import SharedClient
+
+        release = threading.Event()
+        upstream = _slowClient(release)
+        client = SharedClient(upstream)
+
+        with ThreadPoolExecutor(9) as pool:
+            futures = [
+                pool.submit(client.timeSeriesDF, "TREASURY", "DGS10") for _ in range(8)
+            ]
+            other = pool.submit(client.timeSeriesDF, id="TREASURY", key="DGS30")
+
+            # wait until all callers are queued on the one request
+            while (
+                client.stats().get(("timeSeriesDF", "TREASURY"), {}).get("calls", 0)
+                < len(futures) + 1
+            ):
+                threading.Event().wait(0.01)
+            release.set()
+            results = [f.result() for f in futures]
+            other.result()
+
+        # one request per distinct call
+        assert upstream.timeSeriesDF.call_count == 2
+        assert client.stats()[("timeSeriesDF", "TREASURY")] == {
+            "calls": 9,
+            "requests": 2,
+            "coalesced": 7,
+            "retries": 0,
+            "errors": 0,
+        }
+
+        # each caller can modify its own result
+        results[0]["value"] = 0.0
+        assert all(df["value"].tolist() == [1.0, 2.0] for df in results[1:])
+
+    def test_retry(self):
+        from iexexamples.utils import SharedClient
+
+        upstream = MagicMock()
+        upstream.timeSeriesDF.side_effect = [
+            _PyEXception("Response 429 - ", "Too many requests"),
+            ConnectionError("reset"),
+            _PyEXception("Response 503 - ", ""),
+            pd.DataFrame({"value": [1.0]}),
+        ]
+        sleeps = []
+        client = SharedClient(
+            upstream, retries=3, backoff=1, sleep=sleeps.append, random=lambda: 0.5
+        )
+
+        assert len(client.timeSeriesDF("TREASURY", "DGS10")) == 1
+        # jittered exponential backoff
+        assert sleeps == [0.5, 1.0, 2.0]
+        assert client.stats()[("timeSeriesDF", "TREASURY")]["retries"] == 3
+
+    def test_no_retry(self):
+        from iexexamples.utils import SharedClient
+
+        upstream = MagicMock()
+        upstream.timeSeriesDF.side_effect = _PyEXception("Response 403 - ", "")
+        upstream.queryMetadata.side_effect = _PyEXception("Response 500 - ", "")
+        sleeps = []
+        client = SharedClient(upstream, retries=2, sleep=sleeps.append)
+
+        # client errors are not retried
+        with pytest.raises(_PyEXception):
+            client.timeSeriesDF("TREASURY", "DGS10")
+        assert upstream.timeSeriesDF.call_count == 1
+
+        # server errors are, until retries run out
+        with pytest.raises(_PyEXception):
+            client.queryMetadata(id="TREASURY")
+        assert upstream.queryMetadata.call_count == 3
+        assert len(sleeps) == 2
+        assert client.stats()[("queryMetadata", "TREASURY")]["errors"] == 1
+
+    def test_limiter(self):
+        from iexexamples.utils import SharedClient
+
+        limiter = MagicMock()
+        upstream = MagicMock()
+        upstream.chartDF.side_effect = [ConnectionError("reset"), pd.DataFrame()]
+        client = SharedClient(upstream, limiter=limiter, sleep=lambda _: None)
+
+        client.chartDF("SPY", "1y")
+
+        # a token for every attempt
+        assert limiter.acquire.call_count == 2
+        assert client.stats()[("chartDF", "")]["requests"] == 2
+
+        # everything else passes through
+        client.quote("SPY")
+        upstream.quote.assert_called_once_with("SPY")
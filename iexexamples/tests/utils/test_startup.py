@@ -0,0 +1,20 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import os
+
+
+class TestStartup:
+    def test_measure_startup(self, tmpdir):
+        from iexexamples.utils.startup import measureStartup
+
+        env = dict(os.environ, IEX_CLIENT_MODE="replay", IEX_CACHE_DIR=str(tmpdir))
+        times = measureStartup(
+            "iexexamples.dash.yield_curve", "YieldCurveApp", repeat=1, env=env
+        )
+        assert set(times) == {"import", "construct", "first page", "total", "process"}
+        assert 0 < times["total"] < times["process"]
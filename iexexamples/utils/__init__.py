@@ -0,0 +1,21 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+
+from .client import (
+    LazyClient,
+    PlaybackClient,
+    RecordingClient,
+    ReplayClient,
+    getClient,
+    resolveClient,
+)
+from .lru import TTLCache
+from .metrics import MeteredClient, Metrics
+from .paths import cacheDir
+from .ratelimit import TokenBucket
+from .shared import SharedClient
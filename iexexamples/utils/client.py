@@ -0,0 +1,355 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Record/replay stand-ins for `pyEX.Client`.
+
+`RecordingClient` wraps a live client and saves every `timeSeriesDF`,
+`queryMetadata` and `chartDF` response to a fixtures folder.
+`ReplayClient` answers the same calls from those fixtures without any
+network access, optionally with a fixed latency per request, so that the
+apps can be run, tested and measured offline and deterministically.
+`PlaybackClient` replays the recorded rows as if they were being
+published live, for trying out the apps' live modes offline.
+
+Time-series fixtures are stored per series rather than per request, and
+replay applies `from_`, `to_`, `limit` and `filter` itself. So requests
+for different date windows than were recorded (e.g. relative to a
+different "today") are still answered from the recorded rows.
+"""
+
+import hashlib
+import json
+import os
+import os.path
+import threading
+import time
+
+# IEX_CLIENT_MODE values, see getClient
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+PLAYBACK = "playback"
+
+# Default fixtures folder, override with IEX_FIXTURES_DIR
+_defaultFixturesDir = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "tests", "fixtures", "client"
+)
+
+# Playback starts here by default, a month before the end of the fixtures
+# shipped with the tests
+_defaultPlaybackStart = "2020-12-01"
+
+# Positional argument names, as in pyEX
+_argNames = {
+    "timeSeriesDF": ("id", "key", "subkey"),
+    "queryMetadata": ("id", "key", "subkey"),
+    "chartDF": ("symbol", "timeframe"),
+}
+
+
+def _callKwargs(method, args, kwargs):
+    """merge positional arguments into kwargs by their pyEX names"""
+    kwargs = dict(kwargs)
+    for name, value in zip(_argNames[method], args):
+        kwargs[name] = value
+    return kwargs
+
+
+def _fixtureName(method, kwargs):
+    """file name for the fixture holding the response to a call.
+
+    Time-series are stored per series, everything else per distinct call.
+    """
+    if method in ("timeSeriesDF", "queryMetadata"):
+        parts = [kwargs.get(x) or "" for x in ("id", "key", "subkey")]
+    else:
+        # symbol for readability, then a short hash of the whole call
+        call = json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")
+        parts = [kwargs.get("symbol", ""), hashlib.sha1(call).hexdigest()[:12]]
+
+    name = "_".join(str(x) for x in parts).strip("_") or "all"
+    name = "".join(c if c.isalnum() or c in "-_." else "-" for c in name)
+    return os.path.join(method, name + ".json")
+
+
+def _readFrame(path):
+    import pandas as pd
+
+    return pd.read_json(path, orient="table")
+
+
+def _writeFrame(df, path):
+    # table orient keeps dtypes (dates in particular) and the index
+    df.to_json(path, orient="table", date_format="iso", index=True)
+
+
+class RecordingClient(object):
+    """Wrap `client`, saving responses to fixtures in `path`.
+
+    Calls are passed straight through to `client`. Time-series responses
+    for the same series are merged into a single fixture.
+    """
+
+    def __init__(self, client, path=_defaultFixturesDir):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+
+    def timeSeriesDF(self, *args, **kwargs):
+        df = self.client.timeSeriesDF(*args, **kwargs)
+        self.record("timeSeriesDF", _callKwargs("timeSeriesDF", args, kwargs), df)
+        return df
+
+    def queryMetadata(self, *args, **kwargs):
+        ret = self.client.queryMetadata(*args, **kwargs)
+        self.record("queryMetadata", _callKwargs("queryMetadata", args, kwargs), ret)
+        return ret
+
+    def chartDF(self, *args, **kwargs):
+        df = self.client.chartDF(*args, **kwargs)
+        self.record("chartDF", _callKwargs("chartDF", args, kwargs), df)
+        return df
+
+    def record(self, method, kwargs, response):
+        path = os.path.join(self.path, _fixtureName(method, kwargs))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        import pandas as pd
+
+        with self._lock:
+            if not isinstance(response, pd.DataFrame):
+                with open(path, "w") as fp:
+                    json.dump(response, fp, indent=1, default=str)
+                return
+
+            if method == "timeSeriesDF" and os.path.exists(path):
+                # merge with windows recorded earlier
+                response = pd.concat([_readFrame(path), response], ignore_index=True)
+                response = response.drop_duplicates()
+                if "date" in response.columns:
+                    response = response.sort_values("date", ignore_index=True)
+            _writeFrame(response, path)
+
+    def __getattr__(self, attr):
+        # anything else goes straight to the wrapped client, unrecorded
+        return getattr(self.client, attr)
+
+
+class ReplayClient(object):
+    """Answer `timeSeriesDF`, `queryMetadata` and `chartDF` from fixtures
+    recorded by `RecordingClient`.
+
+    Args:
+        path (str): fixtures folder
+        latency (float): seconds to wait before answering each call,
+                         to simulate the network
+        strict (bool): raise KeyError for calls with no fixture, otherwise
+                       answer with an empty dataframe or list
+    """
+
+    def __init__(self, path=_defaultFixturesDir, latency=0.0, strict=False):
+        self.path = path
+        self.latency = latency
+        self.strict = strict
+
+        # request counts by method, handy in tests
+        self.calls = {}
+        self._lock = threading.Lock()
+
+        # fixtures are parsed once, then served from memory
+        self._fixtures = {}
+
+    def timeSeriesDF(self, *args, **kwargs):
+        import pandas as pd
+
+        kwargs = _callKwargs("timeSeriesDF", args, kwargs)
+        df = self.replay("timeSeriesDF", kwargs)
+        if df is None:
+            return pd.DataFrame()
+
+        if "date" in df.columns:
+            # serve whichever recorded rows fall in the requested window,
+            # whole days at both ends as the API does for intraday series
+            dates = pd.to_datetime(df["date"]).dt.normalize()
+            mask = pd.Series(True, index=df.index)
+            if kwargs.get("from_"):
+                mask &= dates >= pd.Timestamp(kwargs["from_"])
+            if kwargs.get("to_"):
+                mask &= dates <= pd.Timestamp(kwargs["to_"])
+            df = df[mask]
+        if kwargs.get("limit"):
+            df = df.iloc[: kwargs["limit"]]
+        if kwargs.get("filter"):
+            columns = [x for x in kwargs["filter"].split(",") if x in df.columns]
+            df = df[columns]
+        return df.reset_index(drop=True)
+
+    def queryMetadata(self, *args, **kwargs):
+        ret = self.replay("queryMetadata", _callKwargs("queryMetadata", args, kwargs))
+        return [] if ret is None else ret
+
+    def chartDF(self, *args, **kwargs):
+        import pandas as pd
+
+        df = self.replay("chartDF", _callKwargs("chartDF", args, kwargs))
+        return pd.DataFrame() if df is None else df
+
+    def replay(self, method, kwargs):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = os.path.join(self.path, _fixtureName(method, kwargs))
+        if path not in self._fixtures:
+            if not os.path.exists(path):
+                if self.strict:
+                    raise KeyError("No fixture for {}({})".format(method, kwargs))
+                return None
+
+            if method == "queryMetadata":
+                with open(path, "r") as fp:
+                    self._fixtures[path] = json.load(fp)
+            else:
+                self._fixtures[path] = _readFrame(path)
+
+        # copies, so callers can modify what they get back
+        ret = self._fixtures[path]
+        return ret.copy() if hasattr(ret, "copy") else ret
+
+
+class PlaybackClient(ReplayClient):
+    """`ReplayClient` that publishes the recorded time-series rows over time,
+    as if they were live. Only rows dated up to `now()` are served, and
+    `now()` moves on by `speed` recorded days per second from `start`.
+
+    Args:
+        path (str): fixtures folder
+        start (str): date of the newest row served at first
+        speed (float): recorded days published per second
+        latency (float): as for `ReplayClient`
+        strict (bool): as for `ReplayClient`
+        clock (callable): seconds, overridable for testing
+    """
+
+    def __init__(
+        self,
+        path=_defaultFixturesDir,
+        start=_defaultPlaybackStart,
+        speed=1.0,
+        latency=0.0,
+        strict=False,
+        clock=time.time,
+    ):
+        super(PlaybackClient, self).__init__(path, latency=latency, strict=strict)
+        self.start = start
+        self.speed = speed
+        self.clock = clock
+        self._started = clock()
+
+    def now(self):
+        """the recorded date being published now"""
+        import pandas as pd
+
+        elapsed = (self.clock() - self._started) * self.speed
+        return pd.Timestamp(self.start) + pd.Timedelta(days=elapsed)
+
+    def timeSeriesDF(self, *args, **kwargs):
+        import pandas as pd
+
+        # nothing after `now` has been published yet
+        kwargs = _callKwargs("timeSeriesDF", args, kwargs)
+        now = self.now()
+        if kwargs.get("to_"):
+            now = min(now, pd.Timestamp(kwargs["to_"]))
+        kwargs["to_"] = now.strftime("%Y-%m-%d")
+        return super(PlaybackClient, self).timeSeriesDF(**kwargs)
+
+
+class LazyClient(object):
+    """Stand-in that creates the real client with `factory()` on first use,
+    so that pyEX is imported and configured off the startup path.
+
+    Call `resolve` to create it ahead of time, e.g. in a warm-up thread.
+    """
+
+    def __init__(self, factory=None):
+        self.factory = factory or getClient
+        self._client = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        with self._lock:
+            if self._client is None:
+                try:
+                    self._client = self.factory()
+                except Exception:
+                    print(
+                        "To use IEX Cloud, set the IEX_TOKEN environment variable, "
+                        "or IEX_CLIENT_MODE=replay to run offline"
+                    )
+                    raise
+        return self._client
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+
+def resolveClient(client):
+    """Create the client behind `client` and any wrappers around it now,
+    if it is a `LazyClient`"""
+    while client is not None:
+        if isinstance(client, LazyClient):
+            return client.resolve()
+        # not getattr, wrappers pass unknown attributes through
+        client = vars(client).get("client")
+
+
+def getClient(mode=None, path=None, latency=None):
+    """Construct the client the apps should use.
+
+    Args:
+        mode (str): `live` for a `pyEX.Client`, `record` to record its
+                    responses, `replay` to answer from fixtures, or
+                    `playback` to publish them over time from
+                    IEX_PLAYBACK_START at IEX_PLAYBACK_SPEED days per second.
+                    Defaults to IEX_CLIENT_MODE, else `live`
+        path (str): fixtures folder, defaults to IEX_FIXTURES_DIR, else
+                    the fixtures shipped with the tests
+        latency (float): replay latency in seconds, defaults to
+                         IEX_REPLAY_LATENCY, else 0
+    """
+    mode = mode or os.environ.get("IEX_CLIENT_MODE", LIVE)
+    path = path or os.environ.get("IEX_FIXTURES_DIR", _defaultFixturesDir)
+
+    if mode == REPLAY:
+        if latency is None:
+            latency = float(os.environ.get("IEX_REPLAY_LATENCY", 0))
+        return ReplayClient(path, latency=latency)
+
+    if mode == PLAYBACK:
+        return PlaybackClient(
+            path,
+            start=os.environ.get("IEX_PLAYBACK_START", _defaultPlaybackStart),
+            speed=float(os.environ.get("IEX_PLAYBACK_SPEED", 1)),
+            latency=float(os.environ.get("IEX_REPLAY_LATENCY", 0)),
+        )
+
+    if mode not in (LIVE, RECORD):
+        raise ValueError(
+            "Unknown client mode: {} (expected one of {})".format(
+                mode, ", ".join((LIVE, RECORD, REPLAY, PLAYBACK))
+            )
+        )
+
+    import pyEX as p
+
+    client = p.Client()  # set IEX_TOKEN env var or provide here
+    if mode == RECORD:
+        return RecordingClient(client, path)
+    return client
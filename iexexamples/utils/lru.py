@@ -0,0 +1,127 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def sizeOf(value):
+    """Approximate in-memory size of `value` in bytes"""
+    if hasattr(value, "memory_usage"):
+        # pandas dataframe or series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    return sys.getsizeof(value)
+
+
+class TTLCache(object):
+    """Thread-safe in-process LRU cache with TTL eviction and a memory cap.
+
+    Args:
+        ttl (float): seconds an entry stays valid, or None to never expire
+        max_bytes (int): evict least recently used entries beyond this size,
+                         or None for no cap
+        sizeof (callable): function returning the size of a value in bytes
+        timer (callable): monotonic clock, overridable for testing
+    """
+
+    def __init__(self, ttl=None, max_bytes=None, sizeof=sizeOf, timer=time.monotonic):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.timer = timer
+
+        # key -> (expiry, size, value), oldest first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._live(key)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            if not self._live(key):
+                self.misses += 1
+                return default
+
+            # mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][2]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        expiry = None if self.ttl is None else self.timer() + self.ttl
+
+        with self._lock:
+            self._pop(key)
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                # would never fit, dont bother
+                return
+
+            self._entries[key] = (expiry, size, value)
+            self._bytes += size
+            self._evict()
+
+    def getOrSet(self, key, func):
+        """Return the cached value for `key`, calling `func()` to fill it on a miss"""
+        value = self.get(key, self)
+        if value is self:
+            value = func()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _live(self, key):
+        """check if `key` is present and unexpired, dropping it if expired"""
+        if key not in self._entries:
+            return False
+        expiry = self._entries[key][0]
+        if expiry is not None and expiry <= self.timer():
+            self._pop(key)
+            return False
+        return True
+
+    def _pop(self, key):
+        if key in self._entries:
+            _, size, _ = self._entries.pop(key)
+            self._bytes -= size
+
+    def _evict(self):
+        # drop anything expired first
+        now = self.timer()
+        expired = [
+            key
+            for key, (expiry, _, _) in self._entries.items()
+            if expiry is not None and expiry <= now
+        ]
+        for key in expired:
+            self._pop(key)
+
+        # then least recently used until under the cap
+        while self.max_bytes is not None and self._bytes > self.max_bytes:
+            self._pop(next(iter(self._entries)))
@@ -0,0 +1,353 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Minimal Prometheus-style instrumentation for the Dash apps.
+
+Metrics are kept in memory per process and served in the Prometheus text
+exposition format on a `/metrics` route of the Flask server. Under a
+multi-worker server each worker reports its own numbers.
+"""
+
+import threading
+import time
+from functools import wraps
+
+from dash.exceptions import PreventUpdate
+
+from .shared import SharedClient
+
+# Seconds, for callback and upstream request latency
+_defaultTimeBuckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Bytes, for response payload sizes
+_defaultSizeBuckets = tuple(256 * 4**i for i in range(9))  # 256B to 16MiB
+
+# Client methods counted as upstream IEX requests
+_clientMethods = ("timeSeriesDF", "queryMetadata", "chartDF")
+
+
+def _formatLabels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(
+                name,
+                str(value)
+                .replace("\\", "\\\\")
+                .replace("\n", "\\n")
+                .replace('"', '\\"'),
+            )
+            for name, value in pairs
+        )
+    )
+
+
+def _formatValue(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(object):
+    type = ""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                "{} expects labels {}, got {}".format(
+                    self.name, self.labelnames, tuple(labels)
+                )
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.help),
+            "# TYPE {} {}".format(self.name, self.type),
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            lines.extend(self._renderSamples(labelvalues, value))
+        return lines
+
+    def _renderSamples(self, labelvalues, value):
+        return [
+            "{}{} {}".format(
+                self.name,
+                _formatLabels(self.labelnames, labelvalues),
+                _formatValue(value),
+            )
+        ]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """A value read at scrape time from `func`, which returns either a
+    number, or a dict of label value tuples to numbers. Set `type` to
+    `counter` for totals kept elsewhere, e.g. cache hit counts."""
+
+    type = "gauge"
+
+    def __init__(self, name, help, func, labelnames=(), type=None):
+        super(Gauge, self).__init__(name, help, labelnames)
+        self.func = func
+        if type is not None:
+            self.type = type
+
+    def render(self):
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        with self._lock:
+            self._values = {tuple(str(x) for x in k): v for k, v in values.items()}
+        return super(Gauge, self).render()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=_defaultTimeBuckets):
+        super(Histogram, self).__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                # per-bucket counts, then sum and count
+                self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = entry = self._values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the seconds spent inside it"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _renderSamples(self, labelvalues, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(
+                "{}_bucket{} {}".format(
+                    self.name,
+                    _formatLabels(
+                        self.labelnames, labelvalues, [("le", _formatValue(bound))]
+                    ),
+                    cumulative,
+                )
+            )
+        labels = _formatLabels(self.labelnames, labelvalues)
+        lines.append("{}_sum{} {}".format(self.name, labels, _formatValue(total)))
+        lines.append("{}_count{} {}".format(self.name, labels, count))
+        return lines
+
+
+class _Timer(object):
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Metrics(object):
+    """Registry of metrics for one app, see `install` and the `instrument*`
+    methods for what gets measured"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+        self.callback_duration = self.histogram(
+            "dash_callback_duration_seconds",
+            "Time spent in Dash callbacks",
+            ["callback"],
+        )
+        self.callback_response_bytes = self.histogram(
+            "dash_callback_response_bytes",
+            "Size of Dash callback responses before compression",
+            ["callback"],
+            buckets=_defaultSizeBuckets,
+        )
+        self.callback_errors = self.counter(
+            "dash_callback_errors_total",
+            "Dash callbacks that raised an exception",
+            ["callback"],
+        )
+        self.request_duration = self.histogram(
+            "iex_request_duration_seconds",
+            "Time spent in upstream IEX requests",
+            ["method", "id"],
+        )
+        self.request_errors = self.counter(
+            "iex_request_errors_total",
+            "Upstream IEX requests that raised an exception",
+            ["method", "id"],
+        )
+
+        # name -> TTLCache, see instrumentCache
+        self._caches = {}
+        for attr in ("hits", "misses"):
+            self.gauge(
+                "cache_{}_total".format(attr),
+                "Cache {} by cache".format(attr),
+                lambda attr=attr: {
+                    (name,): getattr(cache, attr)
+                    for name, cache in list(self._caches.items())
+                },
+                ["cache"],
+                type="counter",
+            )
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=_defaultTimeBuckets):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, func, labelnames=(), type=None):
+        return self.register(Gauge(name, help, func, labelnames, type))
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def install(self, server, path="/metrics"):
+        """Serve the metrics on `path` of a Flask `server`"""
+
+        def metrics():
+            return self.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+        server.add_url_rule(path, "metrics", metrics)
+
+    def instrumentCallbacks(self, app):
+        """Time every callback registered on Dash `app` so far, and record
+        the size of its responses. Clientside callbacks never reach the server"""
+        for entry in app.callback_map.values():
+            if "callback" in entry:
+                entry["callback"] = self._wrapCallback(entry["callback"])
+
+    def _wrapCallback(self, func):
+        name = getattr(func, "__name__", "callback")
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.callback_duration.time(callback=name):
+                try:
+                    response = func(*args, **kwargs)
+                except PreventUpdate:
+                    # flow control, not an error
+                    raise
+                except Exception:
+                    self.callback_errors.inc(callback=name)
+                    raise
+
+            if isinstance(response, (str, bytes)):
+                self.callback_response_bytes.observe(len(response), callback=name)
+            return response
+
+        return wrapper
+
+    def instrumentClient(self, client):
+        """Wrap a pyEX client (or stand-in) to count and time its requests.
+
+        For a `SharedClient` the client it shares is wrapped instead, so that
+        only requests that actually go upstream are timed, each retry on its
+        own, and the shared client is returned"""
+        if isinstance(client, SharedClient):
+            # coalesced calls never reach the wrapped client, count them here
+            client.client = MeteredClient(client.client, self)
+            self.gauge(
+                "iex_client_events_total",
+                "Calls, upstream requests, coalesced calls, retries and errors",
+                lambda: {
+                    (method, id, event): n
+                    for (method, id), counts in client.stats().items()
+                    for event, n in counts.items()
+                },
+                ["method", "id", "event"],
+                type="counter",
+            )
+            return client
+        return MeteredClient(client, self)
+
+    def instrumentCache(self, name, cache):
+        """Report hits and misses of a `TTLCache` as `cache_*_total{cache=name}`"""
+        self._caches[name] = cache
+
+
+class MeteredClient(object):
+    """Proxy for a pyEX client recording the count, latency and errors of
+    `timeSeriesDF`, `queryMetadata` and `chartDF` calls by method and
+    time-series id"""
+
+    def __init__(self, client, metrics):
+        self.client = client
+        self.metrics = metrics
+
+    def __getattr__(self, attr):
+        func = getattr(self.client, attr)
+        if attr not in _clientMethods:
+            return func
+
+        def call(*args, **kwargs):
+            # symbols for chartDF are unbounded, so only ids are used as labels
+            id = "" if attr == "chartDF" else kwargs.get("id", args[0] if args else "")
+            labels = {"method": attr, "id": id or ""}
+            with self.metrics.request_duration.time(**labels):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    self.metrics.request_errors.inc(**labels)
+                    raise
+
+        return call
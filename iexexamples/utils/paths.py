@@ -0,0 +1,19 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import os
+import os.path
+
+# Default cache location, override with IEX_CACHE_DIR
+_defaultCacheDir = os.path.join("~", ".cache", "iexexamples")
+
+
+def cacheDir(cache_dir=None):
+    """Resolve the folder for on-disk caches: `cache_dir` if provided,
+    else IEX_CACHE_DIR, else ~/.cache/iexexamples"""
+    cache_dir = cache_dir or os.environ.get("IEX_CACHE_DIR", _defaultCacheDir)
+    return os.path.abspath(os.path.expanduser(cache_dir))
@@ -0,0 +1,55 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket rate limiter.
+
+    Args:
+        rate (float): tokens added per second
+        burst (int): bucket size, i.e. how many calls can go back to back
+        timer (callable): monotonic clock, overridable for testing
+        sleep (callable): sleep function, overridable for testing
+    """
+
+    def __init__(self, rate, burst=1, timer=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = burst
+        self.timer = timer
+        self.sleep = sleep
+
+        self._tokens = float(burst)
+        self._last = timer()
+        self._lock = threading.Lock()
+
+    def _fill(self):
+        now = self.timer()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def tryAcquire(self):
+        """Take a token if one is available, without waiting"""
+        with self._lock:
+            self._fill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """Take a token, waiting until one is available"""
+        while True:
+            with self._lock:
+                self._fill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
@@ -0,0 +1,217 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Client wrapper shared by all sessions of an app.
+
+`SharedClient` sits between the apps and a pyEX client (or a stand-in
+from client.py), and for `timeSeriesDF`, `queryMetadata` and `chartDF`:
+
+- coalesces identical calls already in flight into one upstream request
+  (singleflight), so users loading the same data at once cost one request
+- takes a token from a `TokenBucket` before every upstream request
+- retries rate limited (429), server side (5xx) and connection errors with
+  jittered exponential backoff
+- counts calls, requests, coalesced calls, retries and errors per endpoint
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+from .client import _argNames, _callKwargs
+
+# Retries after the first attempt
+_defaultRetries = 3
+
+# Seconds before the first retry, doubling after each one
+_defaultBackoff = 0.5
+
+# Longest wait between retries, in seconds
+_defaultMaxBackoff = 10.0
+
+# pyEX raises PyEXception("Response 429 - ", body) on http errors
+_statusRegex = re.compile(r"Response (\d{3})")
+
+# Counted per endpoint, see SharedClient.stats
+_events = ("calls", "requests", "coalesced", "retries", "errors")
+
+
+def statusCode(exc):
+    """http status code of a failed request, or None if unknown"""
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) is not None:
+        # requests.HTTPError
+        return response.status_code
+    match = _statusRegex.search(str(exc.args[0]) if exc.args else "")
+    return int(match.group(1)) if match else None
+
+
+def retryable(exc):
+    """whether a request failing with `exc` is worth trying again"""
+    status = statusCode(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        # connection errors and timeouts from requests, as used by pyEX
+        import requests
+    except ImportError:
+        return False
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+class _Call(object):
+    """an upstream request in flight, and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+def _copy(result):
+    return result.copy() if hasattr(result, "copy") else result
+
+
+class SharedClient(object):
+    """Wrap `client` with request coalescing, rate limiting and retries.
+
+    Args:
+        client (pyEX.Client): client to wrap
+        limiter (TokenBucket): rate limiter for upstream requests, if any
+        retries (int): retries after the first attempt of a request
+        backoff (float): seconds before the first retry, doubled per retry
+                         and jittered, see `delay`
+        max_backoff (float): cap on the wait between retries
+        sleep (callable): sleep function, overridable for testing
+        random (callable): uniform [0, 1) source, overridable for testing
+    """
+
+    def __init__(
+        self,
+        client,
+        limiter=None,
+        retries=_defaultRetries,
+        backoff=_defaultBackoff,
+        max_backoff=_defaultMaxBackoff,
+        sleep=time.sleep,
+        random=random.random,
+    ):
+        self.client = client
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.random = random
+
+        # call key -> _Call
+        self._inflight = {}
+
+        # (method, id) -> {event: count}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def timeSeriesDF(self, *args, **kwargs):
+        return self.call("timeSeriesDF", args, kwargs)
+
+    def queryMetadata(self, *args, **kwargs):
+        return self.call("queryMetadata", args, kwargs)
+
+    def chartDF(self, *args, **kwargs):
+        return self.call("chartDF", args, kwargs)
+
+    def __getattr__(self, attr):
+        # anything else goes straight to the wrapped client
+        return getattr(self.client, attr)
+
+    def call(self, method, args, kwargs):
+        kwargs = _callKwargs(method, args, kwargs)
+        key = (method, json.dumps(kwargs, sort_keys=True, default=str))
+        endpoint = self._endpoint(method, kwargs)
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                call.waiters += 1
+            self._count(endpoint, "calls")
+            if not leader:
+                self._count(endpoint, "coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # everyone gets their own copy, see below
+            return _copy(call.result)
+
+        try:
+            call.result = self.request(method, kwargs, endpoint)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+        # if others are sharing the result, keep it pristine for them. The
+        # apps modify the dataframes they get back
+        return _copy(call.result) if call.waiters else call.result
+
+    def request(self, method, kwargs, endpoint=None):
+        """Make one call upstream, with rate limiting and retries"""
+        endpoint = endpoint or self._endpoint(method, kwargs)
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            self.count(endpoint, "requests")
+
+            try:
+                return getattr(self.client, method)(**kwargs)
+            except Exception as e:
+                if attempt >= self.retries or not retryable(e):
+                    self.count(endpoint, "errors")
+                    raise
+                self.count(endpoint, "retries")
+                self.sleep(self.delay(attempt))
+                attempt += 1
+
+    def delay(self, attempt):
+        """Seconds to wait before retry `attempt` (from 0), with "full
+        jitter": uniform between 0 and the exponential backoff, so clients
+        that failed together dont retry in lockstep"""
+        return self.random() * min(self.max_backoff, self.backoff * 2**attempt)
+
+    def stats(self):
+        """Counts of each event by (method, timeseries id)"""
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+
+    def count(self, endpoint, event):
+        with self._lock:
+            self._count(endpoint, event)
+
+    def _count(self, endpoint, event):
+        counts = self._stats.get(endpoint)
+        if counts is None:
+            counts = self._stats[endpoint] = dict.fromkeys(_events, 0)
+        counts[event] += 1
+
+    def _endpoint(self, method, kwargs):
+        # symbols for chartDF are unbounded, so only ids are tracked
+        if "id" not in _argNames[method]:
+            return (method, "")
+        return (method, kwargs.get("id") or "")
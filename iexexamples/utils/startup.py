@@ -0,0 +1,78 @@
+# *****************************************************************************
+#
+# Copyright (c) 2021, the iexexamples authors.
+#
+# This file is part of the iexexamples library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+"""Measure how long an app takes to start serving pages.
+
+Each run is a fresh interpreter, so module imports are counted as they
+would be for `python -m iexexamples.dash.<app>` or a new server worker.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Run in the child process: import the app module, construct the app,
+# then request the page and its layout through the Flask test client
+_script = """
+import importlib, json, sys, time
+
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+app = getattr(module, sys.argv[2])()
+constructed = time.perf_counter()
+client = app.app.server.test_client()
+assert client.get("/").status_code == 200
+assert client.get("/_dash-layout").status_code == 200
+served = time.perf_counter()
+
+print(json.dumps({
+    "import": imported - start,
+    "construct": constructed - imported,
+    "first page": served - constructed,
+    "total": served - start,
+}))
+"""
+
+
+def measureStartup(module, app, repeat=5, env=None):
+    """Median seconds spent in each startup phase of `module.app()` over
+    `repeat` fresh processes. `process` also counts interpreter startup.
+
+    Args:
+        module (str): module to import, e.g. `iexexamples.dash.yield_curve`
+        app (str): app class in `module`
+        repeat (int): number of processes to run
+        env (dict): environment for the processes, defaults to this one
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", _script, module, app],
+            env=dict(os.environ if env is None else env),
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+        elapsed = time.perf_counter() - start
+
+        # the last line, in case the app printed anything
+        run = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+        run["process"] = elapsed
+        runs.append(run)
+
+    return {phase: statistics.median(run[phase] for run in runs) for phase in runs[0]}
+
+
+def printStartup(module, app, repeat=5):
+    """Print `measureStartup` as a table"""
+    print("{} startup, median of {} runs".format(app, repeat))
+    for phase, seconds in measureStartup(module, app, repeat).items():
+        print("{:>12}: {:6.3f}s".format(phase, seconds))
@@ -35,26 +35,40 @@ requires = [
     "dash>=1.20.0",
     "dash-core-components>=1.16.0",
     "dash-html-components>=1.1.3",
+    "dash-table>=4.11.0",
     "dash-renderer>=1.9.1",
     "plotly>=5.0.0",
     "pandas>=1.",
     "pyEX @ git+https://git@github.com/iexcloud/pyEX@main#egg=pyEX",
 ]
 
-requires_dev = requires + [
-    "black>=20.",
-    "bump2version>=1.0.0",
-    "flake8>=3.7.8",
-    "flake8-black>=0.2.1",
-    "mock",
-    "pytest>=4.3.0",
-    "pytest-cov>=2.6.1",
-    "recommonmark",
-    "Sphinx>=1.8.4",
-    "sphinx-markdown-builder>=0.5.2",
-    "sphinx-rtd-theme",
+requires_arrow = [
+    "pyarrow>=3.0.0",
 ]
 
+requires_prod = [
+    "gunicorn>=20.0.0",
+]
+
+requires_dev = (
+    requires
+    + requires_arrow
+    + [
+        "black>=20.",
+        "bump2version>=1.0.0",
+        "flake8>=3.7.8",
+        "flake8-black>=0.2.1",
+        "mock",
+        "pytest>=4.3.0",
+        "pytest-benchmark>=3.2.0",
+        "pytest-cov>=2.6.1",
+        "recommonmark",
+        "Sphinx>=1.8.4",
+        "sphinx-markdown-builder>=0.5.2",
+        "sphinx-rtd-theme",
+    ]
+)
+
 setup(
     name=name,
     version=version,
@@ -77,6 +91,8 @@ setup(
     packages=find_packages(exclude=[]),
     install_requires=requires,
     extras_require={
+        "arrow": requires_arrow,
+        "prod": requires_prod,
         "dev": requires_dev,
     },
 )